@@ -16,6 +16,13 @@ import numpy as np
 from tqdm import tqdm
 
 from utils.data.frame_stack import stack_frame
+from utils.data.frame_cache import cache_path, save_packed, load_packed
+from utils.data.ctc_feasibility import load_label_stats, check_feasibility
+from utils.data.ctc_feasibility import label_stats_path
+from utils.data.ctc_feasibility import decimated_frame_num
+from utils.data.cluster import divide_by_num, divide_by_bytes
+from utils.data.shuffle_buffer import ShuffleBuffer
+from utils.data.fixed_batch import make_fixed_batches
 
 
 class DataSet(object):
@@ -23,7 +30,11 @@ class DataSet(object):
 
     def __init__(self, data_type, train_data_size, label_type,
                  num_stack=None, num_skip=None,
-                 is_sorted=True, is_progressbar=False):
+                 is_sorted=True, is_progressbar=False,
+                 cache_dir=None, is_mmap=False, is_filtered=False,
+                 is_reported=False, max_cluster_bytes=None,
+                 shuffle_buffer_size=None, is_fixed_batch=False,
+                 num_shard=1, shard_index=0):
         """
         Args:
             data_type: train or train_all dev or eval1 or eval2 or eval3
@@ -33,10 +44,33 @@ class DataSet(object):
             num_skip: int, the number of frames to skip
             is_sorted: if True, sort dataset by frame num
             is_progressbar: if True, visualize progressbar
+            cache_dir: path to the directory to cache frame-stacked inputs.
+                If None, frames are stacked each time a cluster is loaded
+            is_mmap: if True, memory-map the cached inputs
+            is_filtered: if True, remove utterances which have fewer frames
+                (after skipping) than CTC needs to emit their labels
+            is_reported: if True, count such utterances without removing
+                them. Labels are read only if is_filtered or is_reported
+            max_cluster_bytes: int, the maximum size of raw & frame-stacked inputs
+                in one cluster (train only). If None, the dataset is divided
+                into the fixed number of clusters
+            shuffle_buffer_size: int, the number of utterances in the shuffle
+                buffer (train only). If set, the training set is divided into
+                random shards which are read in random order, and mini-batches
+                of similar lengths are drawn from the buffer
+            is_fixed_batch: if True, make length-sorted & padded mini-batches
+                once and iterate them in the fixed order (dev & eval only)
+            num_shard: int, the number of shards to divide the dataset into
+                (ex. the number of workers in distributed training)
+            shard_index: int, the index of the shard to read
         """
         if data_type not in ['train', 'dev', 'eval1', 'eval2', 'eval3']:
             raise ValueError(
                 'data_type is "train" or "dev" or "eval1" or "eval2" or "eval3".')
+        if data_type == 'train' and is_fixed_batch:
+            raise ValueError('is_fixed_batch is only for dev & eval sets.')
+        if not 0 <= shard_index < num_shard:
+            raise ValueError('shard_index must be in [0, num_shard).')
         print('----- ' + data_type + ' -----')
 
         self.data_type = data_type
@@ -46,6 +80,11 @@ class DataSet(object):
         self.num_skip = num_skip
         self.is_sorted = is_sorted
         self.is_progressbar = is_progressbar
+        self.cache_dir = cache_dir
+        self.is_mmap = is_mmap
+        self.is_fixed_batch = is_fixed_batch
+        self.fixed_batches = {}
+        self.fixed_batch_index = {}
 
         self.input_size = 123
         self.input_size = self.input_size * self.num_stack
@@ -63,7 +102,6 @@ class DataSet(object):
         print('=> loading paths to dataset...')
         self.frame_num_tuple_sorted = sorted(
             self.frame_num_dict.items(), key=lambda x: x[1])
-        self.data_num = len(self.frame_num_dict.keys())
         input_paths, label_paths = [], []
         iterator = tqdm(
             self.frame_num_tuple_sorted) if is_progressbar else self.frame_num_tuple_sorted
@@ -76,55 +114,266 @@ class DataSet(object):
         self.input_paths = np.array(input_paths)
         self.label_paths = np.array(label_paths)
 
+        if cache_dir is not None:
+            self.cache_path = cache_path(cache_dir, label_type,
+                                         train_data_size, data_type,
+                                         num_stack, num_skip)
+
+        # Check whether each utterance has enough frames for CTC
+        self.infeasible_names = []
+        if is_filtered or is_reported:
+            input_names = [input_name for input_name,
+                           _ in self.frame_num_tuple_sorted]
+            label_stats_list = [load_label_stats(
+                input_names, self.label_paths,
+                save_path=label_stats_path(self.dataset_path),
+                is_progressbar=is_progressbar)]
+            is_feasible = check_feasibility(input_names, self.frame_num_dict,
+                                            label_stats_list, num_skip)
+            self.infeasible_names = [input_names[i]
+                                     for i in np.where(~is_feasible)[0]]
+            print('=> %d/%d utterances are too short for CTC' %
+                  (len(self.infeasible_names), len(input_names)))
+            if is_filtered and len(self.infeasible_names) > 0:
+                print('=> Removing infeasible utterances...')
+                self.frame_num_tuple_sorted = [
+                    x for x, y in zip(self.frame_num_tuple_sorted, is_feasible) if y]
+                self.input_paths = self.input_paths[is_feasible]
+                self.label_paths = self.label_paths[is_feasible]
+
+        # Read every num_shard-th utterance (keeps the order by frame num)
+        if num_shard > 1:
+            self.frame_num_tuple_sorted = self.frame_num_tuple_sorted[
+                shard_index::num_shard]
+            self.input_paths = self.input_paths[shard_index::num_shard]
+            self.label_paths = self.label_paths[shard_index::num_shard]
+            print('=> shard %d/%d' % (shard_index + 1, num_shard))
+        self.data_num = len(self.input_paths)
+
+        # Shuffle the order of utterances with the fixed seed so that each
+        # cluster becomes a random shard of the dataset
+        if data_type in ['train', 'train_all'] and shuffle_buffer_size is not None:
+            perm = list(range(self.data_num))
+            random.Random(0).shuffle(perm)
+            self.frame_num_tuple_sorted = [
+                self.frame_num_tuple_sorted[i] for i in perm]
+            self.input_paths = self.input_paths[perm]
+            self.label_paths = self.label_paths[perm]
+
         # Divide dataset into some clusters
-        # total: 384198 utterances (train)
-        # total: 896755 utterances (train_all)
-        if train_data_size == 'default':
-            self.num_cluster = 10
-        elif train_data_size == 'large':
-            self.num_cluster = 15
         if data_type in ['train', 'train_all']:
-            self.rest_cluster = self.num_cluster - 1
-            self.data_num_cluster = int(
-                (self.data_num / self.num_cluster) / 128) * 128
-            self.input_paths_cluster = self.input_paths[0:self.data_num_cluster]
-            self.label_paths_cluster = self.label_paths[0:self.data_num_cluster]
+            if max_cluster_bytes is None:
+                # total: 384198 utterances (train)
+                # total: 896755 utterances (train_all)
+                if train_data_size == 'default':
+                    num_cluster = 10
+                elif train_data_size == 'large':
+                    num_cluster = 15
+                self.cluster_boundaries = divide_by_num(
+                    self.data_num, num_cluster)
+            else:
+                # NOTE: frames are stacked in float64, and the raw frames
+                # (num_skip frames per stacked frame) are kept while stacking
+                raw_input_size = int(self.input_size / num_stack)
+                bytes_per_frame = (
+                    self.input_size + raw_input_size * (num_skip or 1)) * 8
+                frame_num_list = [
+                    decimated_frame_num(frame_num, num_skip)
+                    for _, frame_num in self.frame_num_tuple_sorted]
+                self.cluster_boundaries = divide_by_bytes(
+                    frame_num_list, bytes_per_frame, max_cluster_bytes)
+        else:
+            self.cluster_boundaries = [(0, self.data_num)]
+        self.num_cluster = len(self.cluster_boundaries)
+        print('=> %d clusters' % self.num_cluster)
+
+        if data_type in ['train', 'train_all'] and shuffle_buffer_size is not None:
+            self.shuffle_buffer = ShuffleBuffer(shuffle_buffer_size)
+            self.cluster_order = list(range(self.num_cluster))
+            random.shuffle(self.cluster_order)
+            self.cluster_order_index = 0
+            self._set_cluster(self.cluster_order[0])
         else:
-            self.rest_cluster = 0
-            self.data_num_cluster = self.data_num
-            self.input_paths_cluster = self.input_paths
-            self.label_paths_cluster = self.label_paths
+            self.shuffle_buffer = None
+            self._set_cluster(0)
 
         # Load dataset in one cluster
         self.next_cluster()
         self.next_cluster_flag = False
+        self._reset_stream()
+
+    def _set_cluster(self, cluster_index):
+        """Set paths to the dataset in the cluster.
+        Args:
+            cluster_index: int, the index of the cluster
+        """
+        start, end = self.cluster_boundaries[cluster_index]
+        self.cluster_index = cluster_index
+        self.data_num_cluster = end - start
+        self.input_paths_cluster = self.input_paths[start:end]
+        self.label_paths_cluster = self.label_paths[start:end]
+
+    def get_state(self):
+        """Return the reading position to resume training from.
+        Returns:
+            state: dict of the loaded cluster, the rest of utterances in the
+                cluster and the state of the random generator
+        """
+        state = {'cluster_index': self.cluster_index,
+                 'rest': sorted(self.rest),
+                 'random_state': random.getstate()}
+        if self.shuffle_buffer is not None:
+            state['cluster_order'] = list(self.cluster_order)
+            state['cluster_order_index'] = self.cluster_order_index
+            state['stream_indices'] = list(self.stream_indices)
+        return state
+
+    def set_state(self, state):
+        """Restore the reading position saved by get_state.
+           NOTE: utterances in the shuffle buffer are not saved, so they are
+           skipped until the next epoch.
+        Args:
+            state: dict returned by get_state
+        """
+        if self.shuffle_buffer is not None:
+            self.cluster_order = state['cluster_order']
+            self.cluster_order_index = state['cluster_order_index']
+        if state['cluster_index'] != self.cluster_index:
+            self._set_cluster(state['cluster_index'])
+            self.next_cluster()
+        self.rest = set(state['rest'])
+        if self.shuffle_buffer is not None:
+            self.stream_indices = state['stream_indices']
+        random.setstate(state['random_state'])
 
     def next_cluster(self):
+        is_stacked = (self.num_stack is not None) and (
+            self.num_skip is not None)
+
+        # Load frame-stacked inputs from the cache if they exist
+        stacked_input_list = None
+        if is_stacked and self.cache_dir is not None:
+            input_names = [basename(path).split('.')[0]
+                           for path in self.input_paths_cluster]
+            cache_file_path = join(
+                self.cache_path, input_names[0] + '_' + str(len(input_names)))
+            stacked_input_list = load_packed(
+                cache_file_path, input_names, self.is_mmap)
+
         # Load all dataset
         print('=> Loading next cluster...')
         self.input_list, self.label_list = [], []
         iterator = tqdm(range(self.data_num_cluster)
                         ) if self.is_progressbar else range(self.data_num_cluster)
         for i in iterator:
-            self.input_list.append(
-                np.load(self.input_paths_cluster[i]))
+            if stacked_input_list is None:
+                self.input_list.append(
+                    np.load(self.input_paths_cluster[i]))
             self.label_list.append(np.load(self.label_paths_cluster[i]))
         self.input_list = np.array(self.input_list)
         self.label_list = np.array(self.label_list)
 
         # Frame stacking
-        if (self.num_stack is not None) and (self.num_skip is not None):
-            print('=> Stacking frames...')
-            stacked_input_list = stack_frame(self.input_list,
-                                             self.input_paths_cluster,
-                                             self.frame_num_dict,
-                                             self.num_stack,
-                                             self.num_skip,
-                                             self.is_progressbar)
+        if is_stacked:
+            if stacked_input_list is None:
+                print('=> Stacking frames...')
+                stacked_input_list = stack_frame(self.input_list,
+                                                 self.input_paths_cluster,
+                                                 self.frame_num_dict,
+                                                 self.num_stack,
+                                                 self.num_skip,
+                                                 self.is_progressbar)
+                if self.cache_dir is not None:
+                    print('=> Saving stacked frames...')
+                    save_packed(cache_file_path, stacked_input_list,
+                                input_names)
+                    if self.is_mmap:
+                        stacked_input_list = load_packed(
+                            cache_file_path, input_names, is_mmap=True)
             self.input_list = np.array(stacked_input_list)
 
         self.rest = set([j for j in range(len(self.input_paths_cluster))])
 
+    def _reset_stream(self):
+        """Read utterances in the loaded cluster in random order."""
+        self.stream_indices = list(range(self.data_num_cluster))
+        random.shuffle(self.stream_indices)
+
+    def _next_shard(self):
+        """Load the next cluster in random order."""
+        self.cluster_order_index += 1
+        if self.cluster_order_index == self.num_cluster:
+            random.shuffle(self.cluster_order)
+            self.cluster_order_index = 0
+            print('---Next epoch---')
+        if self.num_cluster > 1:
+            self._set_cluster(self.cluster_order[self.cluster_order_index])
+            self.next_cluster()
+        self._reset_stream()
+
+    def _next_batch_buffer(self, batch_size):
+        """Make mini batch from the shuffle buffer.
+        Args:
+            batch_size: mini batch size
+        Returns:
+            input_data: list of input data, size batch_size
+            labels: list of tuple `(indices, values, shape)`, size batch_size
+            seq_len: list of length of each label, size batch_size
+            input_names: list of file name of input data, size batch_size
+        """
+        # Fill the shuffle buffer
+        while not self.shuffle_buffer.is_full():
+            if len(self.stream_indices) == 0:
+                self._next_shard()
+            x = self.stream_indices.pop()
+            self.shuffle_buffer.push(
+                self.input_list[x].shape[0],
+                (self.input_list[x],
+                 self.label_list[x],
+                 basename(self.input_paths_cluster[x]).split('.')[0]))
+
+        # Draw utterances of similar lengths
+        batch = self.shuffle_buffer.pop_batch(batch_size)
+        max_frame_num = max([item[0].shape[0] for item in batch])
+
+        input_data = np.zeros((len(batch), max_frame_num, self.input_size))
+        labels = [None] * len(batch)
+        seq_len = np.empty((len(batch),))
+        input_names = [None] * len(batch)
+        for i_batch, (data_i, label_i, input_name) in enumerate(batch):
+            frame_num = data_i.shape[0]
+            input_data[i_batch, :frame_num, :] = data_i
+            labels[i_batch] = label_i
+            seq_len[i_batch] = frame_num
+            input_names[i_batch] = input_name
+
+        return input_data, labels, seq_len, input_names
+
+    def _next_fixed_batch(self, batch_size):
+        """Return the next mini batch made in advance.
+        Args:
+            batch_size: mini batch size
+        Returns:
+            input_data: list of input data, size batch_size
+            labels: list of tuple `(indices, values, shape)`, size batch_size
+            seq_len: list of length of each label, size batch_size
+            input_names: list of file name of input data, size batch_size
+        """
+        if batch_size not in self.fixed_batches:
+            print('=> Making fixed mini-batches...')
+            input_names = [basename(path).split('.')[0]
+                           for path in self.input_paths_cluster]
+            self.fixed_batches[batch_size] = make_fixed_batches(
+                self.input_list, [self.label_list],
+                input_names, batch_size, self.input_size)
+            self.fixed_batch_index[batch_size] = 0
+
+        batches = self.fixed_batches[batch_size]
+        i_batch = self.fixed_batch_index[batch_size]
+        self.fixed_batch_index[batch_size] = (i_batch + 1) % len(batches)
+
+        return batches[i_batch]
+
     def next_batch(self, batch_size):
         """Make mini batch.
         Args:
@@ -135,6 +384,11 @@ class DataSet(object):
             seq_len: list of length of each label, size batch_size
             input_names: list of file name of input data, size batch_size
         """
+        if self.shuffle_buffer is not None:
+            return self._next_batch_buffer(batch_size)
+        if self.is_fixed_batch:
+            return self._next_fixed_batch(batch_size)
+
         #########################
         # sorted dataset
         #########################
@@ -176,21 +430,13 @@ class DataSet(object):
                     self.input_paths_cluster[x]).split('.')[0]
 
             if self.next_cluster_flag:
-                if self.rest_cluster >= 1:
-                    # Set fot the next clusters
-                    frame_offset = (self.num_cluster -
-                                    self.rest_cluster) * self.data_num_cluster
-                    self.input_paths_cluster = self.input_paths[frame_offset:frame_offset +
-                                                                self.data_num_cluster]
-                    self.label_paths_cluster = self.label_paths[frame_offset: frame_offset +
-                                                                self.data_num_cluster]
-                    self.rest_cluster -= 1
+                if self.cluster_index < self.num_cluster - 1:
+                    # Set for the next cluster
+                    self._set_cluster(self.cluster_index + 1)
                 else:
                     # Initialize clusters
                     if self.data_type == 'train':
-                        self.rest_cluster = self.num_cluster - 1
-                        self.input_paths_cluster = self.input_paths[0: self.data_num_cluster]
-                        self.label_paths_cluster = self.label_paths[0: self.data_num_cluster]
+                        self._set_cluster(0)
                         print('---Next epoch---')
 
                 # Load dataset in the next cluster
@@ -55,10 +55,10 @@ def do_eval_per(session, per_op, network, dataset,
                 batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         batch_size_each = len(labels_true)
@@ -119,10 +119,10 @@ def do_eval_cer(session, decode_op, network, dataset, label_type, is_test=None,
                     batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         batch_size_each = len(labels_true)
@@ -181,10 +181,10 @@ def decode_test(session, decode_op, network, dataset, label_type, is_test,
             batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         # Visualize
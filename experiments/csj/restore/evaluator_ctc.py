@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Evaluate checkpoints of CTC network while training (CSJ corpus).
+   Run this alongside train_ctc.py (with `async_eval: True` in the config)
+   so that the trainer never stops for evaluation.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from os.path import join, isfile
+import sys
+import time
+import tensorflow as tf
+import yaml
+
+sys.path.append('../')
+sys.path.append('../../')
+sys.path.append('../../../')
+from data.read_dataset_ctc import DataSet
+from models.ctc.load_model import load
+from evaluation.eval_ctc import do_eval_per, do_eval_cer
+from utils.session_config import load_session_config, apply_tuned_affinity
+
+
+def saved_checkpoints(model_dir):
+    """Return the paths of saved checkpoints in the order they were saved.
+    Args:
+        model_dir: directory the trainer saves checkpoints to
+    Returns:
+        model_paths: list of paths to checkpoints
+    """
+    ckpt = tf.train.get_checkpoint_state(model_dir)
+    if ckpt is None:
+        return []
+    return list(ckpt.all_model_checkpoint_paths)
+
+
+def load_results(result_path):
+    """Load evaluation results written before.
+    Args:
+        result_path: path to the csv file of results
+    Returns:
+        results:
+            key => checkpoint name
+            value => list of errors (dev, eval1, eval2, eval3)
+    """
+    results = {}
+    if isfile(result_path):
+        with open(result_path, 'r') as f:
+            for line in f:
+                line = line.strip().split(',')
+                if len(line) < 2 or line[0] == 'checkpoint':
+                    continue
+                results[line[0]] = [float(error) for error in line[1:]]
+    return results
+
+
+def do_evaluate(network, label_type, num_stack, num_skip, train_data_size,
+                cache_dir=None, num_thread=None, interval=60):
+    """Evaluate every new checkpoint on dev, eval1, eval2 and eval3.
+       Results are appended to `eval_results.csv` in network.model_dir, and
+       the checkpoint with the lowest dev error is written to
+       `best_checkpoint.txt`. Stop when the trainer writes `complete.txt` and
+       all checkpoints have been evaluated.
+    Args:
+        network: model to evaluate
+        label_type: phone or character or kanji
+        num_stack: int, the number of frames to stack
+        num_skip: int, the number of frames to skip
+        train_data_size: default or large
+        cache_dir: path to the directory to cache frame-stacked inputs
+        num_thread: int, the number of CPU threads used for evaluation. If
+            None, the tuned settings of this host are used
+        interval: int, seconds to wait for new checkpoints
+    """
+    # Load dataset
+    dataset_dict = {}
+    for data_type in ['dev', 'eval1', 'eval2', 'eval3']:
+        dataset_dict[data_type] = DataSet(data_type=data_type,
+                                          label_type=label_type,
+                                          train_data_size=train_data_size,
+                                          num_stack=num_stack,
+                                          num_skip=num_skip,
+                                          is_sorted=False,
+                                          cache_dir=cache_dir,
+                                          is_fixed_batch=True)
+
+    # Define model
+    network.define()
+
+    # Add to the graph each operation
+    decode_op = network.decoder(decode_type='beam_search',
+                                beam_width=20)
+    per_op = network.ler(decode_op)
+
+    # Create a saver for restoring checkpoints
+    saver = tf.train.Saver()
+
+    result_path = join(network.model_dir, 'eval_results.csv')
+    results = load_results(result_path)
+    if not isfile(result_path):
+        with open(result_path, 'w') as f:
+            f.write('checkpoint,dev,eval1,eval2,eval3\n')
+
+    # Run on CPUs so that GPUs are left to the trainer
+    apply_tuned_affinity(mode='inference', network=network)
+    config = load_session_config(mode='inference', network=network,
+                                 device_count={'GPU': 0},
+                                 intra_op_parallelism_threads=num_thread,
+                                 inter_op_parallelism_threads=num_thread)
+    with tf.Session(config=config) as sess:
+        while True:
+            # Check whether training has finished before listing checkpoints
+            is_complete = isfile(join(network.model_dir, 'complete.txt'))
+            model_paths = [model_path
+                           for model_path in saved_checkpoints(network.model_dir)
+                           if os.path.basename(model_path) not in results]
+
+            if len(model_paths) == 0:
+                if is_complete:
+                    break
+                time.sleep(interval)
+                continue
+
+            for model_path in model_paths:
+                start_time_eval = time.time()
+                saver.restore(sess, model_path)
+                print("Model restored: " + model_path)
+
+                errors = []
+                for data_type in ['dev', 'eval1', 'eval2', 'eval3']:
+                    print('■%s Evaluation:■' % data_type)
+                    if label_type in ['character', 'kanji']:
+                        error = do_eval_cer(session=sess,
+                                            decode_op=decode_op,
+                                            network=network,
+                                            dataset=dataset_dict[data_type],
+                                            label_type=label_type,
+                                            is_test=data_type != 'dev',
+                                            eval_batch_size=network.batch_size)
+                    else:
+                        error = do_eval_per(session=sess,
+                                            per_op=per_op,
+                                            network=network,
+                                            dataset=dataset_dict[data_type],
+                                            eval_batch_size=network.batch_size)
+                    # NOTE: None is returned when decoding failed
+                    errors.append(error if error is not None else 1.)
+
+                checkpoint_name = os.path.basename(model_path)
+                results[checkpoint_name] = errors
+                with open(result_path, 'a') as f:
+                    f.write(checkpoint_name + ',' +
+                            ','.join([str(error) for error in errors]) + '\n')
+
+                # Update the best checkpoint (by dev error)
+                best_name = min(results.keys(), key=lambda x: results[x][0])
+                if best_name == checkpoint_name:
+                    print('■■■ ↑Best Score↑ ■■■')
+                    with open(join(network.model_dir, 'best_checkpoint.txt'), 'w') as f:
+                        f.write(checkpoint_name + '\n')
+                        f.write('dev: %f\n' % errors[0])
+                        f.write('eval mean: %f\n' % (sum(errors[1:]) / 3.))
+
+                duration_eval = time.time() - start_time_eval
+                print('Evaluation time: %.3f min' % (duration_eval / 60))
+                sys.stdout.flush()
+
+
+def main(model_path, num_thread):
+
+    # Read config file (.yml)
+    with open(join(model_path, 'config.yml'), "r") as f:
+        config = yaml.load(f)
+        corpus = config['corpus']
+        feature = config['feature']
+        param = config['param']
+
+    # NOTE: output size must be the same as train_ctc.py
+    if corpus['label_type'] == 'phone':
+        output_size = 38
+    elif corpus['label_type'] == 'character':
+        output_size = 147
+    elif corpus['label_type'] == 'kanji':
+        output_size = 3386
+
+    # Model setting
+    CTCModel = load(model_type=config['model_name'])
+    network = CTCModel(batch_size=param['batch_size'],
+                       input_size=feature['input_size'] * feature['num_stack'],
+                       num_cell=param['num_cell'],
+                       num_layer=param['num_layer'],
+                       bottleneck_dim=param['bottleneck_dim'],
+                       output_size=output_size,
+                       clip_grad=param['clip_grad'],
+                       clip_activation=param['clip_activation'],
+                       dropout_ratio_input=param['dropout_input'],
+                       dropout_ratio_hidden=param['dropout_hidden'],
+                       num_proj=param['num_proj'],
+                       weight_decay=param['weight_decay'])
+    network.num_stack = feature['num_stack']
+    network.model_name = config['model_name']
+    network.model_dir = model_path
+    network.use_xla = param.get('xla', False)
+
+    print(network.model_dir)
+    do_evaluate(network=network,
+                label_type=corpus['label_type'],
+                num_stack=feature['num_stack'],
+                num_skip=feature['num_skip'],
+                train_data_size=corpus['train_data_size'],
+                cache_dir=feature.get('cache_dir'),
+                num_thread=num_thread)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) not in [2, 3]:
+        raise ValueError(("Set a path to saved model.\n"
+                          "Usase: python evaluator_ctc.py path_to_saved_model (num_thread)"))
+
+    num_thread = int(args[2]) if len(args) == 3 else None
+    main(model_path=args[1], num_thread=num_thread)
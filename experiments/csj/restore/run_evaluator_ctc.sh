@@ -0,0 +1,13 @@
+#!/bin/zsh
+
+# select CPU cores
+if [ $# -lt 2 ]; then
+  echo "Error: set CPU cores & path to saved model." 1>&2
+  echo "Usage: ./run_evaluator_ctc.sh cpu_list path_to_saved_model (num_thread)." 1>&2
+  exit 1
+fi
+
+PYTHON=/home/lab5/inaguma/.pyenv/versions/anaconda3-4.1.1/bin/python
+
+# Evaluate on CPUs only (e.g. cpu_list=8-11)
+CUDA_VISIBLE_DEVICES= nohup taskset -c $1 $PYTHON evaluator_ctc.py $2 $3 > $2/evaluator.log &
@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Find the batch size for a CTC config (CSJ corpus).
+   Mini-batches are padded to the longest utterance in the training set.
+   Usage:
+       python find_batch_size_ctc.py path_to_config [memory_limit_mb] [--update]
+   With --update, batch_size in the config file is rewritten.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from os.path import join
+import re
+import sys
+import pickle
+import yaml
+
+sys.path.append('../')
+sys.path.append('../../')
+sys.path.append('../../../')
+from utils.data.ctc_feasibility import decimated_frame_num
+from utils.batch_size_finder import find_batch_size
+
+
+def max_frame_num(label_type, train_data_size, num_skip):
+    """Return the number of frames of the longest training utterance.
+    Args:
+        label_type: phone or character or kanji
+        train_data_size: default or large
+        num_skip: int, the number of frames to skip
+    Returns:
+        max_time: int, the number of frames after skipping
+    """
+    dataset_path = join('/n/sd8/inaguma/corpus/csj/dataset/monolog/ctc/',
+                        label_type, train_data_size, 'train')
+    with open(join(dataset_path, 'frame_num.pickle'), 'rb') as f:
+        frame_num_dict = pickle.load(f)
+    return decimated_frame_num(max(frame_num_dict.values()), num_skip)
+
+
+def main(config_path, memory_limit=None, is_update=False):
+
+    # Read a config file (.yml)
+    with open(config_path, "r") as f:
+        config = yaml.load(f)
+        corpus = config['corpus']
+        feature = config['feature']
+        param = config['param']
+
+    if corpus['label_type'] == 'phone':
+        output_size = 38
+    elif corpus['label_type'] == 'character':
+        output_size = 147
+    elif corpus['label_type'] == 'kanji':
+        output_size = 3386
+
+    max_time = max_frame_num(corpus['label_type'], corpus['train_data_size'],
+                             feature['num_skip'])
+    print('Longest utterance: %d frames' % max_time)
+
+    results, batch_size = find_batch_size(
+        model_type=config['model_name'],
+        max_time=max_time,
+        input_size=feature['input_size'] * feature['num_stack'],
+        output_size=output_size,
+        num_cell=param['num_cell'],
+        num_layer=param['num_layer'],
+        num_proj=param['num_proj'],
+        bottleneck_dim=param.get('bottleneck_dim'),
+        swap_memory=param.get('swap_memory', False),
+        num_stack=feature['num_stack'],
+        memory_limit=memory_limit)
+    if batch_size is None:
+        raise ValueError('No batch size fits in memory.')
+
+    print('Recommended batch size: %d (current: %d)' %
+          (batch_size, param['batch_size']))
+    print('Frame budget: %d frames per mini batch' % (batch_size * max_time))
+
+    if is_update:
+        # Keep comments & the order of keys in the config file
+        with open(config_path, 'r') as f:
+            text = f.read()
+        text = re.sub(r'(\n\s+batch_size:\s*)\d+', r'\g<1>%d' % batch_size,
+                      text, count=1)
+        with open(config_path, 'w') as f:
+            f.write(text)
+        print('Updated %s' % config_path)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    is_update = '--update' in args
+    args = [arg for arg in args if arg != '--update']
+    if len(args) not in [2, 3]:
+        raise ValueError(("Set a config path.\n"
+                          "Usage: python find_batch_size_ctc.py path_to_config [memory_limit_mb] [--update]"))
+
+    memory_limit = int(args[2]) * 1024 ** 2 if len(args) == 3 else None
+    main(config_path=args[1], memory_limit=memory_limit, is_update=is_update)
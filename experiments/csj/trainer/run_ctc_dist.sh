@@ -0,0 +1,45 @@
+#!/bin/zsh
+
+# Launch parameter servers & workers as local processes
+if [ $# -ne 4 ]; then
+  echo "Error: set config path, the numbers of ps & workers and base port." 1>&2
+  echo "Usage: ./run_ctc_dist.sh path_to_config_file num_ps num_worker base_port" 1>&2
+  exit 1
+fi
+
+# GPU setting
+export PATH=$PATH:/usr/local/cuda-8.0/bin
+export LD_LIBRARY_PATH=$LD_LIBRARY_PATH:/usr/local/cuda-8.0/lib64
+PYTHON=/home/lab5/inaguma/.pyenv/versions/anaconda3-4.1.1/bin/python
+
+num_ps=$2
+num_worker=$3
+port=$4
+
+ps_hosts=""
+for i in $(seq 0 $((num_ps - 1))); do
+  ps_hosts=$ps_hosts"localhost:"$((port + i))","
+done
+ps_hosts=${ps_hosts%,}
+
+worker_hosts=""
+for i in $(seq 0 $((num_worker - 1))); do
+  worker_hosts=$worker_hosts"localhost:"$((port + num_ps + i))","
+done
+worker_hosts=${worker_hosts%,}
+
+filename=$(basename $1 | awk -F. '{print $1}')
+mkdir -p log
+
+# Parameter servers do not use GPUs
+for i in $(seq 0 $((num_ps - 1))); do
+  CUDA_VISIBLE_DEVICES= nohup $PYTHON train_ctc_dist.py $1 ps $i $ps_hosts $worker_hosts > log/$filename"_ps"$i".log" 2>&1 &
+done
+
+# One GPU per worker
+for i in $(seq 0 $((num_worker - 1))); do
+  CUDA_VISIBLE_DEVICES=$i nohup $PYTHON train_ctc_dist.py $1 worker $i $ps_hosts $worker_hosts > log/$filename"_worker"$i".log" 2>&1 &
+done
+
+# Stop parameter servers after training:
+# pkill -f "train_ctc_dist.py $1 ps"
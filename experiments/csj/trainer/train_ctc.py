@@ -11,6 +11,7 @@ import os
 from os.path import join
 import sys
 import time
+import numpy as np
 import tensorflow as tf
 from setproctitle import setproctitle
 import yaml
@@ -25,13 +26,27 @@ from evaluation.eval_ctc import do_eval_per, do_eval_cer
 from utils.data.sparsetensor import list2sparsetensor, sparsetensor2list
 from utils.util import mkdir, mkdir_join
 from utils.parameter import count_total_parameters
-from utils.loss import save_loss
+from utils.cost import estimate_cost, format_cost
+from utils.session_config import load_session_config, apply_tuned_affinity
+from utils.metrics_sink import MetricsSink
+from utils.dev_monitor import DevMonitor
+from utils.step_timer import StepTimer
+from utils.trace import TraceHook
+from utils.train_state import save_train_state, load_train_state
+from utils.train_state import make_resume_callback
+from utils.checkpoint import CheckpointManager
 from utils.labels.phone import num2phone
 from utils.labels.character import num2char
 
 
 def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
-             label_type, num_stack, num_skip, train_data_size):
+             label_type, num_stack, num_skip, train_data_size,
+             cache_dir=None, max_cluster_bytes=None,
+             shuffle_buffer_size=None, dev_interval=100, dev_num_batch=10,
+             is_async_eval=False, trace_interval=0,
+             num_accumulate=1, num_tower=1, summary_interval=100,
+             is_resume=False, resume_interval=0, keep_last=3, keep_best=3,
+             keep_every=0, is_slim_export=False):
     """Run training.
     Args:
         network: network to train
@@ -43,56 +58,127 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
         num_stack: int, the number of frames to stack
         num_skip: int, the number of frames to skip
         train_data_size: default or large
+        cache_dir: path to the directory to cache frame-stacked inputs
+        max_cluster_bytes: int, the maximum size of inputs in one cluster of
+            the training set
+        shuffle_buffer_size: int, the number of utterances in the shuffle
+            buffer of the training set
+        dev_interval: int, compute the dev loss every dev_interval steps
+        dev_num_batch: int, the number of mini-batches of the dev set used to
+            monitor the loss
+        is_async_eval: if True, do not evaluate checkpoints in the trainer.
+            Run restore/evaluator_ctc.py alongside instead
+        trace_interval: int, save timelines of training & decoding every
+            trace_interval steps. If 0, never trace
+        summary_interval: int, write summaries & print the progress every
+            summary_interval steps
+        num_accumulate: int, the number of micro-batches of batch_size to
+            accumulate gradients over. Steps are counted in micro-batches, and
+            parameters are updated every num_accumulate steps with the same
+            learning rate. An epoch is rounded up to a multiple of
+            num_accumulate steps
+        num_tower: int, the number of towers to split each mini batch into
+            for data-parallel training
+        is_resume: if True, restore the last saved state in network.model_dir
+            and continue training from it
+        resume_interval: int, save a state to resume from every
+            resume_interval steps in addition to every epoch. If 0, save only
+            every epoch
+        keep_last: int, keep the checkpoints of the last keep_last epochs
+        keep_best: int, keep the checkpoints of the keep_best epochs with the
+            lowest dev errors. With is_async_eval, checkpoints are never
+            removed until restore/evaluator_ctc.py evaluates them
+        keep_every: int, keep the checkpoints of every keep_every-th epoch.
+            If 0, not used
+        is_slim_export: if True, also save trainable variables only to
+            network.model_dir/slim
     """
     # Load dataset
     train_data = DataSet(data_type='train', label_type=label_type,
                          train_data_size=train_data_size,
                          num_stack=num_stack, num_skip=num_skip,
-                         is_sorted=True)
+                         is_sorted=True, cache_dir=cache_dir,
+                         is_filtered=True,
+                         max_cluster_bytes=max_cluster_bytes,
+                         shuffle_buffer_size=shuffle_buffer_size)
     dev_data = DataSet(data_type='dev', label_type=label_type,
                        train_data_size=train_data_size,
                        num_stack=num_stack, num_skip=num_skip,
-                       is_sorted=False)
-    eval1_data = DataSet(data_type='eval1', label_type=label_type,
-                         train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip,
-                         is_sorted=False)
-    eval2_data = DataSet(data_type='eval2', label_type=label_type,
-                         train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip,
-                         is_sorted=False)
-    eval3_data = DataSet(data_type='eval3', label_type=label_type,
-                         train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip,
-                         is_sorted=False)
+                       is_sorted=False, cache_dir=cache_dir,
+                       is_fixed_batch=True)
+    if not is_async_eval:
+        eval1_data = DataSet(data_type='eval1', label_type=label_type,
+                             train_data_size=train_data_size,
+                             num_stack=num_stack, num_skip=num_skip,
+                             is_sorted=False, cache_dir=cache_dir,
+                             is_fixed_batch=True)
+        eval2_data = DataSet(data_type='eval2', label_type=label_type,
+                             train_data_size=train_data_size,
+                             num_stack=num_stack, num_skip=num_skip,
+                             is_sorted=False, cache_dir=cache_dir,
+                             is_fixed_batch=True)
+        eval3_data = DataSet(data_type='eval3', label_type=label_type,
+                             train_data_size=train_data_size,
+                             num_stack=num_stack, num_skip=num_skip,
+                             is_sorted=False, cache_dir=cache_dir,
+                             is_fixed_batch=True)
+
+    # Cache a fixed subset of the dev set to monitor the loss during training
+    dev_monitor = DevMonitor(dev_data, batch_size=batch_size,
+                             num_batch=dev_num_batch, interval=dev_interval)
 
     # Tell TensorFlow that the model will be built into the default graph
     with tf.Graph().as_default():
 
         # Define model
-        network.define()
+        if num_tower > 1:
+            network.define_towers(num_tower)
+        else:
+            network.define()
         # NOTE: define model under tf.Graph()
 
         # Add to the graph each operation
         loss_op = network.loss()
         train_op = network.train(optimizer=optimizer,
                                  learning_rate_init=learning_rate,
-                                 is_scheduled=False)
+                                 is_scheduled=False,
+                                 num_accumulate=num_accumulate)
+        # Greedy decoding to monitor training (LER summaries are attached)
+        decode_op_monitor = network.decoder(decode_type='greedy')
+        per_op_monitor = network.ler(decode_op_monitor)
+        # Beam search decoding for evaluation
         decode_op = network.decoder(decode_type='beam_search',
                                     beam_width=20)
-        per_op = network.ler(decode_op)
+        per_op = network.ler(decode_op, is_summary=False)
 
         # Build the summary tensor based on the TensorFlow collection of
         # summaries
         summary_train = tf.summary.merge(network.summaries_train)
         summary_dev = tf.summary.merge(network.summaries_dev)
+        if network.summary_level == 'full':
+            summary_statistics = tf.summary.merge(
+                network.summaries_statistics)
 
         # Add the variable initializer operation
         init_op = tf.global_variables_initializer()
 
-        # Create a saver for writing training checkpoints
+        # Create a saver for restoring checkpoints to resume from
         saver = tf.train.Saver(max_to_keep=None)
 
+        # Write checkpoints in the background & remove old ones. With
+        # is_async_eval, checkpoints are kept until the evaluator restores them
+        result_path = None
+        if is_async_eval:
+            result_path = join(network.model_dir, 'eval_results.csv')
+        checkpoint_manager = CheckpointManager(network.model_dir,
+                                               keep_last=keep_last,
+                                               keep_best=keep_best,
+                                               keep_every=keep_every,
+                                               is_slim=is_slim_export,
+                                               result_path=result_path)
+        resume_manager = CheckpointManager(join(network.model_dir, 'resume'),
+                                           keep_last=1, keep_best=0)
+
         # Count total parameters
         parameters_dict, total_parameters = count_total_parameters(
             tf.trainable_variables())
@@ -101,11 +187,21 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
         print("Total %d variables, %s M parameters" %
               (len(parameters_dict.keys()), "{:,}".format(total_parameters / 1000000)))
 
-        csv_steps = []
-        csv_train_loss = []
-        csv_dev_loss = []
+        # Estimate computational cost
+        # Towers are placed on CPU devices
+        is_gpu = num_tower == 1 and tf.test.is_gpu_available()
+        print(format_cost(estimate_cost(network, num_skip=num_skip,
+                                        is_gpu=is_gpu)))
+
         # Create a session for running operation on the graph
-        with tf.Session() as sess:
+        apply_tuned_affinity(network=network)
+        if num_tower > 1:
+            # Create a CPU device for each tower
+            config = load_session_config(network=network,
+                                         device_count={'CPU': num_tower})
+        else:
+            config = load_session_config(network=network)
+        with tf.Session(config=config) as sess:
             # Instantiate a SummaryWriter to output summaries and the graph
             summary_writer = tf.summary.FileWriter(
                 network.model_dir, sess.graph)
@@ -113,100 +209,184 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
             # Initialize parameters
             sess.run(init_op)
 
+            # Restore parameters, the global step & the data position
+            start_step = 0
+            error_best = 1
+            state = load_train_state(network.model_dir) if is_resume else None
+            if state is not None:
+                saver.restore(sess, state['checkpoint_path'])
+                start_step = state['step']
+                error_best = state['error_best']
+                train_data.set_state(state['data_state'])
+                print('=> Resumed from %s (step %d)' %
+                      (state['checkpoint_path'], start_step))
+
             # Train model
             iter_per_epoch = int(train_data.data_num / batch_size)
             if (train_data.data_num / batch_size) != int(train_data.data_num / batch_size):
                 iter_per_epoch += 1
+            if iter_per_epoch % num_accumulate != 0:
+                # Round up to whole parameter updates so that accumulated
+                # gradients never spill over epochs or remain at the end
+                iter_per_epoch += num_accumulate - iter_per_epoch % num_accumulate
             max_steps = iter_per_epoch * epoch_num
             start_time_train = time.time()
             start_time_epoch = time.time()
             start_time_step = time.time()
-            error_best = 1
-            for step in range(max_steps):
+            loss_dev = np.nan
+            timer = StepTimer(phases=['data', 'feed', 'train', 'dev', 'trace',
+                                      'summary', 'decode', 'print'],
+                              save_path=network.model_dir,
+                              start_step=start_step)
+            trace_hook = TraceHook(save_path=join(network.model_dir, 'trace'),
+                                   interval=trace_interval)
+            # Losses are appended to loss.csv as training goes
+            metrics_sink = MetricsSink(network.model_dir,
+                                       start_step=start_step)
+            for step in range(start_step, max_steps):
                 # Create feed dictionary for next mini batch (train)
-                inputs, labels, seq_len, _ = train_data.next_batch(
-                    batch_size=batch_size)
-                indices, values, dense_shape = list2sparsetensor(labels)
-                feed_dict_train = {
-                    network.inputs_pl: inputs,
-                    network.label_indices_pl: indices,
-                    network.label_values_pl: values,
-                    network.label_shape_pl: dense_shape,
-                    network.seq_len_pl: seq_len,
-                    network.keep_prob_input_pl: network.dropout_ratio_input,
-                    network.keep_prob_hidden_pl: network.dropout_ratio_hidden,
-                    network.lr_pl: learning_rate
-                }
-
-                # Create feed dictionary for next mini batch (dev)
-                inputs, labels, seq_len, _ = dev_data.next_batch(
-                    batch_size=batch_size)
-                indices, values, dense_shape = list2sparsetensor(labels)
-                feed_dict_dev = {
-                    network.inputs_pl: inputs,
-                    network.label_indices_pl: indices,
-                    network.label_values_pl: values,
-                    network.label_shape_pl: dense_shape,
-                    network.seq_len_pl: seq_len,
-                    network.keep_prob_input_pl: network.dropout_ratio_input,
-                    network.keep_prob_hidden_pl: network.dropout_ratio_hidden
-                }
-
-                # Update parameters & compute loss
-                _, loss_train = sess.run(
-                    [train_op, loss_op], feed_dict=feed_dict_train)
-                loss_dev = sess.run(loss_op, feed_dict=feed_dict_dev)
-                csv_steps.append(step)
-                csv_train_loss.append(loss_train)
-                csv_dev_loss.append(loss_dev)
-
-                if (step + 1) % 100 == 0:
-                    # Change feed dict for evaluation
-                    feed_dict_train[network.keep_prob_input_pl] = 1.0
-                    feed_dict_train[network.keep_prob_hidden_pl] = 1.0
-                    feed_dict_dev[network.keep_prob_input_pl] = 1.0
-                    feed_dict_dev[network.keep_prob_hidden_pl] = 1.0
+                with timer.phase('data'):
+                    inputs, labels, seq_len, _ = train_data.next_batch(
+                        batch_size=batch_size)
+                    metrics_sink.add_batch(inputs, seq_len)
+                with timer.phase('feed'):
+                    indices, values, dense_shape = list2sparsetensor(labels)
+                    feed_dict_train = {
+                        network.inputs: inputs,
+                        network.label_indices: indices,
+                        network.label_values: values,
+                        network.label_shape: dense_shape,
+                        network.seq_len: seq_len,
+                        network.keep_prob_input: network.dropout_ratio_input,
+                        network.keep_prob_hidden: network.dropout_ratio_hidden,
+                        network.learning_rate: learning_rate
+                    }
+
+                # Update parameters & compute loss. At summary steps, LER &
+                # summaries are also computed from the same forward pass
+                is_summary_step = (step + 1) % summary_interval == 0
+                with timer.phase('train'):
+                    if num_accumulate == 1:
+                        op_train = train_op
+                    else:
+                        # Accumulate gradients of the micro-batch
+                        op_train = network.accumulate_op
+                    if not is_summary_step:
+                        fetches_train = network.step_fetches(op_train)
+                    elif network.summary_level == 'none':
+                        fetches_train = network.step_fetches(
+                            op_train, ler_op=per_op_monitor)
+                    else:
+                        fetches_train = network.step_fetches(
+                            op_train, ler_op=per_op_monitor,
+                            summary_op=summary_train)
+                    if trace_hook.is_step(step):
+                        results_train, _ = trace_hook.run(
+                            sess, fetches_train, feed_dict_train,
+                            step=step + 1, tag='train',
+                            summary_writer=summary_writer)
+                    else:
+                        results_train = sess.run(
+                            fetches_train, feed_dict=feed_dict_train)
+                    loss_train = results_train['loss']
+
+                    # Update parameters by the accumulated gradients
+                    if num_accumulate > 1 and (step + 1) % num_accumulate == 0:
+                        sess.run(train_op, feed_dict={
+                            network.learning_rate: learning_rate})
+
+                # Compute loss on the cached dev subset at intervals
+                if dev_monitor.is_step(step):
+                    with timer.phase('dev'):
+                        loss_dev = dev_monitor.evaluate(
+                            sess, network, loss_op,
+                            summary_writer=summary_writer, step=step + 1)
+                    metrics_sink.add_loss(step, loss_train, loss_dev)
+                else:
+                    metrics_sink.add_loss(step, loss_train)
+
+                # Trace decoding on the dev set
+                if trace_hook.is_step(step):
+                    with timer.phase('trace'):
+                        feed_dict_trace, _ = dev_monitor.next_feed_dict(
+                            network)
+                        trace_hook.run(sess, [per_op, decode_op],
+                                       feed_dict_trace, step=step + 1,
+                                       tag='decode',
+                                       summary_writer=summary_writer)
+
+                if is_summary_step:
+                    feed_dict_dev, labels = dev_monitor.next_feed_dict(network)
 
                     # Compute accuracy & \update event file
-                    ler_train, summary_str_train = sess.run([per_op, summary_train],
-                                                            feed_dict=feed_dict_train)
-                    ler_dev, summary_str_dev, labels_st = sess.run([per_op, summary_dev, decode_op],
-                                                                   feed_dict=feed_dict_dev)
-                    summary_writer.add_summary(summary_str_train, step + 1)
-                    summary_writer.add_summary(summary_str_dev, step + 1)
-                    summary_writer.flush()
+                    with timer.phase('summary'):
+                        ler_train = results_train['ler']
+                        if network.summary_level == 'none':
+                            ler_dev, labels_st = sess.run(
+                                [per_op_monitor, decode_op_monitor],
+                                feed_dict=feed_dict_dev)
+                        else:
+                            ler_dev, summary_str_dev, labels_st = sess.run(
+                                [per_op_monitor, summary_dev,
+                                 decode_op_monitor],
+                                feed_dict=feed_dict_dev)
+                            summary_writer.add_summary(
+                                results_train['summary'], step + 1)
+                            summary_writer.add_summary(summary_str_dev, step + 1)
+                            if network.summary_level == 'full':
+                                summary_writer.add_summary(
+                                    sess.run(summary_statistics), step + 1)
+                            summary_writer.flush()
 
                     # Decode
-                    try:
-                        labels_pred = sparsetensor2list(labels_st, batch_size)
-                    except:
-                        labels_pred = [[0] * batch_size]
-
-                    duration_step = time.time() - start_time_step
-                    print('Step %d: loss = %.3f (%.3f) / ler = %.4f (%.4f) (%.3f min)' %
-                          (step + 1, loss_train, loss_dev, ler_train, ler_dev, duration_step / 60))
-                    # print('Step %d: loss = %.3f / ler = %.4f (%.3f min)' %
-                    #       (step + 1, loss_train, ler_train, duration_step / 60))
-
-                    if label_type == 'kanji':
-                        map_file_path = '../evaluation/mapping_files/ctc/kanji2num.txt'
-                        print('True: %s' % num2char(labels[-1], map_file_path))
-                        print('Pred: %s' % num2char(
-                            labels_pred[-1], map_file_path))
-                    elif label_type == 'character':
-                        map_file_path = '../evaluation/mapping_files/ctc/char2num.txt'
-                        print('True: %s' % num2char(labels[-1], map_file_path))
-                        print('Pred: %s' % num2char(
-                            labels_pred[-1], map_file_path))
-                    elif label_type == 'phone':
-                        map_file_path = '../evaluation/mapping_files/ctc/phone2num.txt'
-                        print('True: %s' % num2phone(
-                            labels[-1], map_file_path))
-                        print('Pred: %s' % num2phone(
-                            labels_pred[-1], map_file_path))
+                    with timer.phase('decode'):
+                        try:
+                            labels_pred = sparsetensor2list(
+                                labels_st, batch_size)
+                        except:
+                            labels_pred = [[0] * batch_size]
+
+                    with timer.phase('print'):
+                        duration_step = time.time() - start_time_step
+                        print('Step %d: loss = %.3f (%.3f) / ler = %.4f (%.4f) (%.3f min)' %
+                              (step + 1, loss_train, loss_dev, ler_train, ler_dev, duration_step / 60))
+                        if num_accumulate > 1:
+                            print('  (%d parameter updates, effective batch size %d)' %
+                                  ((step + 1) // num_accumulate,
+                                   batch_size * num_accumulate))
+                        print('  (dev monitor: %.3f min in total)' %
+                              (dev_monitor.duration / 60))
+
+                        if label_type == 'kanji':
+                            map_file_path = '../evaluation/mapping_files/ctc/kanji2num.txt'
+                            print('True: %s' % num2char(
+                                labels[-1], map_file_path))
+                            print('Pred: %s' % num2char(
+                                labels_pred[-1], map_file_path))
+                        elif label_type == 'character':
+                            map_file_path = '../evaluation/mapping_files/ctc/char2num.txt'
+                            print('True: %s' % num2char(
+                                labels[-1], map_file_path))
+                            print('Pred: %s' % num2char(
+                                labels_pred[-1], map_file_path))
+                        elif label_type == 'phone':
+                            map_file_path = '../evaluation/mapping_files/ctc/phone2num.txt'
+                            print('True: %s' % num2phone(
+                                labels[-1], map_file_path))
+                            print('Pred: %s' % num2phone(
+                                labels_pred[-1], map_file_path))
+                    timer.end_step()
+
+                    # Write the breakdown of step time & throughput
+                    stats = timer.report(summary_writer, step + 1)
+                    print('  ' + timer.format(stats))
+                    stats = metrics_sink.report(summary_writer, step + 1)
+                    print('  ' + metrics_sink.format(stats))
 
                     sys.stdout.flush()
                     start_time_step = time.time()
+                else:
+                    timer.end_step()
 
                 # Save checkpoint and evaluate model per epoch
                 if (step + 1) % iter_per_epoch == 0 or (step + 1) == max_steps:
@@ -215,103 +395,135 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
                     print('-----EPOCH:%d (%.3f min)-----' %
                           (epoch, duration_epoch / 60))
 
-                    # Save model (check point)
-                    checkpoint_file = join(network.model_dir, 'model.ckpt')
-                    save_path = saver.save(
-                        sess, checkpoint_file, global_step=epoch)
-                    print("Model saved in file: %s" % save_path)
-
-                    start_time_eval = time.time()
-                    if label_type in ['character', 'kanji']:
-                        print('■Dev Evaluation:■')
-                        error_epoch = do_eval_cer(session=sess,
-                                                  decode_op=decode_op,
-                                                  network=network,
-                                                  dataset=dev_data,
-                                                  label_type=label_type,
-                                                  eval_batch_size=batch_size)
-
-                        if error_epoch < error_best:
-                            error_best = error_epoch
-                            print('■■■ ↑Best Score (CER)↑ ■■■')
-
-                            print('■eval1 Evaluation:■')
-                            cer_eval1 = do_eval_cer(session=sess,
-                                                    decode_op=decode_op,
-                                                    network=network,
-                                                    dataset=eval1_data,
-                                                    label_type=label_type,
-                                                    is_test=True,
-                                                    eval_batch_size=batch_size)
-                            print('■eval2 Evaluation:■')
-                            cer_eval2 = do_eval_cer(session=sess,
-                                                    decode_op=decode_op,
-                                                    network=network,
-                                                    dataset=eval2_data,
-                                                    label_type=label_type,
-                                                    is_test=-True,
-                                                    eval_batch_size=batch_size)
-                            print('■eval3 Evaluation:■')
-                            cer_eval3 = do_eval_cer(session=sess,
-                                                    decode_op=decode_op,
-                                                    network=network,
-                                                    dataset=eval3_data,
-                                                    label_type=label_type,
-                                                    is_test=True,
-                                                    eval_batch_size=batch_size)
-                            cer_mean = (cer_eval1 + cer_eval2 + cer_eval3) / 3.
-                            print('■Mean:■')
-                            print('  CER: %f %%' %
-                                  (cer_mean * 100))
-
+                    # Save model (check point) in the background, and the
+                    # state to resume from this epoch after it is written
+                    metrics_sink.flush()
+                    data_state = train_data.get_state()
+                    checkpoint_manager.save(
+                        sess, epoch,
+                        callback=make_resume_callback(
+                            network.model_dir, step + 1, error_best,
+                            data_state))
+
+                    if is_async_eval:
+                        # Remove checkpoints by the dev errors of the evaluator
+                        checkpoint_manager.set_scores_from_results()
                     else:
-                        print('■Dev Evaluation:■')
-                        error_epoch = do_eval_per(session=sess,
-                                                  per_op=per_op,
-                                                  network=network,
-                                                  dataset=dev_data,
-                                                  eval_batch_size=batch_size)
-
-                        if error_epoch < error_best:
-                            error_best = error_epoch
-                            print('■■■ ↑Best Score (PER)↑ ■■■')
-
-                            print('■eval1 Evaluation:■')
-                            per_eval1 = do_eval_per(session=sess,
-                                                    per_op=per_op,
-                                                    network=network,
-                                                    dataset=eval1_data,
-                                                    eval_batch_size=batch_size)
-                            print('■eval2 Evaluation:■')
-                            per_eval2 = do_eval_per(session=sess,
-                                                    per_op=per_op,
-                                                    network=network,
-                                                    dataset=eval2_data,
-                                                    eval_batch_size=batch_size)
-                            print('■eval3 Evaluation:■')
-                            per_eval3 = do_eval_per(session=sess,
-                                                    per_op=per_op,
-                                                    network=network,
-                                                    dataset=eval3_data,
-                                                    eval_batch_size=batch_size)
-                            per_mean = (per_eval1 + per_eval2 + per_eval3) / 3.
-                            print('■Mean:■')
-                            print('  PER: %f %%' %
-                                  (per_mean * 100))
-
-                    duration_eval = time.time() - start_time_eval
-                    print('Evaluation time: %.3f min' %
-                          (duration_eval / 60))
+                        start_time_eval = time.time()
+                        if label_type in ['character', 'kanji']:
+                            print('■Dev Evaluation:■')
+                            error_epoch = do_eval_cer(session=sess,
+                                                      decode_op=decode_op,
+                                                      network=network,
+                                                      dataset=dev_data,
+                                                      label_type=label_type,
+                                                      eval_batch_size=batch_size)
+
+                            if error_epoch < error_best:
+                                error_best = error_epoch
+                                print('■■■ ↑Best Score (CER)↑ ■■■')
+
+                                print('■eval1 Evaluation:■')
+                                cer_eval1 = do_eval_cer(session=sess,
+                                                        decode_op=decode_op,
+                                                        network=network,
+                                                        dataset=eval1_data,
+                                                        label_type=label_type,
+                                                        is_test=True,
+                                                        eval_batch_size=batch_size)
+                                print('■eval2 Evaluation:■')
+                                cer_eval2 = do_eval_cer(session=sess,
+                                                        decode_op=decode_op,
+                                                        network=network,
+                                                        dataset=eval2_data,
+                                                        label_type=label_type,
+                                                        is_test=-True,
+                                                        eval_batch_size=batch_size)
+                                print('■eval3 Evaluation:■')
+                                cer_eval3 = do_eval_cer(session=sess,
+                                                        decode_op=decode_op,
+                                                        network=network,
+                                                        dataset=eval3_data,
+                                                        label_type=label_type,
+                                                        is_test=True,
+                                                        eval_batch_size=batch_size)
+                                cer_mean = (cer_eval1 + cer_eval2 + cer_eval3) / 3.
+                                print('■Mean:■')
+                                print('  CER: %f %%' %
+                                      (cer_mean * 100))
+
+                        else:
+                            print('■Dev Evaluation:■')
+                            error_epoch = do_eval_per(session=sess,
+                                                      per_op=per_op,
+                                                      network=network,
+                                                      dataset=dev_data,
+                                                      eval_batch_size=batch_size)
+
+                            if error_epoch < error_best:
+                                error_best = error_epoch
+                                print('■■■ ↑Best Score (PER)↑ ■■■')
+
+                                print('■eval1 Evaluation:■')
+                                per_eval1 = do_eval_per(session=sess,
+                                                        per_op=per_op,
+                                                        network=network,
+                                                        dataset=eval1_data,
+                                                        eval_batch_size=batch_size)
+                                print('■eval2 Evaluation:■')
+                                per_eval2 = do_eval_per(session=sess,
+                                                        per_op=per_op,
+                                                        network=network,
+                                                        dataset=eval2_data,
+                                                        eval_batch_size=batch_size)
+                                print('■eval3 Evaluation:■')
+                                per_eval3 = do_eval_per(session=sess,
+                                                        per_op=per_op,
+                                                        network=network,
+                                                        dataset=eval3_data,
+                                                        eval_batch_size=batch_size)
+                                per_mean = (per_eval1 + per_eval2 + per_eval3) / 3.
+                                print('■Mean:■')
+                                print('  PER: %f %%' %
+                                      (per_mean * 100))
+
+                        duration_eval = time.time() - start_time_eval
+                        print('Evaluation time: %.3f min' %
+                              (duration_eval / 60))
+
+                        # Remove checkpoints by the dev error & update the
+                        # best score to resume with
+                        checkpoint_manager.set_score(epoch, error_epoch)
+                        save_train_state(network.model_dir,
+                                         checkpoint_path=checkpoint_manager.last_path,
+                                         step=step + 1,
+                                         error_best=error_best,
+                                         data_state=data_state)
 
                     start_time_epoch = time.time()
                     start_time_step = time.time()
+                    timer.restart()
+                    metrics_sink.restart()
+
+                elif resume_interval > 0 and (step + 1) % resume_interval == 0:
+                    # Save the state to resume from in the middle of the epoch
+                    # (overwritten every time)
+                    metrics_sink.flush()
+                    resume_manager.save(
+                        sess, step + 1,
+                        callback=make_resume_callback(
+                            network.model_dir, step + 1, error_best,
+                            train_data.get_state()))
+
+            # Wait for the last checkpoints
+            checkpoint_manager.close()
+            resume_manager.close()
 
             duration_train = time.time() - start_time_train
             print('Total time: %.3f hour' % (duration_train / 3600))
 
-            # Save train & dev loss
-            save_loss(csv_steps, csv_train_loss, csv_dev_loss,
-                      save_path=network.model_dir)
+            # Write the rest of train & dev loss
+            metrics_sink.close()
 
             # Training was finished correctly
             with open(join(network.model_dir, 'complete.txt'), 'w') as f:
@@ -342,13 +554,16 @@ def main(config_path):
                        num_layer=param['num_layer'],
                        bottleneck_dim=param['bottleneck_dim'],
                        output_size=output_size,
-                       clip_gradients=param['clip_grad'],
+                       clip_grad=param['clip_grad'],
                        clip_activation=param['clip_activation'],
                        dropout_ratio_input=param['dropout_input'],
                        dropout_ratio_hidden=param['dropout_hidden'],
                        num_proj=param['num_proj'],
                        weight_decay=param['weight_decay'])
 
+    # Frames stacked in input vectors (split by the CNN front-end)
+    network.num_stack = feature['num_stack']
+
     network.model_name = config['model_name'].upper()
     network.model_name += '_' + str(param['num_cell'])
     network.model_name += '_' + str(param['num_layer'])
@@ -361,6 +576,15 @@ def main(config_path):
     if param['weight_decay'] != 0:
         network.model_name += '_weightdecay' + str(param['weight_decay'])
 
+    # none or scalars or full
+    network.summary_level = param.get('summary_level', 'scalars')
+
+    # Compile the output layer by XLA JIT
+    network.use_xla = param.get('xla', False)
+
+    # Swap out activations of RNN layers to host memory
+    network.swap_memory = param.get('swap_memory', False)
+
     # Set save path
     network.model_dir = mkdir('/n/sd8/inaguma/result/csj/monolog/')
     network.model_dir = mkdir_join(network.model_dir, 'ctc')
@@ -369,12 +593,15 @@ def main(config_path):
         network.model_dir, corpus['train_data_size'])
     network.model_dir = mkdir_join(network.model_dir, network.model_name)
 
-    # Reset model directory
-    if not os.path.isfile(join(network.model_dir, 'complete.txt')):
+    # Reset model directory unless training is resumed
+    if os.path.isfile(join(network.model_dir, 'complete.txt')):
+        raise ValueError('File exists.')
+    is_resume = param.get('resume', True) and load_train_state(
+        network.model_dir) is not None
+    if not is_resume:
         tf.gfile.DeleteRecursively(network.model_dir)
         tf.gfile.MakeDirs(network.model_dir)
-    else:
-        raise ValueError('File exists.')
+    mkdir_join(network.model_dir, 'resume')
 
     # Set process name
     setproctitle('ctc_csj_' + corpus['label_type'] +
@@ -383,7 +610,12 @@ def main(config_path):
     # Save config file
     shutil.copyfile(config_path, join(network.model_dir, 'config.yml'))
 
-    sys.stdout = open(join(network.model_dir, 'train.log'), 'w')
+    # Tell the sweep runner (utils/sweep.py) where the results are
+    print(network.model_dir)
+    sys.stdout.flush()
+
+    sys.stdout = open(join(network.model_dir, 'train.log'),
+                      'a' if is_resume else 'w')
     print(network.model_name)
     do_train(network=network,
              optimizer=param['optimizer'],
@@ -393,7 +625,23 @@ def main(config_path):
              label_type=corpus['label_type'],
              num_stack=feature['num_stack'],
              num_skip=feature['num_skip'],
-             train_data_size=corpus['train_data_size'])
+             train_data_size=corpus['train_data_size'],
+             cache_dir=feature.get('cache_dir'),
+             max_cluster_bytes=feature.get('max_cluster_bytes'),
+             shuffle_buffer_size=feature.get('shuffle_buffer_size'),
+             dev_interval=param.get('dev_interval', 100),
+             dev_num_batch=param.get('dev_num_batch', 10),
+             is_async_eval=param.get('async_eval', False),
+             trace_interval=param.get('trace_interval', 0),
+             num_accumulate=param.get('num_accumulate', 1),
+             num_tower=param.get('num_tower', 1),
+             summary_interval=param.get('summary_interval', 100),
+             is_resume=is_resume,
+             resume_interval=param.get('resume_interval', 0),
+             keep_last=param.get('keep_checkpoint_last', 3),
+             keep_best=param.get('keep_checkpoint_best', 3),
+             keep_every=param.get('keep_checkpoint_every', 0),
+             is_slim_export=param.get('slim_checkpoint', False))
     sys.stdout = sys.__stdout__
 
 
@@ -0,0 +1,438 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Train several CTC networks on the same mini-batches (CSJ corpus).
+   The dataset is loaded once, and each mini-batch is fed to every network
+   in turn. Each network has its own graph, session and model directory.
+   Configs must share the corpus, the feature, batch_size and num_epoch.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from os.path import join
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+from setproctitle import setproctitle
+import yaml
+import shutil
+
+sys.path.append('../')
+sys.path.append('../../')
+sys.path.append('../../../')
+from data.read_dataset_ctc import DataSet
+from models.ctc.load_model import load
+from evaluation.eval_ctc import do_eval_per, do_eval_cer
+from utils.data.sparsetensor import list2sparsetensor
+from utils.util import mkdir, mkdir_join
+from utils.parameter import count_total_parameters
+from utils.metrics_sink import MetricsSink
+from utils.dev_monitor import DevMonitor
+from utils.checkpoint import CheckpointManager
+from utils.session_config import load_session_config, apply_tuned_affinity
+
+
+def build_model(network, optimizer, learning_rate):
+    """Build the graph & the session of a network.
+    Args:
+        network: network to train
+        optimizer: string, the name of optimizer. ex.) adam, rmsprop
+        learning_rate: initial learning rate
+    Returns:
+        model: dict of the network, the graph, the session and operations
+    """
+    graph = tf.Graph()
+    with graph.as_default():
+        # Define model
+        network.define()
+
+        # Add to the graph each operation
+        loss_op = network.loss()
+        train_op = network.train(optimizer=optimizer,
+                                 learning_rate_init=learning_rate,
+                                 is_scheduled=False)
+        decode_op_monitor = network.decoder(decode_type='greedy')
+        per_op_monitor = network.ler(decode_op_monitor)
+        decode_op = network.decoder(decode_type='beam_search',
+                                    beam_width=20)
+        per_op = network.ler(decode_op, is_summary=False)
+        summary_train = tf.summary.merge(network.summaries_train)
+        summary_dev = tf.summary.merge(network.summaries_dev)
+        summary_statistics = None
+        if network.summary_level == 'full':
+            summary_statistics = tf.summary.merge(
+                network.summaries_statistics)
+        init_op = tf.global_variables_initializer()
+
+        # Count total parameters
+        parameters_dict, total_parameters = count_total_parameters(
+            tf.trainable_variables())
+        print("%s: %d variables, %s M parameters" %
+              (network.model_name, len(parameters_dict.keys()),
+               "{:,}".format(total_parameters / 1000000)))
+
+        checkpoint_manager = CheckpointManager(network.model_dir)
+
+    sess = tf.Session(graph=graph,
+                      config=load_session_config(network=network))
+    sess.run(init_op)
+
+    return {'network': network,
+            'learning_rate': learning_rate,
+            'session': sess,
+            'loss_op': loss_op,
+            'train_op': train_op,
+            'decode_op_monitor': decode_op_monitor,
+            'per_op_monitor': per_op_monitor,
+            'decode_op': decode_op,
+            'per_op': per_op,
+            'summary_train': summary_train,
+            'summary_dev': summary_dev,
+            'summary_statistics': summary_statistics,
+            'summary_writer': tf.summary.FileWriter(network.model_dir, graph),
+            'checkpoint_manager': checkpoint_manager,
+            'error_best': 1,
+            'duration': 0.,
+            'metrics_sink': MetricsSink(network.model_dir)}
+
+
+def do_train(networks, optimizers, learning_rates, batch_size, epoch_num,
+             label_type, num_stack, num_skip, train_data_size,
+             cache_dir=None, max_cluster_bytes=None,
+             shuffle_buffer_size=None, dev_interval=100, dev_num_batch=10,
+             summary_interval=100):
+    """Run training of networks on shared mini-batches.
+    Args:
+        networks: list of networks to train
+        optimizers: list of the names of optimizer of each network
+        learning_rates: list of initial learning rates of each network
+        batch_size: size of mini batch
+        epoch_num: epoch num to train
+        label_type: phone or character or kanji
+        num_stack: int, the number of frames to stack
+        num_skip: int, the number of frames to skip
+        train_data_size: default or large
+        cache_dir: path to the directory to cache frame-stacked inputs
+        max_cluster_bytes: int, the maximum size of inputs in one cluster of
+            the training set
+        shuffle_buffer_size: int, the number of utterances in the shuffle
+            buffer of the training set
+        dev_interval: int, compute the dev loss every dev_interval steps
+        dev_num_batch: int, the number of mini-batches of the dev set used to
+            monitor the loss
+        summary_interval: int, write summaries & print the progress every
+            summary_interval steps
+    """
+    # Load dataset once
+    train_data = DataSet(data_type='train', label_type=label_type,
+                         train_data_size=train_data_size,
+                         num_stack=num_stack, num_skip=num_skip,
+                         is_sorted=True, cache_dir=cache_dir,
+                         is_filtered=True,
+                         max_cluster_bytes=max_cluster_bytes,
+                         shuffle_buffer_size=shuffle_buffer_size)
+    dev_data = DataSet(data_type='dev', label_type=label_type,
+                       train_data_size=train_data_size,
+                       num_stack=num_stack, num_skip=num_skip,
+                       is_sorted=False, cache_dir=cache_dir,
+                       is_fixed_batch=True)
+    dev_monitor = DevMonitor(dev_data, batch_size=batch_size,
+                             num_batch=dev_num_batch, interval=dev_interval)
+
+    # Threads of all sessions run on the tuned cores
+    apply_tuned_affinity()
+    models = [build_model(network, optimizer, learning_rate)
+              for network, optimizer, learning_rate
+              in zip(networks, optimizers, learning_rates)]
+
+    # Train models
+    iter_per_epoch = int(train_data.data_num / batch_size)
+    if (train_data.data_num / batch_size) != int(train_data.data_num / batch_size):
+        iter_per_epoch += 1
+    max_steps = iter_per_epoch * epoch_num
+    start_time_train = time.time()
+    start_time_epoch = time.time()
+    duration_data = 0.
+    for step in range(max_steps):
+        # Create the next mini batch once for all models
+        start_time_data = time.time()
+        inputs, labels, seq_len, _ = train_data.next_batch(
+            batch_size=batch_size)
+        indices, values, dense_shape = list2sparsetensor(labels)
+        duration_data += time.time() - start_time_data
+
+        is_summary_step = (step + 1) % summary_interval == 0
+        dev_batch_index = dev_monitor.batch_index
+        for model in models:
+            network = model['network']
+            sess = model['session']
+            feed_dict_train = {
+                network.inputs: inputs,
+                network.label_indices: indices,
+                network.label_values: values,
+                network.label_shape: dense_shape,
+                network.seq_len: seq_len,
+                network.keep_prob_input: network.dropout_ratio_input,
+                network.keep_prob_hidden: network.dropout_ratio_hidden,
+                network.learning_rate: model['learning_rate']
+            }
+
+            # Update parameters & compute loss
+            start_time_step = time.time()
+            if not is_summary_step:
+                fetches_train = network.step_fetches(model['train_op'])
+            elif network.summary_level == 'none':
+                fetches_train = network.step_fetches(
+                    model['train_op'], ler_op=model['per_op_monitor'])
+            else:
+                fetches_train = network.step_fetches(
+                    model['train_op'], ler_op=model['per_op_monitor'],
+                    summary_op=model['summary_train'])
+            results_train = sess.run(fetches_train, feed_dict=feed_dict_train)
+            model['duration'] += time.time() - start_time_step
+            model['metrics_sink'].add_batch(inputs, seq_len)
+
+            # Compute loss on the cached dev subset at intervals
+            if dev_monitor.is_step(step):
+                model['loss_dev'] = dev_monitor.evaluate(
+                    sess, network, model['loss_op'],
+                    summary_writer=model['summary_writer'], step=step + 1)
+                model['metrics_sink'].add_loss(
+                    step, results_train['loss'], model['loss_dev'])
+            else:
+                model['metrics_sink'].add_loss(step, results_train['loss'])
+
+            if is_summary_step:
+                # Every model is monitored on the same dev mini batch
+                dev_monitor.batch_index = dev_batch_index
+                feed_dict_dev, _ = dev_monitor.next_feed_dict(network)
+                if network.summary_level == 'none':
+                    ler_dev = sess.run(model['per_op_monitor'],
+                                       feed_dict=feed_dict_dev)
+                else:
+                    ler_dev, summary_str_dev = sess.run(
+                        [model['per_op_monitor'], model['summary_dev']],
+                        feed_dict=feed_dict_dev)
+                    model['summary_writer'].add_summary(
+                        results_train['summary'], step + 1)
+                    model['summary_writer'].add_summary(
+                        summary_str_dev, step + 1)
+                    if network.summary_level == 'full':
+                        model['summary_writer'].add_summary(
+                            sess.run(model['summary_statistics']), step + 1)
+                # Throughput of the whole loop (shared by all models)
+                model['metrics_sink'].report(model['summary_writer'],
+                                             step + 1)
+                model['summary_writer'].flush()
+                print('Step %d %s: loss = %.3f (%.3f) / ler = %.4f (%.4f) (%.3f sec/step)' %
+                      (step + 1, network.model_name, results_train['loss'],
+                       model.get('loss_dev', np.nan), results_train['ler'],
+                       ler_dev, model['duration'] / (step + 1)))
+
+        if is_summary_step:
+            print('Step %d: data %.3f sec/step (shared by %d models)' %
+                  (step + 1, duration_data / (step + 1), len(models)))
+            sys.stdout.flush()
+
+        # Save checkpoint and evaluate models per epoch
+        if (step + 1) % iter_per_epoch == 0 or (step + 1) == max_steps:
+            duration_epoch = time.time() - start_time_epoch
+            epoch = (step + 1) // iter_per_epoch
+            print('-----EPOCH:%d (%.3f min)-----' %
+                  (epoch, duration_epoch / 60))
+
+            for model in models:
+                network = model['network']
+                sess = model['session']
+                model['metrics_sink'].flush()
+                model['checkpoint_manager'].save(sess, epoch)
+
+                print('■Dev Evaluation (%s):■' % network.model_name)
+                if label_type in ['character', 'kanji']:
+                    error_epoch = do_eval_cer(session=sess,
+                                              decode_op=model['decode_op'],
+                                              network=network,
+                                              dataset=dev_data,
+                                              label_type=label_type,
+                                              eval_batch_size=batch_size)
+                else:
+                    error_epoch = do_eval_per(session=sess,
+                                              per_op=model['per_op'],
+                                              network=network,
+                                              dataset=dev_data,
+                                              eval_batch_size=batch_size)
+                model['checkpoint_manager'].set_score(epoch, error_epoch)
+                if error_epoch < model['error_best']:
+                    model['error_best'] = error_epoch
+                    print('■■■ ↑Best Score↑ ■■■')
+            sys.stdout.flush()
+            start_time_epoch = time.time()
+            for model in models:
+                model['metrics_sink'].restart()
+
+    duration_train = time.time() - start_time_train
+    print('Total time: %.3f hour' % (duration_train / 3600))
+
+    print('%-60s %10s %10s' % ('model', 'sec/step', 'best dev'))
+    for model in models:
+        network = model['network']
+        model['checkpoint_manager'].close()
+        model['session'].close()
+        print('%-60s %10.3f %10.4f' %
+              (network.model_name, model['duration'] / max_steps,
+               model['error_best']))
+
+        # Write the rest of train & dev loss
+        model['metrics_sink'].close()
+
+        # Training was finished correctly
+        with open(join(network.model_dir, 'complete.txt'), 'w') as f:
+            f.write('')
+
+
+def load_network(config, output_size):
+    """Make a network & its save path from a config.
+    Args:
+        config: dict of the config file
+        output_size: int, the number of labels (except for blank class)
+    Returns:
+        network: network to train
+    """
+    corpus = config['corpus']
+    feature = config['feature']
+    param = config['param']
+
+    CTCModel = load(model_type=config['model_name'])
+    network = CTCModel(batch_size=param['batch_size'],
+                       input_size=feature['input_size'] * feature['num_stack'],
+                       num_cell=param['num_cell'],
+                       num_layer=param['num_layer'],
+                       bottleneck_dim=param['bottleneck_dim'],
+                       output_size=output_size,
+                       clip_grad=param['clip_grad'],
+                       clip_activation=param['clip_activation'],
+                       dropout_ratio_input=param['dropout_input'],
+                       dropout_ratio_hidden=param['dropout_hidden'],
+                       num_proj=param['num_proj'],
+                       weight_decay=param['weight_decay'])
+
+    # Frames stacked in input vectors (split by the CNN front-end)
+    network.num_stack = feature['num_stack']
+
+    network.model_name = config['model_name'].upper()
+    network.model_name += '_' + str(param['num_cell'])
+    network.model_name += '_' + str(param['num_layer'])
+    network.model_name += '_' + param['optimizer']
+    network.model_name += '_lr' + str(param['learning_rate'])
+    if param['num_proj'] != 0:
+        network.model_name += '_proj' + str(param['num_proj'])
+    if feature['num_stack'] != 1:
+        network.model_name += '_stack' + str(feature['num_stack'])
+    if param['weight_decay'] != 0:
+        network.model_name += '_weightdecay' + str(param['weight_decay'])
+
+    # none or scalars or full
+    network.summary_level = param.get('summary_level', 'scalars')
+
+    # Compile the output layer by XLA JIT
+    network.use_xla = param.get('xla', False)
+
+    # Swap out activations of RNN layers to host memory
+    network.swap_memory = param.get('swap_memory', False)
+
+    # Set save path
+    network.model_dir = mkdir('/n/sd8/inaguma/result/csj/monolog/')
+    network.model_dir = mkdir_join(network.model_dir, 'ctc')
+    network.model_dir = mkdir_join(network.model_dir, corpus['label_type'])
+    network.model_dir = mkdir_join(
+        network.model_dir, corpus['train_data_size'])
+    network.model_dir = mkdir_join(network.model_dir, network.model_name)
+
+    return network
+
+
+def main(config_paths):
+
+    # Read config files (.yml)
+    configs = []
+    for config_path in config_paths:
+        with open(config_path, "r") as f:
+            configs.append(yaml.load(f))
+    corpus = configs[0]['corpus']
+    feature = configs[0]['feature']
+    param = configs[0]['param']
+
+    # Mini-batches are shared, so the data settings must be the same
+    for config_path, config in zip(config_paths[1:], configs[1:]):
+        if config['corpus'] != corpus or config['feature'] != feature:
+            raise ValueError('corpus & feature of %s differ from %s.' %
+                             (config_path, config_paths[0]))
+        for key in ['batch_size', 'num_epoch']:
+            if config['param'][key] != param[key]:
+                raise ValueError('%s of %s differs from %s.' %
+                                 (key, config_path, config_paths[0]))
+
+    if corpus['label_type'] == 'phone':
+        output_size = 38
+    elif corpus['label_type'] == 'character':
+        output_size = 147
+    elif corpus['label_type'] == 'kanji':
+        output_size = 3386
+
+    networks = []
+    for config_path, config in zip(config_paths, configs):
+        network = load_network(config, output_size)
+        if network.model_name in [x.model_name for x in networks]:
+            raise ValueError('%s is the same model as another config.' %
+                             config_path)
+
+        # Reset model directory
+        if not os.path.isfile(join(network.model_dir, 'complete.txt')):
+            tf.gfile.DeleteRecursively(network.model_dir)
+            tf.gfile.MakeDirs(network.model_dir)
+        else:
+            raise ValueError('File exists.')
+
+        # Save config file
+        shutil.copyfile(config_path, join(network.model_dir, 'config.yml'))
+        networks.append(network)
+
+    # Set process name
+    setproctitle('ctc_csj_cotrain_' + corpus['label_type'] +
+                 '_' + corpus['train_data_size'])
+
+    # Write the log to the directory of the first model
+    sys.stdout = open(join(networks[0].model_dir, 'train.log'), 'w')
+    for network in networks:
+        print(network.model_name)
+    do_train(networks=networks,
+             optimizers=[config['param']['optimizer'] for config in configs],
+             learning_rates=[config['param']['learning_rate']
+                             for config in configs],
+             batch_size=param['batch_size'],
+             epoch_num=param['num_epoch'],
+             label_type=corpus['label_type'],
+             num_stack=feature['num_stack'],
+             num_skip=feature['num_skip'],
+             train_data_size=corpus['train_data_size'],
+             cache_dir=feature.get('cache_dir'),
+             max_cluster_bytes=feature.get('max_cluster_bytes'),
+             shuffle_buffer_size=feature.get('shuffle_buffer_size'),
+             dev_interval=param.get('dev_interval', 100),
+             dev_num_batch=param.get('dev_num_batch', 10),
+             summary_interval=param.get('summary_interval', 100))
+    sys.stdout = sys.__stdout__
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) < 3:
+        raise ValueError(("Set at least 2 config paths.\n"
+                          "Usage: python train_ctc_cotrain.py path_to_config1 path_to_config2 ..."))
+
+    main(config_paths=args[1:])
@@ -0,0 +1,314 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Train CTC network with between-graph replication (CSJ corpus).
+   Each process is a parameter server or a worker. Workers read their own
+   shard of the training set, and the chief worker (task 0) saves
+   checkpoints. Evaluate checkpoints with restore/evaluator_ctc.py.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from os.path import join
+import sys
+import time
+import tensorflow as tf
+from setproctitle import setproctitle
+import yaml
+import shutil
+
+sys.path.append('../')
+sys.path.append('../../')
+sys.path.append('../../../')
+from data.read_dataset_ctc import DataSet
+from models.ctc.load_model import load
+from utils.data.sparsetensor import list2sparsetensor
+from utils.util import mkdir, mkdir_join
+from utils.parameter import count_total_parameters
+
+
+def do_train(network, cluster, server, task_index, optimizer, learning_rate,
+             batch_size, epoch_num, label_type, num_stack, num_skip,
+             train_data_size, is_sync=False, cache_dir=None,
+             max_cluster_bytes=None, shuffle_buffer_size=None,
+             summary_interval=100, checkpoint_interval=600):
+    """Run training as a worker.
+    Args:
+        network: network to train
+        cluster: ClusterSpec
+        server: Server of this worker
+        task_index: int, the index of this worker
+        optimizer: string, the name of optimizer. ex.) adam, rmsprop
+        learning_rate: initial learning rate
+        batch_size: size of mini batch (per worker)
+        epoch_num: epoch num to train
+        label_type: phone or character or kanji
+        num_stack: int, the number of frames to stack
+        num_skip: int, the number of frames to skip
+        train_data_size: default or large
+        is_sync: if True, aggregate gradients of all workers before each
+            update. Else, each worker updates parameters asynchronously
+        cache_dir: path to the directory to cache frame-stacked inputs
+        max_cluster_bytes: int, the maximum size of inputs in one cluster of
+            the training set
+        shuffle_buffer_size: int, the number of utterances in the shuffle
+            buffer of the training set
+        summary_interval: int, write summaries & print the progress every
+            summary_interval local steps
+        checkpoint_interval: int, save checkpoints every checkpoint_interval
+            seconds
+    """
+    num_worker = cluster.num_tasks('worker')
+    is_chief = task_index == 0
+
+    # Load the shard of this worker
+    train_data = DataSet(data_type='train', label_type=label_type,
+                         train_data_size=train_data_size,
+                         num_stack=num_stack, num_skip=num_skip,
+                         is_sorted=True, cache_dir=cache_dir,
+                         is_filtered=True,
+                         max_cluster_bytes=max_cluster_bytes,
+                         shuffle_buffer_size=shuffle_buffer_size,
+                         num_shard=num_worker, shard_index=task_index)
+
+    # Tell TensorFlow that the model will be built into the default graph
+    with tf.Graph().as_default():
+
+        # Place variables on parameter servers & operations on this worker
+        with tf.device(tf.train.replica_device_setter(
+                worker_device='/job:worker/task:%d' % task_index,
+                cluster=cluster)):
+
+            # Define model
+            network.define()
+
+            # Add to the graph each operation
+            loss_op = network.loss()
+            train_op = network.train(
+                optimizer=optimizer,
+                learning_rate_init=learning_rate,
+                is_scheduled=False,
+                num_sync_replica=num_worker if is_sync else None)
+            decode_op = network.decoder(decode_type='greedy')
+            per_op = network.ler(decode_op)
+
+            summary_train = tf.summary.merge(network.summaries_train)
+
+        # Count total parameters
+        if is_chief:
+            parameters_dict, total_parameters = count_total_parameters(
+                tf.trainable_variables())
+            for parameter_name in sorted(parameters_dict.keys()):
+                print("%s %d" %
+                      (parameter_name, parameters_dict[parameter_name]))
+            print("Total %d variables, %s M parameters" %
+                  (len(parameters_dict.keys()), "{:,}".format(total_parameters / 1000000)))
+
+        # Stop all workers at the same global step
+        iter_per_epoch = int(train_data.data_num / batch_size)
+        if (train_data.data_num / batch_size) != int(train_data.data_num / batch_size):
+            iter_per_epoch += 1
+        if is_sync:
+            # Each update consumes a mini batch of every worker
+            max_global_steps = iter_per_epoch * epoch_num
+        else:
+            max_global_steps = iter_per_epoch * epoch_num * num_worker
+        hooks = [tf.train.StopAtStepHook(last_step=max_global_steps)]
+        if is_sync:
+            hooks.append(network.optimizer.make_session_run_hook(is_chief))
+
+        # Only the chief saves checkpoints (model.ckpt-<global step>)
+        summary_writer = None
+        if is_chief:
+            summary_writer = tf.summary.FileWriter(network.model_dir)
+        config = tf.ConfigProto(
+            allow_soft_placement=True,
+            device_filters=['/job:ps', '/job:worker/task:%d' % task_index])
+        with tf.train.MonitoredTrainingSession(
+                master=server.target,
+                is_chief=is_chief,
+                checkpoint_dir=network.model_dir if is_chief else None,
+                hooks=hooks,
+                save_checkpoint_secs=checkpoint_interval,
+                save_summaries_steps=None,
+                save_summaries_secs=None,
+                config=config) as sess:
+
+            step = 0
+            start_time_train = time.time()
+            start_time_step = time.time()
+            while not sess.should_stop():
+                # Create feed dictionary for next mini batch (train)
+                inputs, labels, seq_len, _ = train_data.next_batch(
+                    batch_size=batch_size)
+                indices, values, dense_shape = list2sparsetensor(labels)
+                feed_dict_train = {
+                    network.inputs: inputs,
+                    network.label_indices: indices,
+                    network.label_values: values,
+                    network.label_shape: dense_shape,
+                    network.seq_len: seq_len,
+                    network.keep_prob_input: network.dropout_ratio_input,
+                    network.keep_prob_hidden: network.dropout_ratio_hidden,
+                    network.learning_rate: learning_rate
+                }
+
+                # Update parameters & compute loss
+                _, loss_train, global_step = sess.run(
+                    [train_op, loss_op, network.global_step],
+                    feed_dict=feed_dict_train)
+                step += 1
+
+                if step % summary_interval == 0 and not sess.should_stop():
+                    # Change feed dict for evaluation
+                    feed_dict_train[network.keep_prob_input] = 1.0
+                    feed_dict_train[network.keep_prob_hidden] = 1.0
+
+                    # Compute accuracy & update event file
+                    ler_train, summary_str_train = sess.run(
+                        [per_op, summary_train], feed_dict=feed_dict_train)
+                    if summary_writer is not None:
+                        summary_writer.add_summary(summary_str_train,
+                                                   global_step)
+                        summary_writer.flush()
+
+                    duration_step = time.time() - start_time_step
+                    print('Worker %d: step %d (global step %d): loss = %.3f / ler = %.4f (%.3f min)' %
+                          (task_index, step, global_step, loss_train,
+                           ler_train, duration_step / 60))
+                    sys.stdout.flush()
+                    start_time_step = time.time()
+
+        duration_train = time.time() - start_time_train
+        print('Total time: %.3f hour' % (duration_train / 3600))
+
+        if is_chief:
+            # Training was finished correctly
+            with open(join(network.model_dir, 'complete.txt'), 'w') as f:
+                f.write('')
+
+
+def main(config_path, job_name, task_index, ps_hosts, worker_hosts):
+
+    cluster = tf.train.ClusterSpec({'ps': ps_hosts, 'worker': worker_hosts})
+    server = tf.train.Server(cluster, job_name=job_name,
+                             task_index=task_index)
+    setproctitle('ctc_csj_%s%d' % (job_name, task_index))
+
+    # Parameter servers only serve variables
+    if job_name == 'ps':
+        server.join()
+        return
+
+    # Read a config file (.yml)
+    with open(config_path, "r") as f:
+        config = yaml.load(f)
+        corpus = config['corpus']
+        feature = config['feature']
+        param = config['param']
+
+    if corpus['label_type'] == 'phone':
+        output_size = 38
+    elif corpus['label_type'] == 'character':
+        output_size = 147
+    elif corpus['label_type'] == 'kanji':
+        output_size = 3386
+
+    # Model setting
+    CTCModel = load(model_type=config['model_name'])
+    network = CTCModel(batch_size=param['batch_size'],
+                       input_size=feature['input_size'] * feature['num_stack'],
+                       num_cell=param['num_cell'],
+                       num_layer=param['num_layer'],
+                       bottleneck_dim=param['bottleneck_dim'],
+                       output_size=output_size,
+                       clip_grad=param['clip_grad'],
+                       clip_activation=param['clip_activation'],
+                       dropout_ratio_input=param['dropout_input'],
+                       dropout_ratio_hidden=param['dropout_hidden'],
+                       num_proj=param['num_proj'],
+                       weight_decay=param['weight_decay'])
+
+    # Frames stacked in input vectors (split by the CNN front-end)
+    network.num_stack = feature['num_stack']
+
+    network.model_name = config['model_name'].upper()
+    network.model_name += '_' + str(param['num_cell'])
+    network.model_name += '_' + str(param['num_layer'])
+    network.model_name += '_' + param['optimizer']
+    network.model_name += '_lr' + str(param['learning_rate'])
+    if param['num_proj'] != 0:
+        network.model_name += '_proj' + str(param['num_proj'])
+    if feature['num_stack'] != 1:
+        network.model_name += '_stack' + str(feature['num_stack'])
+    if param['weight_decay'] != 0:
+        network.model_name += '_weightdecay' + str(param['weight_decay'])
+    network.model_name += '_dist' + str(len(worker_hosts))
+
+    # none or scalars or full
+    network.summary_level = param.get('summary_level', 'scalars')
+
+    # Compile the output layer by XLA JIT
+    network.use_xla = param.get('xla', False)
+
+    # Swap out activations of RNN layers to host memory
+    network.swap_memory = param.get('swap_memory', False)
+
+    # Set save path
+    network.model_dir = mkdir('/n/sd8/inaguma/result/csj/monolog/')
+    network.model_dir = mkdir_join(network.model_dir, 'ctc')
+    network.model_dir = mkdir_join(network.model_dir, corpus['label_type'])
+    network.model_dir = mkdir_join(
+        network.model_dir, corpus['train_data_size'])
+    network.model_dir = mkdir_join(network.model_dir, network.model_name)
+
+    if task_index == 0:
+        # Reset model directory
+        if not os.path.isfile(join(network.model_dir, 'complete.txt')):
+            tf.gfile.DeleteRecursively(network.model_dir)
+            tf.gfile.MakeDirs(network.model_dir)
+        else:
+            raise ValueError('File exists.')
+
+        # Save config file
+        shutil.copyfile(config_path, join(network.model_dir, 'config.yml'))
+
+        sys.stdout = open(join(network.model_dir, 'train.log'), 'w')
+    print(network.model_name)
+    do_train(network=network,
+             cluster=cluster,
+             server=server,
+             task_index=task_index,
+             optimizer=param['optimizer'],
+             learning_rate=param['learning_rate'],
+             batch_size=param['batch_size'],
+             epoch_num=param['num_epoch'],
+             label_type=corpus['label_type'],
+             num_stack=feature['num_stack'],
+             num_skip=feature['num_skip'],
+             train_data_size=corpus['train_data_size'],
+             is_sync=param.get('sync_replicas', False),
+             cache_dir=feature.get('cache_dir'),
+             max_cluster_bytes=feature.get('max_cluster_bytes'),
+             shuffle_buffer_size=feature.get('shuffle_buffer_size'),
+             summary_interval=param.get('summary_interval', 100),
+             checkpoint_interval=param.get('checkpoint_interval', 600))
+    sys.stdout = sys.__stdout__
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) != 6:
+        raise ValueError(("Set a config path, job name, task index & hosts.\n"
+                          "Usage: python train_ctc_dist.py path_to_config ps|worker task_index "
+                          "ps_host1,... worker_host1,..."))
+
+    main(config_path=args[1],
+         job_name=args[2],
+         task_index=int(args[3]),
+         ps_hosts=args[4].split(','),
+         worker_hosts=args[5].split(','))
@@ -24,12 +24,15 @@ from evaluation.eval_ctc import do_eval_per, do_eval_cer
 from utils.data.sparsetensor import list2sparsetensor, sparsetensor2list
 from utils.util import mkdir, mkdir_join
 from utils.parameter import count_total_parameters
-from utils.loss import save_loss
+from utils.cost import estimate_cost, format_cost
+from utils.metrics_sink import MetricsSink
+from utils.session_config import load_session_config, apply_tuned_affinity
 
 
 def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
              label_type_main, label_type_second, num_stack, num_skip,
-             train_data_size):
+             train_data_size, cache_dir=None, max_cluster_bytes=None,
+             shuffle_buffer_size=None):
     """Run training.
     Args:
         network: network to train
@@ -42,28 +45,40 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
         num_stack: int, the number of frames to stack
         num_skip: int, the number of frames to skip
         train_data_size: default or large
+        cache_dir: path to the directory to cache frame-stacked inputs
+        max_cluster_bytes: int, the maximum size of inputs in one cluster of
+            the training set
+        shuffle_buffer_size: int, the number of utterances in the shuffle
+            buffer of the training set
     """
     # Load dataset
     train_data = DataSet(data_type='train', label_type_main=label_type_main,
                          label_type_second=label_type_second,
                          train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip, is_sorted=True)
+                         num_stack=num_stack, num_skip=num_skip, is_sorted=True,
+                         cache_dir=cache_dir, is_filtered=True,
+                         max_cluster_bytes=max_cluster_bytes,
+                         shuffle_buffer_size=shuffle_buffer_size)
     dev_data = DataSet(data_type='dev', label_type_main=label_type_main,
                        label_type_second=label_type_second,
                        train_data_size=train_data_size,
-                       num_stack=num_stack, num_skip=num_skip, is_sorted=False)
+                       num_stack=num_stack, num_skip=num_skip, is_sorted=False,
+                       cache_dir=cache_dir, is_fixed_batch=True)
     eval1_data = DataSet(data_type='eval1', label_type_main=label_type_main,
                          label_type_second=label_type_second,
                          train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip, is_sorted=False)
+                         num_stack=num_stack, num_skip=num_skip, is_sorted=False,
+                         cache_dir=cache_dir, is_fixed_batch=True)
     eval2_data = DataSet(data_type='eval2', label_type_main=label_type_main,
                          label_type_second=label_type_second,
                          train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip, is_sorted=False)
+                         num_stack=num_stack, num_skip=num_skip, is_sorted=False,
+                         cache_dir=cache_dir, is_fixed_batch=True)
     eval3_data = DataSet(data_type='eval3', label_type_main=label_type_main,
                          label_type_second=label_type_second,
                          train_data_size=train_data_size,
-                         num_stack=num_stack, num_skip=num_skip, is_sorted=False)
+                         num_stack=num_stack, num_skip=num_skip, is_sorted=False,
+                         cache_dir=cache_dir, is_fixed_batch=True)
 
     # Tell TensorFlow that the model will be built into the default graph
     with tf.Graph().as_default():
@@ -100,11 +115,13 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
         print("Total %d variables, %s M parameters" %
               (len(parameters_dict.keys()), "{:,}".format(total_parameters / 1000000)))
 
-        csv_steps = []
-        csv_train_loss = []
-        csv_dev_loss = []
+        # Estimate computational cost
+        print(format_cost(estimate_cost(network, num_skip=num_skip,
+                                        is_gpu=tf.test.is_gpu_available())))
+
         # Create a session for running operation on the graph
-        with tf.Session() as sess:
+        apply_tuned_affinity(network=network)
+        with tf.Session(config=load_session_config(network=network)) as sess:
             # Instantiate a SummaryWriter to output summaries and the graph
             summary_writer = tf.summary.FileWriter(
                 network.model_dir, sess.graph)
@@ -112,6 +129,9 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
             # Initialize parameters
             sess.run(init_op)
 
+            # Losses are appended to loss.csv as training goes
+            metrics_sink = MetricsSink(network.model_dir)
+
             # Train model
             iter_per_epoch = int(train_data.data_num / batch_size)
             if (train_data.data_num / batch_size) != int(train_data.data_num / batch_size):
@@ -125,6 +145,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
                 # Create feed dictionary for next mini batch (train)
                 inputs, labels_main, labels_second, seq_len, _ = train_data.next_batch(
                     batch_size=batch_size)
+                metrics_sink.add_batch(inputs, seq_len)
                 indices_main, values_main, dense_shape_main = list2sparsetensor(
                     labels_main)
                 indices_second, values_second, dense_shape_second = list2sparsetensor(
@@ -167,9 +188,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
                 _, loss_train = sess.run(
                     [train_op, loss_op], feed_dict=feed_dict_train)
                 loss_dev = sess.run(loss_op, feed_dict=feed_dict_dev)
-                csv_steps.append(step)
-                csv_train_loss.append(loss_train)
-                csv_dev_loss.append(loss_dev)
+                metrics_sink.add_loss(step, loss_train, loss_dev)
 
                 if (step + 1) % 100 == 0:
                     # Change feed dict for evaluation
@@ -185,6 +204,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
                                                                               feed_dict=feed_dict_dev)
                     summary_writer.add_summary(summary_str_train, step + 1)
                     summary_writer.add_summary(summary_str_dev, step + 1)
+                    metrics_sink.report(summary_writer, step + 1)
                     summary_writer.flush()
 
                     duration_step = time.time() - start_time_step
@@ -334,9 +354,8 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num,
             duration_train = time.time() - start_time_train
             print('Total time: %.3f hour' % (duration_train / 3600))
 
-            # Save train & dev loss
-            save_loss(csv_steps, csv_train_loss, csv_dev_loss,
-                      save_path=network.model_dir)
+            # Write the rest of train & dev loss
+            metrics_sink.close()
 
             # Training was finished correctly
             with open(join(network.model_dir, 'complete.txt'), 'w') as f:
@@ -428,7 +447,10 @@ def main(config_path):
              label_type_second=corpus['label_type_second'],
              num_stack=feature['num_stack'],
              num_skip=feature['num_skip'],
-             train_data_size=corpus['train_data_size'])
+             train_data_size=corpus['train_data_size'],
+             cache_dir=feature.get('cache_dir'),
+             max_cluster_bytes=feature.get('max_cluster_bytes'),
+             shuffle_buffer_size=feature.get('shuffle_buffer_size'))
     sys.stdout = sys.__stdout__
 
 
@@ -67,10 +67,10 @@ def do_eval_per(session, decode_op, per_op, network, dataset, label_type,
                 batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         batch_size_each = len(labels_true)
@@ -149,10 +149,10 @@ def do_eval_cer(session, decode_op, network, dataset,
                 batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         batch_size_each = len(labels_true)
@@ -211,10 +211,10 @@ def decode_test(session, decode_op, network, dataset, label_type, rate=1.0,
         #         labels_true = labels_true[1]
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         # Visualize
@@ -263,10 +263,10 @@ def posterior_test(session, posteriors_op, network, dataset, label_type,
             batch_size=batch_size)
 
         feed_dict = {
-            network.inputs_pl: inputs,
-            network.seq_len_pl: seq_len,
-            network.keep_prob_input_pl: 1.0,
-            network.keep_prob_hidden_pl: 1.0
+            network.inputs: inputs,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
         }
 
         # Visualize
@@ -18,6 +18,7 @@ sys.path.append('../../../')
 from data.read_dataset_ctc import DataSet
 from models.ctc.load_model import load
 from evaluation.eval_ctc import do_eval_per, do_eval_cer, decode_test, posterior_test
+from utils.session_config import load_session_config, apply_tuned_affinity
 
 
 def do_restore(network, label_type, num_stack, num_skip, epoch=None):
@@ -51,7 +52,9 @@ def do_restore(network, label_type, num_stack, num_skip, epoch=None):
     # Create a saver for writing training checkpoints
     saver = tf.train.Saver()
 
-    with tf.Session() as sess:
+    apply_tuned_affinity(mode='inference', network=network)
+    config = load_session_config(mode='inference', network=network)
+    with tf.Session(config=config) as sess:
         ckpt = tf.train.get_checkpoint_state(network.model_dir)
 
         # If check point exists
@@ -109,12 +112,13 @@ def main(model_path):
                        num_cell=param['num_cell'],
                        num_layer=param['num_layer'],
                        output_size=output_size,
-                       clip_gradients=param['clip_grad'],
+                       clip_grad=param['clip_grad'],
                        clip_activation=param['clip_activation'],
                        dropout_ratio_input=param['dropout_input'],
                        dropout_ratio_hidden=param['dropout_hidden'],
                        num_proj=param['num_proj'],
                        weight_decay=param['weight_decay'])
+    network.num_stack = feature['num_stack']
     network.model_name = config['model_name']
     network.model_dir = model_path
 
@@ -18,6 +18,7 @@ sys.path.append('../../../')
 from data.read_dataset_multitask_ctc import DataSet
 from models.ctc.load_model_multitask import load
 from evaluation.eval_ctc import do_eval_per, do_eval_cer, decode_test, posterior_test
+from utils.session_config import load_session_config, apply_tuned_affinity
 
 
 def do_restore(network, label_type, num_stack, num_skip, epoch=None):
@@ -51,7 +52,9 @@ def do_restore(network, label_type, num_stack, num_skip, epoch=None):
     # Create a saver for writing training checkpoints
     saver = tf.train.Saver()
 
-    with tf.Session() as sess:
+    apply_tuned_affinity(mode='inference', network=network)
+    config = load_session_config(mode='inference', network=network)
+    with tf.Session(config=config) as sess:
         ckpt = tf.train.get_checkpoint_state(network.model_dir)
 
         # If check point exists
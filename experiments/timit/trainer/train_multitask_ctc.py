@@ -24,7 +24,9 @@ from evaluation.eval_ctc import do_eval_per, do_eval_cer
 from utils.data.sparsetensor import list2sparsetensor, sparsetensor2list
 from utils.util import mkdir, mkdir_join
 from utils.parameter import count_total_parameters
-from utils.loss import save_loss
+from utils.cost import estimate_cost, format_cost
+from utils.metrics_sink import MetricsSink
+from utils.session_config import load_session_config, apply_tuned_affinity
 
 
 def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_type, num_stack, num_skip):
@@ -88,11 +90,13 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
         print("Total %d variables, %s M parameters" %
               (len(parameters_dict.keys()), "{:,}".format(total_parameters / 1000000)))
 
-        csv_steps = []
-        csv_train_loss = []
-        csv_dev_loss = []
+        # Estimate computational cost
+        print(format_cost(estimate_cost(network, num_skip=num_skip,
+                                        is_gpu=tf.test.is_gpu_available())))
+
         # Create a session for running operation on the graph
-        with tf.Session() as sess:
+        apply_tuned_affinity(network=network)
+        with tf.Session(config=load_session_config(network=network)) as sess:
 
             # Instantiate a SummaryWriter to output summaries and the graph
             summary_writer = tf.summary.FileWriter(
@@ -101,6 +105,9 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
             # Initialize parameters
             sess.run(init_op)
 
+            # Losses are appended to loss.csv as training goes
+            metrics_sink = MetricsSink(network.model_dir)
+
             # Train model
             iter_per_epoch = int(train_data.data_num / batch_size)
             if (train_data.data_num / batch_size) != int(train_data.data_num / batch_size):
@@ -115,6 +122,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
                 # Create feed dictionary for next mini batch (train)
                 inputs, labels_char, labels_phone, seq_len, _ = train_data.next_batch(
                     batch_size=batch_size)
+                metrics_sink.add_batch(inputs, seq_len)
                 indices_char, values_char, dense_shape_char = list2sparsetensor(
                     labels_char)
                 indices_phone, values_phone, dense_shape_phone = list2sparsetensor(
@@ -157,9 +165,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
                 _, loss_train = sess.run(
                     [train_op, loss_op], feed_dict=feed_dict_train)
                 loss_dev = sess.run(loss_op, feed_dict=feed_dict_dev)
-                csv_steps.append(step)
-                csv_train_loss.append(loss_train)
-                csv_dev_loss.append(loss_dev)
+                metrics_sink.add_loss(step, loss_train, loss_dev)
 
                 if (step + 1) % 10 == 0:
 
@@ -176,6 +182,7 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
                                                                  feed_dict=feed_dict_dev)
                     summary_writer.add_summary(summary_str_train, step + 1)
                     summary_writer.add_summary(summary_str_dev, step + 1)
+                    metrics_sink.report(summary_writer, step + 1)
                     summary_writer.flush()
 
                     duration_step = time.time() - start_time_step
@@ -247,9 +254,8 @@ def do_train(network, optimizer, learning_rate, batch_size, epoch_num, label_typ
             duration_train = time.time() - start_time_train
             print('Total time: %.3f hour' % (duration_train / 3600))
 
-            # Save train & dev loss
-            save_loss(csv_steps, csv_train_loss, csv_dev_loss,
-                      save_path=network.model_dir)
+            # Write the rest of train & dev loss
+            metrics_sink.close()
 
             # Training was finished correctly
             with open(join(network.model_dir, 'complete.txt'), 'w') as f:
@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import tensorflow as tf
+
+from models.ctc.load_model import load
+from utils.benchmark import generate_batch, make_feed_dict, measure_step_time
+
+
+def peak_memory(run_metadata):
+    """Find the peak memory of each allocator in a traced run.
+    Args:
+        run_metadata: RunMetadata of a run with FULL_TRACE
+    Returns:
+        peak_bytes: dict of allocator name => peak bytes
+    """
+    peak_bytes = {}
+    for dev_stats in run_metadata.step_stats.dev_stats:
+        for node_stats in dev_stats.node_stats:
+            for memory in node_stats.memory:
+                peak_bytes[memory.allocator_name] = max(
+                    peak_bytes.get(memory.allocator_name, 0),
+                    memory.peak_bytes)
+    return peak_bytes
+
+
+def probe_batch_size(model_type, batch_size, max_time, input_size,
+                     output_size, num_cell, num_layer, num_proj=None,
+                     bottleneck_dim=None, swap_memory=False, num_stack=1,
+                     num_step=5):
+    """Run training steps of a model with mini-batches padded to max_time.
+    Args:
+        model_type: string, name of the ctc model
+        batch_size: int, batch size of mini batch
+        max_time: int, the number of frames of each utterance
+        input_size: int, the dimensions of input vectors (after stacking)
+        output_size: int, the number of labels (except for blank class)
+        num_cell: int, the number of memory cells in each layer
+        num_layer: int, the number of layers
+        num_proj: int, the number of nodes in recurrent projection layer
+        bottleneck_dim: int, the dimensions of the bottleneck layer
+        swap_memory: if True, swap out activations of RNN layers to host memory
+        num_stack: int, the number of frames stacked in input vectors
+        num_step: int, the number of measured steps
+    Returns:
+        sec_per_step: A float value. Mean seconds per step, or None if the
+            mini batch does not fit in memory
+        peak_bytes: int, the peak memory of the allocator which used the most
+            memory (0 if not measured)
+    """
+    tf.reset_default_graph()
+    with tf.Graph().as_default():
+        CTCModel = load(model_type=model_type)
+        network = CTCModel(batch_size=batch_size,
+                           input_size=input_size,
+                           num_cell=num_cell,
+                           num_layer=num_layer,
+                           output_size=output_size,
+                           clip_grad=5.0,
+                           clip_activation=50,
+                           num_proj=num_proj,
+                           bottleneck_dim=bottleneck_dim)
+        network.swap_memory = swap_memory
+        network.num_stack = num_stack
+        network.define()
+        loss_op = network.loss()
+        train_op = network.train(optimizer='adam',
+                                 learning_rate_init=1e-3,
+                                 is_scheduled=False)
+        init_op = tf.global_variables_initializer()
+
+        inputs, labels, seq_len = generate_batch(batch_size, max_time,
+                                                 input_size, output_size)
+        config = tf.ConfigProto(gpu_options=tf.GPUOptions(allow_growth=True))
+        with tf.Session(config=config) as sess:
+            sess.run(init_op)
+            feed_dict = make_feed_dict(network, inputs, labels, seq_len)
+            try:
+                # Trace the first step to find the peak memory
+                run_options = tf.RunOptions(
+                    trace_level=tf.RunOptions.FULL_TRACE)
+                run_metadata = tf.RunMetadata()
+                sess.run([train_op, loss_op], feed_dict=feed_dict,
+                         options=run_options, run_metadata=run_metadata)
+                peak_bytes = max(
+                    list(peak_memory(run_metadata).values()) + [0])
+
+                sec_per_step, _ = measure_step_time(
+                    sess, [train_op, loss_op], feed_dict,
+                    num_step=num_step, num_warmup=1)
+            except tf.errors.ResourceExhaustedError:
+                return None, 0
+    return sec_per_step, peak_bytes
+
+
+def find_batch_size(model_type, max_time, input_size, output_size, num_cell,
+                    num_layer, num_proj=None, bottleneck_dim=None,
+                    swap_memory=False, num_stack=1, batch_size_list=None,
+                    memory_limit=None, efficiency=0.95, num_step=5):
+    """Probe increasing batch sizes & recommend the largest efficient one.
+    Args:
+        model_type: string, name of the ctc model
+        max_time: int, the number of frames of the longest utterance
+        input_size: int, the dimensions of input vectors (after stacking)
+        output_size: int, the number of labels (except for blank class)
+        num_cell: int, the number of memory cells in each layer
+        num_layer: int, the number of layers
+        num_proj: int, the number of nodes in recurrent projection layer
+        bottleneck_dim: int, the dimensions of the bottleneck layer
+        swap_memory: if True, swap out activations of RNN layers to host memory
+        num_stack: int, the number of frames stacked in input vectors
+        batch_size_list: list of batch sizes to probe in increasing order. By
+            default, powers of 2 from 4 to 256
+        memory_limit: int, the memory budget in bytes. If None, probe until
+            the mini batch does not fit in memory
+        efficiency: A float value. The recommended batch size is the smallest
+            one whose throughput is at least efficiency times the best
+            throughput
+        num_step: int, the number of measured steps per batch size
+    Returns:
+        results: list of `(batch_size, sec_per_step, utt_per_sec,
+            peak_bytes)` of batch sizes which fit
+        batch_size_best: int, the recommended batch size (None if no batch
+            size fits)
+    """
+    if batch_size_list is None:
+        batch_size_list = [2 ** i for i in range(2, 9)]
+
+    results = []
+    for batch_size in batch_size_list:
+        sec_per_step, peak_bytes = probe_batch_size(
+            model_type, batch_size, max_time, input_size, output_size,
+            num_cell, num_layer, num_proj=num_proj,
+            bottleneck_dim=bottleneck_dim, swap_memory=swap_memory,
+            num_stack=num_stack, num_step=num_step)
+        if sec_per_step is None:
+            print('batch size %d: out of memory' % batch_size)
+            break
+        if memory_limit is not None and peak_bytes > memory_limit:
+            print('batch size %d: %.1f MB exceeds the limit' %
+                  (batch_size, peak_bytes / 1024. ** 2))
+            break
+        utt_per_sec = batch_size / sec_per_step
+        print('batch size %d: %.3f sec/step, %.1f utt/sec, %.1f MB' %
+              (batch_size, sec_per_step, utt_per_sec,
+               peak_bytes / 1024. ** 2))
+        results.append((batch_size, sec_per_step, utt_per_sec, peak_bytes))
+
+    if len(results) == 0:
+        return results, None
+
+    # Larger batches stop paying off once throughput saturates
+    utt_per_sec_best = max([result[2] for result in results])
+    for batch_size, _, utt_per_sec, _ in results:
+        if utt_per_sec >= utt_per_sec_best * efficiency:
+            return results, batch_size
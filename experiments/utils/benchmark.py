@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import numpy as np
+
+from utils.data.sparsetensor import list2sparsetensor
+
+
+def generate_batch(batch_size, max_time, input_size, output_size,
+                   label_len=None, seed=0):
+    """Generate a random mini batch for benchmarks.
+    Args:
+        batch_size: int, batch size of mini batch
+        max_time: int, the number of frames of each utterance
+        input_size: int, the dimensions of input vectors
+        output_size: int, the number of labels (except for blank class)
+        label_len: int, the length of each label sequence. By default,
+            max_time // 4
+        seed: int, random seed
+    Returns:
+        inputs: `[batch_size, max_time, input_size]`
+        labels: list of `[label_len]`
+        seq_len: `[batch_size]`
+    """
+    rng = np.random.RandomState(seed)
+    if label_len is None:
+        label_len = max(1, max_time // 4)
+    inputs = rng.randn(batch_size, max_time, input_size).astype(np.float32)
+    labels = [rng.randint(0, output_size, size=label_len).tolist()
+              for _ in range(batch_size)]
+    seq_len = np.full((batch_size,), max_time, dtype=np.int64)
+    return inputs, labels, seq_len
+
+
+def make_feed_dict(network, inputs, labels, seq_len, learning_rate=1e-3):
+    """Make a feed dictionary for training a CTC network.
+    Args:
+        network: CTC network
+        inputs: `[batch_size, max_time, input_size]`
+        labels: list of labels
+        seq_len: `[batch_size]`
+        learning_rate: A float value
+    Returns:
+        feed_dict: feed dictionary
+    """
+    indices, values, dense_shape = list2sparsetensor(labels)
+    return {
+        network.inputs: inputs,
+        network.label_indices: indices,
+        network.label_values: values,
+        network.label_shape: dense_shape,
+        network.seq_len: seq_len,
+        network.keep_prob_input: network.dropout_ratio_input,
+        network.keep_prob_hidden: network.dropout_ratio_hidden,
+        network.learning_rate: learning_rate
+    }
+
+
+def measure_step_time(session, fetches, feed_dict, num_step=20,
+                      num_warmup=3):
+    """Measure the mean wall time of session.run.
+    Args:
+        session: session to run operations
+        fetches: operations to run
+        feed_dict: feed dictionary
+        num_step: int, the number of measured steps
+        num_warmup: int, the number of steps excluded from measurement
+    Returns:
+        mean: A float value. Mean seconds per step
+        std: A float value. Standard deviation of seconds per step
+    """
+    for _ in range(num_warmup):
+        session.run(fetches, feed_dict=feed_dict)
+
+    durations = []
+    for _ in range(num_step):
+        start_time = time.time()
+        session.run(fetches, feed_dict=feed_dict)
+        durations.append(time.time() - start_time)
+    return np.mean(durations), np.std(durations)
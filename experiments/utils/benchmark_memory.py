@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the memory saved by swapping out activations of RNN layers.
+   Usage:
+       python benchmark_memory.py blstm_ctc [max_time] [batch_size]
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import tensorflow as tf
+
+sys.path.append('../')
+sys.path.append('../../')
+from models.ctc.load_model import load
+from utils.batch_size_finder import probe_batch_size
+from utils.cost import estimate_cost
+
+
+def main(model_type, max_time, batch_size):
+
+    input_size = 123
+    output_size = 146
+    num_cell = 256
+    num_layer = 5
+
+    print('%6s %10s %12s %12s %12s %12s' %
+          ('swap', 'sec/step', 'peak (MB)', 'saved (MB)', 'est. (MB)',
+           'host (MB)'))
+    peak_bytes_base = None
+    for swap_memory in [False, True]:
+        sec_per_step, peak_bytes = probe_batch_size(
+            model_type, batch_size, max_time, input_size, output_size,
+            num_cell, num_layer, swap_memory=swap_memory)
+
+        # The estimate needs only the hyperparameters of the model
+        network = load(model_type=model_type)(
+            batch_size=batch_size,
+            input_size=input_size,
+            num_cell=num_cell,
+            num_layer=num_layer,
+            output_size=output_size)
+        cost = estimate_cost(network, swap_memory=swap_memory,
+                             is_gpu=tf.test.is_gpu_available())
+        frame_num = batch_size * max_time
+
+        if sec_per_step is None:
+            print('%6s %10s' % (swap_memory, 'OOM'))
+            continue
+        if peak_bytes_base is None:
+            peak_bytes_base = peak_bytes
+        print('%6s %10.3f %12.1f %12.1f %12.1f %12.1f' %
+              (swap_memory, sec_per_step, peak_bytes / 1024. ** 2,
+               (peak_bytes_base - peak_bytes) / 1024. ** 2,
+               cost['bytes_train'] * frame_num / 1024. ** 2,
+               cost['bytes_train_host'] * frame_num / 1024. ** 2))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) not in [2, 3, 4]:
+        raise ValueError(("Set model type.\n"
+                          "Usage: python benchmark_memory.py blstm_ctc [max_time] [batch_size]"))
+
+    main(model_type=args[1],
+         max_time=int(args[2]) if len(args) >= 3 else 2000,
+         batch_size=int(args[3]) if len(args) == 4 else 16)
@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the scaling of multi-tower training against a single tower.
+   Usage:
+       python benchmark_towers.py blstm_ctc 1 2 4 8
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import tensorflow as tf
+
+sys.path.append('../')
+sys.path.append('../../')
+from models.ctc.load_model import load
+from utils.benchmark import generate_batch, make_feed_dict, measure_step_time
+
+
+def measure_tower(model_type, num_tower, batch_size=32, max_time=500,
+                  input_size=123, output_size=146, num_cell=256, num_layer=5,
+                  num_step=20):
+    """Measure the training step time with num_tower towers.
+    Args:
+        model_type: string, name of the ctc model
+        num_tower: int, the number of towers. If 1, define() is used
+        batch_size: int, batch size of mini batch (split into towers)
+        max_time: int, the number of frames of each utterance
+        input_size: int, the dimensions of input vectors
+        output_size: int, the number of labels (except for blank class)
+        num_cell: int, the number of memory cells in each layer
+        num_layer: int, the number of layers
+        num_step: int, the number of measured steps
+    Returns:
+        mean: A float value. Mean seconds per step
+        std: A float value. Standard deviation of seconds per step
+    """
+    tf.reset_default_graph()
+    with tf.Graph().as_default():
+        CTCModel = load(model_type=model_type)
+        network = CTCModel(batch_size=batch_size,
+                           input_size=input_size,
+                           num_cell=num_cell,
+                           num_layer=num_layer,
+                           output_size=output_size,
+                           clip_grad=5.0,
+                           clip_activation=50)
+        if num_tower > 1:
+            network.define_towers(num_tower)
+        else:
+            network.define()
+        loss_op = network.loss()
+        train_op = network.train(optimizer='adam',
+                                 learning_rate_init=1e-3,
+                                 is_scheduled=False)
+        init_op = tf.global_variables_initializer()
+
+        inputs, labels, seq_len = generate_batch(batch_size, max_time,
+                                                 input_size, output_size)
+        config = tf.ConfigProto(device_count={'CPU': num_tower})
+        with tf.Session(config=config) as sess:
+            sess.run(init_op)
+            feed_dict = make_feed_dict(network, inputs, labels, seq_len)
+            return measure_step_time(sess, [train_op, loss_op], feed_dict,
+                                     num_step=num_step)
+
+
+def main(model_type, tower_list):
+
+    batch_size = 32
+    tower_list = sorted(set([1] + tower_list))
+
+    print('%6s %12s %10s %8s %10s' %
+          ('towers', 'sec/step', 'utt/sec', 'speedup', 'efficiency'))
+    time_single = None
+    for num_tower in tower_list:
+        mean, std = measure_tower(model_type, num_tower,
+                                  batch_size=batch_size)
+        if num_tower == 1:
+            time_single = mean
+        speedup = time_single / mean
+        print('%6d %6.3f±%.3f %10.1f %7.2fx %9.1f%%' %
+              (num_tower, mean, std, batch_size / mean, speedup,
+               speedup / num_tower * 100))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) < 3:
+        raise ValueError(("Set model type & the numbers of towers.\n"
+                          "Usage: python benchmark_towers.py blstm_ctc 1 2 4"))
+
+    main(model_type=args[1],
+         tower_list=[int(num_tower) for num_tower in args[2:]])
@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compare the step time of CTC models with & without XLA JIT.
+   Usage:
+       python benchmark_xla.py [blstm_ctc lstm_ctc gru_ctc cnn_ctc]
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import tensorflow as tf
+
+sys.path.append('../')
+sys.path.append('../../')
+from models.ctc.load_model import load
+from utils.benchmark import generate_batch, make_feed_dict, measure_step_time
+from utils.session_config import load_session_config, apply_tuned_affinity
+
+
+def measure_xla(model_type, use_xla, batch_size=32, max_time=500,
+                input_size=123, output_size=146, num_cell=256, num_layer=5,
+                num_step=20):
+    """Measure the training step time with or without XLA JIT.
+    Args:
+        model_type: string, name of the ctc model
+        use_xla: if True, compile the output layer & the CNN front-end by XLA
+        batch_size: int, batch size of mini batch
+        max_time: int, the number of frames of each utterance
+        input_size: int, the dimensions of input vectors
+        output_size: int, the number of labels (except for blank class)
+        num_cell: int, the number of memory cells in each layer
+        num_layer: int, the number of layers
+        num_step: int, the number of measured steps
+    Returns:
+        mean: A float value. Mean seconds per step
+        std: A float value. Standard deviation of seconds per step
+    """
+    tf.reset_default_graph()
+    with tf.Graph().as_default():
+        CTCModel = load(model_type=model_type)
+        network = CTCModel(batch_size=batch_size,
+                           input_size=input_size,
+                           num_cell=num_cell,
+                           num_layer=num_layer,
+                           output_size=output_size,
+                           clip_grad=5.0,
+                           clip_activation=50)
+        network.use_xla = use_xla
+        network.define()
+        loss_op = network.loss()
+        train_op = network.train(optimizer='adam',
+                                 learning_rate_init=1e-3,
+                                 is_scheduled=False)
+        init_op = tf.global_variables_initializer()
+
+        inputs, labels, seq_len = generate_batch(batch_size, max_time,
+                                                 input_size, output_size)
+        apply_tuned_affinity()
+        with tf.Session(config=load_session_config()) as sess:
+            sess.run(init_op)
+            feed_dict = make_feed_dict(network, inputs, labels, seq_len)
+            # Warmup steps include compilation by XLA
+            return measure_step_time(sess, [train_op, loss_op], feed_dict,
+                                     num_step=num_step)
+
+
+def main(model_list):
+
+    batch_size = 32
+
+    print('%14s %14s %14s %8s' %
+          ('model', 'sec/step', 'sec/step(xla)', 'speedup'))
+    for model_type in model_list:
+        mean, std = measure_xla(model_type, use_xla=False,
+                                batch_size=batch_size)
+        mean_xla, std_xla = measure_xla(model_type, use_xla=True,
+                                        batch_size=batch_size)
+        print('%14s %8.3f±%.3f %8.3f±%.3f %7.2fx' %
+              (model_type, mean, std, mean_xla, std_xla, mean / mean_xla))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) > 1:
+        model_list = args[1:]
+    else:
+        model_list = ['blstm_ctc', 'lstm_ctc', 'gru_ctc', 'cnn_ctc']
+
+    main(model_list=model_list)
@@ -0,0 +1,283 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import tensorflow as tf
+
+
+class CheckpointManager(object):
+    """Save checkpoints from a background thread and remove old ones.
+       Values of variables are copied out of the training session, and the
+       copy is written by a shadow graph with the same variable names, so
+       checkpoints can be restored by tf.train.Saver of the model as before.
+    Args:
+        model_dir: path to the directory to save checkpoints
+        var_list: list of variables to save. By default, all global variables
+        keep_last: int, keep the last keep_last checkpoints
+        keep_best: int, keep the keep_best checkpoints with the lowest scores
+            (see set_score). If more than 0, checkpoints without scores newer
+            than the last scored one are not removed because they may still be
+            evaluated. Older ones were skipped by evaluation & are removable
+        keep_every: int, keep checkpoints of every keep_every-th step
+            (ex. epoch). If 0, not used
+        is_slim: if True, also export trainable variables only to
+            model_dir/slim with the same retention
+        is_cpu: if True, hide GPUs from the shadow session
+        result_path: path to `eval_results.csv` written by an evaluator in
+            another process (restore/evaluator_ctc.py). If not None,
+            checkpoints newer than the last one listed in it are never
+            removed, and scores are read from it by set_scores_from_results
+    """
+
+    def __init__(self, model_dir, var_list=None, keep_last=3, keep_best=3,
+                 keep_every=0, is_slim=False, is_cpu=True, result_path=None):
+        if keep_last < 1:
+            raise ValueError('keep_last must be more than 0.')
+        self.model_dir = model_dir
+        self.var_list = var_list if var_list is not None else tf.global_variables()
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.keep_every = keep_every
+        self.is_slim = is_slim
+        self.result_path = result_path
+        if is_slim and not os.path.isdir(os.path.join(model_dir, 'slim')):
+            os.makedirs(os.path.join(model_dir, 'slim'))
+
+        trainable_names = set([var.op.name for var in tf.trainable_variables()])
+
+        # Build the shadow graph
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.shadow_placeholders = []
+            assign_ops = []
+            var_dict, slim_var_dict = {}, {}
+            for var in self.var_list:
+                name = var.op.name
+                dtype = var.dtype.base_dtype
+                shape = var.get_shape()
+                shadow_var = tf.Variable(tf.zeros(shape, dtype=dtype),
+                                         name=name, trainable=False)
+                placeholder = tf.placeholder(dtype, shape=shape)
+                self.shadow_placeholders.append(placeholder)
+                assign_ops.append(tf.assign(shadow_var, placeholder))
+                var_dict[name] = shadow_var
+                if name in trainable_names:
+                    slim_var_dict[name] = shadow_var
+            self.assign_op = tf.group(*assign_ops)
+            self.saver = tf.train.Saver(var_dict, max_to_keep=None)
+            self.slim_saver = tf.train.Saver(slim_var_dict, max_to_keep=None)
+            init_op = tf.global_variables_initializer()
+
+        if is_cpu:
+            config = tf.ConfigProto(device_count={'GPU': 0})
+        else:
+            config = tf.ConfigProto()
+        self.session = tf.Session(graph=self.graph, config=config)
+        self.session.run(init_op)
+
+        self.thread = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.last_path = None
+
+        # list of `[step, path, slim_path, score]`. Checkpoints saved before
+        # (ex. before resuming training) are managed too
+        self.records = []
+        self.score_path = os.path.join(model_dir, 'dev_scores.csv')
+        scores = self._read_scores()
+        # The step of the last checkpoint listed in result_path
+        self.last_evaluated_step = max(
+            [-1] + list(self._read_results().values()))
+        ckpt = tf.train.get_checkpoint_state(model_dir)
+        if ckpt is not None:
+            for path in ckpt.all_model_checkpoint_paths:
+                slim_path = None
+                if is_slim:
+                    slim_path = os.path.join(model_dir, 'slim',
+                                             os.path.basename(path))
+                step = int(path.split('-')[-1])
+                self.records.append(
+                    [step, path, slim_path, scores.get(step)])
+            self.last_path = ckpt.model_checkpoint_path
+
+    def save(self, session, step, callback=None):
+        """Copy values of variables and write them in the background.
+           Waits for the previous save, so at most one save is in flight.
+        Args:
+            session: session of the training graph
+            step: int, the step (ex. epoch) appended to the checkpoint name
+            callback: if not None, called with the path to the checkpoint
+                after the checkpoint is written
+        """
+        values = session.run(self.var_list)
+        self.wait()
+        self.thread = threading.Thread(target=self._write,
+                                       args=(values, step, callback))
+        self.thread.start()
+
+    def wait(self):
+        """Block until the checkpoint being written is saved. An exception
+           raised while writing is raised again here.
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def set_score(self, step, score):
+        """Set the dev score of the checkpoint of the step and remove the
+           checkpoints which are no longer kept. Scores are also appended to
+           `dev_scores.csv` in model_dir.
+        Args:
+            step: int, the step passed to save
+            score: A float value. Lower is better (ex. error rate)
+        """
+        if not os.path.isfile(self.score_path):
+            with open(self.score_path, 'w') as f:
+                f.write('step,score\n')
+        with open(self.score_path, 'a') as f:
+            f.write('%d,%f\n' % (step, score))
+
+        self.wait()
+        with self.lock:
+            for record in self.records:
+                if record[0] == step:
+                    record[3] = score
+            self._remove_old()
+
+    def set_scores_from_results(self):
+        """Set dev scores of checkpoints evaluated by another process
+           (restore/evaluator_ctc.py) from result_path and remove the
+           checkpoints which are no longer kept.
+        """
+        results = self._read_results()
+        if len(results) == 0:
+            return
+        self.wait()
+        with self.lock:
+            self.last_evaluated_step = max(
+                [self.last_evaluated_step] + list(results.values()))
+            unscored = dict((os.path.basename(record[1]), record[0])
+                            for record in self.records if record[3] is None)
+        for checkpoint_name, (score, _) in sorted(
+                results.items(), key=lambda x: x[1][1]):
+            if checkpoint_name in unscored:
+                self.set_score(unscored[checkpoint_name], score)
+
+    def close(self):
+        """Finish the last save and release the shadow session."""
+        try:
+            self.wait()
+        finally:
+            self.session.close()
+
+    def _read_scores(self):
+        """Read scores set before from `dev_scores.csv`.
+        Returns:
+            scores: dict of step => score
+        """
+        scores = {}
+        if os.path.isfile(self.score_path):
+            with open(self.score_path, 'r') as f:
+                f.readline()
+                for line in f:
+                    step, score = line.strip().split(',')
+                    scores[int(step)] = float(score)
+        return scores
+
+    def _read_results(self):
+        """Read dev scores of the evaluator from result_path. The 1st column
+           is the name of the checkpoint & the 2nd column is the dev score.
+        Returns:
+            results: dict of checkpoint name => (score, step)
+        """
+        results = {}
+        if self.result_path is None or not os.path.isfile(self.result_path):
+            return results
+        with open(self.result_path, 'r') as f:
+            for line in f:
+                line = line.strip().split(',')
+                if len(line) < 2 or line[0] == 'checkpoint':
+                    continue
+                results[line[0]] = (float(line[1]),
+                                    int(line[0].split('-')[-1]))
+        return results
+
+    def _write(self, values, step, callback):
+        try:
+            self._write_checkpoint(values, step, callback)
+        except Exception as e:
+            # Raised again from wait() in the main thread
+            self.error = e
+
+    def _write_checkpoint(self, values, step, callback):
+        feed_dict = dict(zip(self.shadow_placeholders, values))
+        self.session.run(self.assign_op, feed_dict=feed_dict)
+        path = self.saver.save(self.session,
+                               os.path.join(self.model_dir, 'model.ckpt'),
+                               global_step=step, write_meta_graph=False)
+        slim_path = None
+        if self.is_slim:
+            slim_path = self.slim_saver.save(
+                self.session,
+                os.path.join(self.model_dir, 'slim', 'model.ckpt'),
+                global_step=step, write_meta_graph=False)
+        print("Model saved in file: %s" % path)
+        self.last_path = path
+
+        # Refer to the new checkpoint before old ones are removed
+        if callback is not None:
+            callback(path)
+        with self.lock:
+            self.records.append([step, path, slim_path, None])
+            self._remove_old()
+
+    def _kept_steps(self):
+        """Return the set of steps whose checkpoints are kept."""
+        steps = [record[0] for record in self.records]
+        kept = set(steps[-self.keep_last:])
+        scored = [record for record in self.records if record[3] is not None]
+        scored = sorted(scored, key=lambda x: x[3])
+        kept |= set([record[0] for record in scored[:self.keep_best]])
+        if self.keep_best > 0:
+            # Not evaluated yet. Unscored checkpoints older than a scored one
+            # were skipped by evaluation (ex. early epochs)
+            last_scored_step = max([-1] + [record[0] for record in scored])
+            kept |= set([record[0] for record in self.records
+                         if record[3] is None and record[0] > last_scored_step])
+        if self.result_path is not None:
+            # The evaluator may not have restored them yet
+            kept |= set([step for step in steps
+                         if step > self.last_evaluated_step])
+        if self.keep_every > 0:
+            kept |= set([step for step in steps
+                         if step % self.keep_every == 0])
+        return kept
+
+    def _remove_old(self):
+        kept = self._kept_steps()
+        for record in self.records:
+            if record[0] in kept:
+                continue
+            for path in [record[1], record[2]]:
+                if path is None:
+                    continue
+                for file_path in tf.gfile.Glob(path + '.*'):
+                    tf.gfile.Remove(file_path)
+        self.records = [record for record in self.records
+                        if record[0] in kept]
+
+        # Keep the checkpoint state file consistent with files on disk
+        if len(self.records) > 0:
+            tf.train.update_checkpoint_state(
+                self.model_dir,
+                model_checkpoint_path=self.records[-1][1],
+                all_model_checkpoint_paths=[record[1] for record in self.records])
+            if self.is_slim:
+                tf.train.update_checkpoint_state(
+                    os.path.join(self.model_dir, 'slim'),
+                    model_checkpoint_path=self.records[-1][2],
+                    all_model_checkpoint_paths=[record[2] for record in self.records])
@@ -0,0 +1,259 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+
+BYTES_PER_FLOAT = 4
+
+
+def lstm_cost(input_dim, num_cell, num_proj=None):
+    """Cost of one step of a peephole LSTM cell.
+    Args:
+        input_dim: int, the dimensions of inputs
+        num_cell: int, the number of memory cells
+        num_proj: int, the number of nodes in recurrent projection layer
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+        output_dim: int, the dimensions of outputs
+    """
+    output_dim = num_cell if num_proj is None else num_proj
+    # 4 gates over [x, h], 3 peepholes, cell & hidden state updates
+    flops = 2 * 4 * num_cell * (input_dim + output_dim) + 2 * 3 * num_cell
+    flops += 10 * num_cell
+    # Concatenated [x, h], gates, cell state & its tanh, output
+    activations = (input_dim + output_dim) + 4 * num_cell + 2 * num_cell
+    activations += num_cell
+    if num_proj is not None:
+        flops += 2 * num_cell * num_proj
+        activations += num_proj
+    return flops, activations, output_dim
+
+
+def gru_cost(input_dim, num_cell):
+    """Cost of one step of a GRU cell.
+    Args:
+        input_dim: int, the dimensions of inputs
+        num_cell: int, the number of units
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+        output_dim: int, the dimensions of outputs
+    """
+    # Reset & update gates, candidate over [x, r * h], and the update
+    flops = 2 * 3 * num_cell * (input_dim + num_cell) + 8 * num_cell
+    activations = 2 * (input_dim + num_cell) + 3 * num_cell + num_cell
+    return flops, activations, num_cell
+
+
+def affine_cost(input_dim, output_dim):
+    """Cost of an affine layer for one frame.
+    Args:
+        input_dim: int, the dimensions of inputs
+        output_dim: int, the dimensions of outputs
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+    """
+    return 2 * input_dim * output_dim + output_dim, input_dim + output_dim
+
+
+def _rnn_cost(cell_type, input_size, num_cell, num_layer, num_proj=None,
+              is_bidirectional=False):
+    """Cost of stacked RNN layers for one frame.
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+        layer_outputs: list of the dimensions of inputs & each layer output
+    """
+    num_direction = 2 if is_bidirectional else 1
+    flops, activations = 0, 0
+    layer_outputs = [input_size]
+    input_dim = input_size
+    for _ in range(num_layer):
+        if cell_type == 'lstm':
+            flops_l, activations_l, output_dim = lstm_cost(
+                input_dim, num_cell, num_proj)
+        else:
+            flops_l, activations_l, output_dim = gru_cost(input_dim, num_cell)
+        flops += flops_l * num_direction
+        activations += activations_l * num_direction
+        input_dim = output_dim * num_direction
+        layer_outputs.append(input_dim)
+    return flops, activations, layer_outputs
+
+
+def _cnn_cost(input_size, num_classes, num_stack=1):
+    """Cost of the CNN front-end & fully-connected layers of CNN_CTC.
+       Stacked frames are input channels of the 1st conv layer.
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+        layer_outputs: list of the dimensions of inputs & each layer output
+    """
+    # (the number of frequency bins, input channels, output channels)
+    freq = input_size // (3 * num_stack)
+    freq_pooled = int(math.ceil(freq / 3.))
+    conv_layers = [(freq, 3 * num_stack, 128)]
+    conv_layers += [(freq_pooled, 128, 128)] * 2
+    conv_layers += [(freq_pooled, 128, 256)]
+    conv_layers += [(freq_pooled, 256, 256)] * 6
+
+    flops, activations = 0, 0
+    layer_outputs = [input_size]
+    for freq_l, in_channel, out_channel in conv_layers:
+        # 3 x 5 kernels with SAME padding & stride 1
+        flops += 2 * freq_l * 3 * 5 * in_channel * out_channel
+        activations += freq_l * in_channel + 2 * freq_l * out_channel
+        layer_outputs.append(freq_l * out_channel)
+    for input_dim, output_dim in [(freq_pooled * 256, 1024), (1024, 1024),
+                                  (1024, num_classes)]:
+        flops_l, activations_l = affine_cost(input_dim, output_dim)
+        flops += flops_l
+        activations += activations_l
+        layer_outputs.append(output_dim)
+    return flops, activations, layer_outputs
+
+
+def _attention_decoder_cost(encoder_dim, attention_dim, decoder_num_units,
+                            num_classes, time_steps):
+    """Cost of one output step of the attention decoder.
+    Returns:
+        flops: int, FLOPs of the forward pass
+        activations: int, the number of floats kept for backprop
+    """
+    # LSTM over [one-hot label, attention context]
+    flops, activations, _ = lstm_cost(num_classes + encoder_dim,
+                                      decoder_num_units)
+    # Encoder states are projected at every output step
+    flops += 2 * time_steps * encoder_dim * attention_dim
+    flops += 2 * decoder_num_units * attention_dim
+    # Bahdanau scores, softmax & the weighted sum of encoder outputs
+    flops += 3 * time_steps * attention_dim + 5 * time_steps
+    flops += 2 * time_steps * encoder_dim
+    activations += time_steps * (2 * attention_dim + 2 + encoder_dim)
+    # attention_mix & logits
+    for input_dim, output_dim in [(decoder_num_units + encoder_dim,
+                                   decoder_num_units),
+                                  (decoder_num_units, num_classes)]:
+        flops_l, activations_l = affine_cost(input_dim, output_dim)
+        flops += flops_l
+        activations += activations_l
+    return flops, activations
+
+
+def estimate_cost(network, num_skip=1, label_per_frame=0.1, time_steps=500,
+                  swap_memory=None, is_gpu=False):
+    """Estimate FLOPs & activation memory per input frame.
+       A multiply-add is counted as 2 FLOPs, and training as the forward pass
+       plus a backward pass of twice its cost. Activation memory counts
+       float32 tensors kept for the backward pass (training) or the largest
+       pair of consecutive layer outputs (inference). With swap_memory,
+       activations of RNN layers are kept in host memory during training if
+       the model is placed on a GPU. On CPU, swapping saves nothing.
+    Args:
+        network: CTC network in models/ctc (multi-task one included) or
+            attention network
+        num_skip: int, the number of frames to skip. Costs are divided by
+            num_skip to be per frame before skipping (frame stacking is
+            included in network.input_size)
+        label_per_frame: A float value. The number of output labels per
+            encoder frame (attention models only)
+        time_steps: int, the typical number of encoder frames, used for the
+            cost of attention (attention models only)
+        swap_memory: if True, activations of RNN layers are swapped out to
+            host memory. By default, network.swap_memory
+        is_gpu: if True, the model is placed on a GPU
+    Returns:
+        cost: dict of `flops_inference`, `flops_train`, `bytes_inference`,
+            `bytes_train` (device memory) and `bytes_train_host` per input
+            frame
+    """
+    if swap_memory is None:
+        swap_memory = getattr(network, 'swap_memory', False)
+
+    model_name = type(network).__name__
+    num_proj = getattr(network, 'num_proj', None)
+    if num_proj == 0:
+        num_proj = None
+
+    # Activations of RNN layers (while loops) which can be swapped out
+    activations_rnn = 0
+    if model_name == 'CNN_CTC':
+        flops, activations, layer_outputs = _cnn_cost(
+            network.input_size, network.num_classes,
+            num_stack=getattr(network, 'num_stack', 1))
+    elif model_name in ['LSTM_CTC', 'BLSTM_CTC', 'BLSTM_CTC_BOTTLENECK',
+                        'GRU_CTC', 'BGRU_CTC', 'Multitask_BLSTM_CTC']:
+        cell_type = 'lstm' if 'LSTM' in model_name else 'gru'
+        flops, activations, layer_outputs = _rnn_cost(
+            cell_type, network.input_size, network.num_cell,
+            network.num_layer, num_proj=num_proj,
+            is_bidirectional='BLSTM' in model_name or 'BGRU' in model_name)
+        activations_rnn = activations
+        input_dim = layer_outputs[-1]
+        if model_name == 'Multitask_BLSTM_CTC':
+            # The output layer of the second task on a shared hidden layer
+            # (all hidden layers have the same dimensions)
+            flops_l, activations_l = affine_cost(
+                input_dim, network.num_classes_second)
+            flops += flops_l
+            activations += activations_l
+        if model_name == 'BLSTM_CTC_BOTTLENECK':
+            flops_l, activations_l = affine_cost(
+                input_dim, network.bottleneck_dim)
+            flops += flops_l
+            activations += activations_l
+            input_dim = network.bottleneck_dim
+            layer_outputs.append(input_dim)
+        flops_l, activations_l = affine_cost(input_dim, network.num_classes)
+        flops += flops_l
+        activations += activations_l
+        layer_outputs.append(network.num_classes)
+    elif hasattr(network, 'encoder_num_units'):
+        # Attention models with a BLSTM encoder
+        flops, activations, layer_outputs = _rnn_cost(
+            'lstm', network.input_size, network.encoder_num_units,
+            network.encoder_num_layer, is_bidirectional=True)
+        activations_rnn = activations
+        flops_d, activations_d = _attention_decoder_cost(
+            layer_outputs[-1], network.attention_dim,
+            network.decoder_num_units, network.num_classes, time_steps)
+        flops += flops_d * label_per_frame
+        activations += activations_d * label_per_frame
+    else:
+        raise ValueError('%s is not supported.' % model_name)
+
+    # Consecutive layer outputs are alive at the same time in inference
+    activations_inference = max(
+        [x + y for x, y in zip(layer_outputs[:-1], layer_outputs[1:])])
+
+    # swap_memory moves activations from GPU to host memory only
+    activations_host = activations_rnn if swap_memory and is_gpu else 0
+
+    num_skip = float(num_skip)
+    return {'flops_inference': flops / num_skip,
+            'flops_train': 3 * flops / num_skip,
+            'bytes_inference': activations_inference * BYTES_PER_FLOAT / num_skip,
+            'bytes_train': (activations - activations_host) * BYTES_PER_FLOAT / num_skip,
+            'bytes_train_host': activations_host * BYTES_PER_FLOAT / num_skip}
+
+
+def format_cost(cost, frames_per_sec=100):
+    """Format the estimated cost.
+    Args:
+        cost: dict returned by estimate_cost
+        frames_per_sec: int, the number of input frames per second of speech
+    Returns:
+        string
+    """
+    text = ('Cost per frame: %.2f MFLOPs (inference) / %.2f MFLOPs (train), '
+            '%.1f KB activations (inference) / %.1f KB (train); '
+            '%.2f GFLOPs per second of speech (train)' %
+            (cost['flops_inference'] / 1e6, cost['flops_train'] / 1e6,
+             cost['bytes_inference'] / 1024., cost['bytes_train'] / 1024.,
+             cost['flops_train'] * frames_per_sec / 1e9))
+    if cost.get('bytes_train_host', 0) > 0:
+        text += ('\n%.1f KB activations per frame are swapped out to host '
+                 'memory' % (cost['bytes_train_host'] / 1024.))
+    return text
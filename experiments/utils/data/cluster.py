@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+def divide_by_num(data_num, num_cluster, unit=128):
+    """Divide dataset sorted by frame num into clusters of the same size.
+    Args:
+        data_num: int, the number of utterances
+        num_cluster: int, the number of clusters
+        unit: int, the size of each cluster is rounded to multiples of unit
+    Returns:
+        boundaries: list of tuple `(start, end)` of each cluster
+    """
+    data_num_cluster = int((data_num / num_cluster) / unit) * unit
+    return [(i * data_num_cluster, (i + 1) * data_num_cluster)
+            for i in range(num_cluster)]
+
+
+def divide_by_bytes(frame_num_list, bytes_per_frame, max_cluster_bytes,
+                    unit=1):
+    """Divide dataset into contiguous clusters whose inputs fit in the
+       memory budget. If the dataset is sorted by frame num, clusters of short
+       utterances contain more utterances than those of long utterances.
+    Args:
+        frame_num_list: list of the number of frames of each utterance (after
+            frame skipping)
+        bytes_per_frame: int, the size of one (stacked) frame in bytes
+        max_cluster_bytes: int, the maximum size of inputs in one cluster
+        unit: int, the size of each cluster is rounded down to multiples of
+            unit if possible
+    Returns:
+        boundaries: list of tuple `(start, end)` of each cluster
+    """
+    boundaries = []
+    start = 0
+    cluster_bytes = 0
+    i_utt = 0
+    while i_utt < len(frame_num_list):
+        utt_bytes = frame_num_list[i_utt] * bytes_per_frame
+        if cluster_bytes + utt_bytes > max_cluster_bytes and i_utt > start:
+            # Close the cluster
+            end = start + int((i_utt - start) / unit) * unit
+            if end == start:
+                end = i_utt
+            boundaries.append((start, end))
+            start = end
+            cluster_bytes = 0
+            i_utt = start
+            continue
+        cluster_bytes += utt_bytes
+        i_utt += 1
+    if start < len(frame_num_list):
+        boundaries.append((start, len(frame_num_list)))
+
+    return boundaries
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from os.path import join, isfile, isdir, dirname, expanduser
+import pickle
+import numpy as np
+from tqdm import tqdm
+
+
+def ctc_min_frame_num(label):
+    """Compute the minimum number of frames CTC needs to emit the labels.
+       A blank must be inserted between consecutive identical labels, so the
+       minimum is the label length plus the number of repeats.
+    Args:
+        label: list of label indices (or a string of characters)
+    Returns:
+        min_frame_num: int, the minimum number of frames
+    """
+    num_repeat = 0
+    for i in range(1, len(label)):
+        if label[i] == label[i - 1]:
+            num_repeat += 1
+    return len(label) + num_repeat
+
+
+def decimated_frame_num(frame_num, num_skip):
+    """Compute the number of frames after frame skipping.
+    Args:
+        frame_num: int, the number of frames before skipping
+        num_skip: int, the number of frames to skip
+    Returns:
+        frame_num_decimated: int, the number of frames after skipping
+    """
+    if num_skip is None or num_skip == 1:
+        return frame_num
+    return (frame_num + num_skip - 1) // num_skip
+
+
+def label_stats_path(dataset_path):
+    """Return the path to cache label statistics of a dataset. They are
+       saved next to `frame_num.pickle` of the dataset, or under
+       ~/.tensorflow_end2end/label_stats if the dataset is not writable.
+    Args:
+        dataset_path: path to the directory of the dataset
+    Returns:
+        path to the pickle file
+    """
+    if os.access(dataset_path, os.W_OK):
+        return join(dataset_path, 'label_stats.pickle')
+    return join(expanduser('~/.tensorflow_end2end/label_stats'),
+                dataset_path.strip('/').replace('/', '_') + '.pickle')
+
+
+def load_label_stats(input_names, label_paths, save_path=None,
+                     is_progressbar=False):
+    """Read all labels once and record the length of each label sequence.
+    Args:
+        input_names: list of utterance names
+        label_paths: list of paths to labels
+        save_path: path to the pickle file to cache the statistics. If it
+            exists and covers input_names, labels are not read again
+        is_progressbar: if True, visualize progressbar
+    Returns:
+        label_stats:
+            key => utterance name
+            value => tuple of `(label length, minimum frame num for CTC)`
+    """
+    if save_path is not None and isfile(save_path):
+        with open(save_path, 'rb') as f:
+            label_stats = pickle.load(f)
+        if all(input_name in label_stats for input_name in input_names):
+            return label_stats
+
+    print('=> Reading label lengths...')
+    label_stats = {}
+    iterator = tqdm(range(len(input_names))
+                    ) if is_progressbar else range(len(input_names))
+    for i in iterator:
+        label = np.load(label_paths[i]).tolist()
+        label_stats[input_names[i]] = (len(label), ctc_min_frame_num(label))
+
+    if save_path is not None:
+        if not isdir(dirname(save_path)):
+            os.makedirs(dirname(save_path))
+        with open(save_path + '.tmp', 'wb') as f:
+            pickle.dump(label_stats, f)
+        os.rename(save_path + '.tmp', save_path)
+
+    return label_stats
+
+
+def check_feasibility(input_names, frame_num_dict, label_stats_list,
+                      num_skip):
+    """Check whether each utterance has enough frames for CTC.
+    Args:
+        input_names: list of utterance names
+        frame_num_dict:
+            key => utterance name
+            value => the number of frames
+        label_stats_list: list of label statistics returned by
+            load_label_stats (one per label type)
+        num_skip: int, the number of frames to skip
+    Returns:
+        is_feasible: np.ndarray of bool, True if CTC can align the labels
+    """
+    is_feasible = np.ones((len(input_names),), dtype=bool)
+    for i, input_name in enumerate(input_names):
+        frame_num = decimated_frame_num(frame_num_dict[input_name], num_skip)
+        for label_stats in label_stats_list:
+            if frame_num < label_stats[input_name][1]:
+                is_feasible[i] = False
+    return is_feasible
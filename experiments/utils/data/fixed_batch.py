@@ -0,0 +1,43 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def make_fixed_batches(input_list, label_lists, input_names, batch_size,
+                       input_size):
+    """Make length-sorted & padded mini-batches once for evaluation.
+    Args:
+        input_list: list of input data
+        label_lists: list of lists of labels (one per task)
+        input_names: list of file names of input data
+        batch_size: int, mini batch size
+        input_size: int, the dimensions of input vectors
+    Returns:
+        batches: list of tuple `(input_data, labels (per task)..., seq_len,
+            input_names)` in the same format as DataSet.next_batch
+    """
+    data_num = len(input_list)
+    sorted_indices = sorted(range(data_num),
+                            key=lambda i: input_list[i].shape[0])
+
+    batches = []
+    for start in range(0, data_num, batch_size):
+        indices = sorted_indices[start:start + batch_size]
+        max_frame_num = input_list[indices[-1]].shape[0]
+
+        input_data = np.zeros((len(indices), max_frame_num, input_size),
+                              dtype=np.float32)
+        seq_len = np.empty((len(indices),), dtype=np.int64)
+        for i_batch, x in enumerate(indices):
+            frame_num = input_list[x].shape[0]
+            input_data[i_batch, :frame_num, :] = input_list[x]
+            seq_len[i_batch] = frame_num
+        labels_batch = [[label_list[x] for x in indices]
+                        for label_list in label_lists]
+        names_batch = [input_names[x] for x in indices]
+
+        batches.append(
+            tuple([input_data] + labels_batch + [seq_len, names_batch]))
+
+    return batches
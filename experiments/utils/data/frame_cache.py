@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from os.path import join, isfile
+import numpy as np
+
+
+def cache_path(cache_dir, label_type, train_data_size, data_type,
+               num_stack, num_skip):
+    """Return the directory to save frame-stacked inputs.
+    Args:
+        cache_dir: path to the root directory of the cache
+        label_type: label type of the dataset
+        train_data_size: default or large
+        data_type: train or dev or eval1 or eval2 or eval3
+        num_stack: int, the number of frames to stack
+        num_skip: int, the number of frames to skip
+    Returns:
+        path: path to the directory of the cache
+    """
+    path = join(cache_dir, label_type, train_data_size, data_type,
+                'stack' + str(num_stack) + '_skip' + str(num_skip))
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
+def save_packed(save_path, input_list, input_names):
+    """Save frame-stacked inputs of one cluster in the packed format.
+       All utterances are concatenated along the time axis and saved as a
+       single float32 array with the frame offsets of each utterance.
+    Args:
+        save_path: path prefix of the packed files
+        input_list: list of frame-stacked inputs
+        input_names: list of utterance names
+    """
+    offsets = np.zeros((len(input_list) + 1,), dtype=np.int64)
+    for i_utt, data_i in enumerate(input_list):
+        offsets[i_utt + 1] = offsets[i_utt] + data_i.shape[0]
+    packed = np.concatenate(input_list, axis=0).astype(np.float32)
+
+    # Write to temporary files first not to leave broken caches
+    for suffix, array in [('.inputs.npy', packed),
+                          ('.offsets.npy', offsets),
+                          ('.names.npy', np.array(input_names))]:
+        with open(save_path + suffix + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.rename(save_path + suffix + '.tmp', save_path + suffix)
+
+
+def load_packed(save_path, input_names, is_mmap=False):
+    """Load frame-stacked inputs of one cluster saved in the packed format.
+    Args:
+        save_path: path prefix of the packed files
+        input_names: list of utterance names expected in the cluster
+        is_mmap: if True, memory-map the packed array instead of reading it
+    Returns:
+        input_list: list of frame-stacked inputs, or None if the cache does
+            not exist or does not match input_names
+    """
+    for suffix in ['.inputs.npy', '.offsets.npy', '.names.npy']:
+        if not isfile(save_path + suffix):
+            return None
+
+    names = np.load(save_path + '.names.npy')
+    if len(names) != len(input_names) or not np.all(names == np.array(input_names)):
+        return None
+
+    offsets = np.load(save_path + '.offsets.npy')
+    packed = np.load(save_path + '.inputs.npy',
+                     mmap_mode='r' if is_mmap else None)
+
+    input_list = []
+    for i_utt in range(len(input_names)):
+        input_list.append(packed[offsets[i_utt]:offsets[i_utt + 1]])
+
+    return input_list
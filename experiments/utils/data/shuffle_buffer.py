@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import random
+
+
+class ShuffleBuffer(object):
+    """Fixed-size buffer to draw mini-batches of utterances with similar
+       lengths in random order. Utterances are kept sorted by frame num, and
+       each mini-batch is a window of neighbouring utterances around a
+       randomly chosen one.
+    Args:
+        buffer_size: int, the maximum number of utterances in the buffer
+    """
+
+    def __init__(self, buffer_size):
+        if buffer_size < 1:
+            raise ValueError('buffer_size must be more than 0.')
+        self.buffer_size = buffer_size
+        self.keys = []
+        self.items = []
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def is_full(self):
+        return len(self.items) >= self.buffer_size
+
+    def push(self, frame_num, item):
+        """Add an utterance to the buffer.
+        Args:
+            frame_num: int, the number of frames of the utterance
+            item: any object representing the utterance
+        """
+        # counter breaks ties without comparing items
+        key = (frame_num, self.counter)
+        self.counter += 1
+        i = bisect.bisect(self.keys, key)
+        self.keys.insert(i, key)
+        self.items.insert(i, item)
+
+    def pop_batch(self, batch_size):
+        """Remove utterances of similar lengths from the buffer.
+        Args:
+            batch_size: int, the number of utterances to remove
+        Returns:
+            batch: list of items, size min(batch_size, len(self))
+        """
+        batch_size = min(batch_size, len(self.items))
+        center = random.randrange(len(self.items))
+        start = min(max(center - batch_size // 2, 0),
+                    len(self.items) - batch_size)
+        batch = self.items[start:start + batch_size]
+        del self.keys[start:start + batch_size]
+        del self.items[start:start + batch_size]
+        random.shuffle(batch)
+        return batch
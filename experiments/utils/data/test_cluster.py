@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+
+sys.path.append('../../')
+from utils.data.cluster import divide_by_num, divide_by_bytes
+
+
+class TestCluster(unittest.TestCase):
+
+    def test_divide_by_num(self):
+        # Sizes are rounded down to multiples of unit
+        self.assertEqual(divide_by_num(1000, 3, unit=128),
+                         [(0, 256), (256, 512), (512, 768)])
+        self.assertEqual(divide_by_num(1024, 4, unit=128),
+                         [(0, 256), (256, 512), (512, 768), (768, 1024)])
+        self.assertEqual(divide_by_num(10, 2, unit=1), [(0, 5), (5, 10)])
+
+    def test_divide_by_bytes(self):
+        frame_num_list = [10, 10, 10, 20, 20, 40]
+
+        # Exactly at the budget
+        self.assertEqual(divide_by_bytes(frame_num_list, 1, 30),
+                         [(0, 3), (3, 4), (4, 5), (5, 6)])
+        self.assertEqual(divide_by_bytes(frame_num_list, 1, 40),
+                         [(0, 3), (3, 5), (5, 6)])
+
+        # An utterance larger than the budget makes its own cluster
+        self.assertEqual(divide_by_bytes([10, 100, 10], 1, 50),
+                         [(0, 1), (1, 2), (2, 3)])
+
+        # Everything fits
+        self.assertEqual(divide_by_bytes(frame_num_list, 2, 1000), [(0, 6)])
+
+        # Rounded down to multiples of unit
+        self.assertEqual(divide_by_bytes([1] * 12, 1, 7, unit=4),
+                         [(0, 4), (4, 8), (8, 12)])
+
+        # Clusters cover all utterances without overlap
+        boundaries = divide_by_bytes(list(range(1, 50)), 3, 100, unit=2)
+        self.assertEqual(boundaries[0][0], 0)
+        self.assertEqual(boundaries[-1][1], 49)
+        for (_, end), (start, _) in zip(boundaries[:-1], boundaries[1:]):
+            self.assertEqual(end, start)
+
+        self.assertEqual(divide_by_bytes([], 1, 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
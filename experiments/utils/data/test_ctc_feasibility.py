@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+
+sys.path.append('../../')
+from utils.data.ctc_feasibility import ctc_min_frame_num, decimated_frame_num
+from utils.data.ctc_feasibility import check_feasibility
+
+
+class TestCTCFeasibility(unittest.TestCase):
+
+    def test_ctc_min_frame_num(self):
+        self.assertEqual(ctc_min_frame_num([]), 0)
+        self.assertEqual(ctc_min_frame_num([1]), 1)
+        self.assertEqual(ctc_min_frame_num([1, 2, 3]), 3)
+
+        # A blank is needed between repeated labels
+        self.assertEqual(ctc_min_frame_num([1, 1]), 3)
+        self.assertEqual(ctc_min_frame_num([1, 1, 1]), 5)
+        self.assertEqual(ctc_min_frame_num([1, 1, 2, 2, 1]), 7)
+        self.assertEqual(ctc_min_frame_num('aab'), 4)
+
+    def test_decimated_frame_num(self):
+        self.assertEqual(decimated_frame_num(10, None), 10)
+        self.assertEqual(decimated_frame_num(10, 1), 10)
+
+        # The last partial frame is kept
+        self.assertEqual(decimated_frame_num(9, 3), 3)
+        self.assertEqual(decimated_frame_num(10, 3), 4)
+        self.assertEqual(decimated_frame_num(11, 3), 4)
+        self.assertEqual(decimated_frame_num(1, 3), 1)
+
+    def test_check_feasibility(self):
+        input_names = ['a', 'b', 'c']
+        frame_num_dict = {'a': 9, 'b': 10, 'c': 30}
+        # `(label length, minimum frame num)`
+        label_stats_main = {'a': (3, 3), 'b': (3, 5), 'c': (4, 4)}
+        label_stats_second = {'a': (4, 4), 'b': (1, 1), 'c': (10, 10)}
+
+        is_feasible = check_feasibility(input_names, frame_num_dict,
+                                        [label_stats_main], num_skip=3)
+        self.assertEqual(is_feasible.tolist(), [True, False, True])
+
+        # Infeasible for either label type
+        is_feasible = check_feasibility(
+            input_names, frame_num_dict,
+            [label_stats_main, label_stats_second], num_skip=3)
+        self.assertEqual(is_feasible.tolist(), [False, False, True])
+
+        # Without skipping
+        is_feasible = check_feasibility(input_names, frame_num_dict,
+                                        [label_stats_main], num_skip=1)
+        self.assertEqual(is_feasible.tolist(), [True, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+import numpy as np
+
+sys.path.append('../../')
+from utils.data.fixed_batch import make_fixed_batches
+
+
+class TestFixedBatch(unittest.TestCase):
+
+    def test_make_fixed_batches(self):
+        frame_num_list = [7, 3, 5, 1, 9]
+        input_list = [np.full((frame_num, 2), frame_num, dtype=np.float64)
+                      for frame_num in frame_num_list]
+        labels = [[frame_num] for frame_num in frame_num_list]
+        input_names = ['utt' + str(frame_num) for frame_num in frame_num_list]
+
+        batches = make_fixed_batches(input_list, [labels, labels],
+                                     input_names, batch_size=2, input_size=2)
+        self.assertEqual(len(batches), 3)
+
+        # Sorted by length, the last batch has the rest
+        seq_len_list = [batch[3].tolist() for batch in batches]
+        self.assertEqual(seq_len_list, [[1, 3], [5, 7], [9]])
+
+        for input_data, labels_main, labels_second, seq_len, names in batches:
+            self.assertEqual(input_data.shape,
+                             (len(seq_len), max(seq_len), 2))
+            self.assertEqual(input_data.dtype, np.float32)
+            for i_batch, frame_num in enumerate(seq_len):
+                # Padded with 0
+                self.assertTrue(np.all(input_data[i_batch, :frame_num] == frame_num))
+                self.assertTrue(np.all(input_data[i_batch, frame_num:] == 0))
+                self.assertEqual(labels_main[i_batch], [frame_num])
+                self.assertEqual(labels_second[i_batch], [frame_num])
+                self.assertEqual(names[i_batch], 'utt' + str(frame_num))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+from os.path import join
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.append('../../')
+from utils.data.frame_cache import cache_path, save_packed, load_packed
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache_path(self):
+        path = cache_path(self.cache_dir, 'kanji', 'default', 'train', 3, 3)
+        self.assertEqual(path, join(self.cache_dir, 'kanji', 'default',
+                                    'train', 'stack3_skip3'))
+        self.assertNotEqual(
+            path, cache_path(self.cache_dir, 'kanji', 'default', 'train', 3, 2))
+
+    def test_round_trip(self):
+        rng = np.random.RandomState(0)
+        input_list = [rng.randn(frame_num, 6) for frame_num in [5, 1, 12]]
+        input_names = ['A01_0001', 'A01_0002', 'A02_0001']
+        save_path = join(self.cache_dir, 'cluster')
+        save_packed(save_path, input_list, input_names)
+
+        for is_mmap in [False, True]:
+            loaded = load_packed(save_path, input_names, is_mmap=is_mmap)
+            self.assertEqual(len(loaded), len(input_list))
+            for data_i, loaded_i in zip(input_list, loaded):
+                self.assertEqual(loaded_i.shape, data_i.shape)
+                # Saved in float32
+                self.assertEqual(loaded_i.dtype, np.float32)
+                np.testing.assert_allclose(loaded_i, data_i, rtol=1e-6)
+
+    def test_mismatch(self):
+        input_list = [np.zeros((3, 2)), np.ones((4, 2))]
+        save_path = join(self.cache_dir, 'cluster')
+
+        # Not saved yet
+        self.assertIsNone(load_packed(save_path, ['a', 'b']))
+
+        save_packed(save_path, input_list, ['a', 'b'])
+        self.assertIsNone(load_packed(save_path, ['a', 'c']))
+        self.assertIsNone(load_packed(save_path, ['a']))
+        self.assertIsNotNone(load_packed(save_path, ['a', 'b']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import random
+import unittest
+
+sys.path.append('../../')
+from utils.data.shuffle_buffer import ShuffleBuffer
+
+
+class TestShuffleBuffer(unittest.TestCase):
+
+    def test_pop_batch(self):
+        random.seed(0)
+        frame_num_list = list(range(100))
+        random.shuffle(frame_num_list)
+
+        buffer = ShuffleBuffer(buffer_size=100)
+        for frame_num in frame_num_list:
+            self.assertFalse(buffer.is_full())
+            buffer.push(frame_num, frame_num)
+        self.assertTrue(buffer.is_full())
+
+        popped = []
+        while len(buffer) > 0:
+            batch = buffer.pop_batch(8)
+            # The last batch has the rest
+            self.assertEqual(len(batch), min(8, 100 - len(popped)))
+            popped += batch
+            # The rest are still sorted by frame num
+            self.assertEqual(buffer.keys, sorted(buffer.keys))
+
+        self.assertEqual(sorted(popped), list(range(100)))
+
+    def test_window(self):
+        # Each batch is a window of consecutive lengths
+        for seed in range(20):
+            random.seed(seed)
+            buffer = ShuffleBuffer(buffer_size=50)
+            for frame_num in range(50):
+                buffer.push(frame_num * 10, frame_num * 10)
+            batch = sorted(buffer.pop_batch(5))
+            self.assertEqual(batch,
+                             list(range(batch[0], batch[0] + 50, 10)))
+            self.assertEqual(len(buffer), 45)
+
+    def test_ties(self):
+        # Items of the same length are not compared
+        buffer = ShuffleBuffer(buffer_size=3)
+        for item in [{'a': 1}, {'b': 2}, {'c': 3}]:
+            buffer.push(10, item)
+        self.assertEqual(len(buffer.pop_batch(5)), 3)
+
+    def test_buffer_size(self):
+        with self.assertRaises(ValueError):
+            ShuffleBuffer(buffer_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import numpy as np
+import tensorflow as tf
+
+from utils.data.sparsetensor import list2sparsetensor
+
+
+class DevMonitor(object):
+    """Monitor the loss on a fixed subset of the dev set during training.
+       Mini-batches are made and padded once, and cached in memory.
+    Args:
+        dataset: DataSet of the dev set
+        batch_size: int, mini batch size
+        num_batch: int, the number of mini-batches in the subset
+        interval: int, evaluate the loss every `interval` steps
+    """
+
+    def __init__(self, dataset, batch_size, num_batch=10, interval=100):
+        self.interval = interval
+
+        # Pick mini-batches over the whole dev set
+        iteration = int(dataset.data_num / batch_size)
+        if (dataset.data_num / batch_size) != int(dataset.data_num / batch_size):
+            iteration += 1
+        pick_interval = max(1, iteration // num_batch)
+        self.batches = []
+        for i_batch in range(iteration):
+            inputs, labels, seq_len, _ = dataset.next_batch(
+                batch_size=batch_size)
+            if i_batch % pick_interval == 0 and len(self.batches) < num_batch:
+                self.batches.append((inputs.astype(np.float32),
+                                     list2sparsetensor(labels),
+                                     seq_len, labels))
+        self.batch_index = 0
+
+        # Time spent for monitoring
+        self.duration = 0.
+
+    def is_step(self, step):
+        """Return True if the loss should be evaluated at the step.
+        Args:
+            step: int, the current step (0-indexed)
+        """
+        return (step + 1) % self.interval == 0
+
+    def _feed_dict(self, network, batch):
+        inputs, (indices, values, dense_shape), seq_len, _ = batch
+        return {
+            network.inputs: inputs,
+            network.label_indices: indices,
+            network.label_values: values,
+            network.label_shape: dense_shape,
+            network.seq_len: seq_len,
+            network.keep_prob_input: 1.0,
+            network.keep_prob_hidden: 1.0
+        }
+
+    def next_feed_dict(self, network):
+        """Return the feed dictionary of the next cached mini batch.
+        Args:
+            network: network to evaluate
+        Returns:
+            feed_dict: feed dictionary for the dev mini batch
+            labels: list of labels in the mini batch
+        """
+        batch = self.batches[self.batch_index]
+        self.batch_index = (self.batch_index + 1) % len(self.batches)
+        return self._feed_dict(network, batch), batch[3]
+
+    def evaluate(self, session, network, loss_op, summary_writer=None,
+                 step=None):
+        """Compute the mean loss over the cached subset.
+        Args:
+            session: session of training model
+            network: network to evaluate
+            loss_op: operation for computing loss
+            summary_writer: if not None, write the loss & the time spent to
+                TensorBoard
+            step: int, global step for TensorBoard
+        Returns:
+            loss_dev: A float value. The mean loss over the subset
+        """
+        start_time = time.time()
+        loss_sum, utt_num = 0., 0
+        for batch in self.batches:
+            loss_local = session.run(
+                loss_op, feed_dict=self._feed_dict(network, batch))
+            loss_sum += loss_local * len(batch[2])
+            utt_num += len(batch[2])
+        loss_dev = loss_sum / utt_num
+        duration = time.time() - start_time
+        self.duration += duration
+
+        if summary_writer is not None:
+            summary = tf.Summary(value=[
+                tf.Summary.Value(tag='dev_monitor/loss',
+                                 simple_value=loss_dev),
+                tf.Summary.Value(tag='dev_monitor/duration_sec',
+                                 simple_value=duration)])
+            summary_writer.add_summary(summary, step)
+
+        return loss_dev
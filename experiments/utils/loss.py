@@ -17,7 +17,11 @@ def plot_loss(steps, train_loss, dev_loss, save_path):
         save_path:
     """
     plt.plot(steps, train_loss, "b", label="Training Loss")
-    plt.plot(steps, dev_loss, "r", label="Dev Loss")
+    # Dev loss is computed only at intervals (NaN elsewhere)
+    steps = np.array(steps)
+    dev_loss = np.array(dev_loss, dtype=np.float64)
+    is_computed = ~np.isnan(dev_loss)
+    plt.plot(steps[is_computed], dev_loss[is_computed], "r", label="Dev Loss")
     # plt.vlines(steps[-1], 0, train_loss[-1], color='0.75')
     # plt.hlines(train_loss[-1], 0, steps[-1], color='0.75')
     plt.legend(loc="upper right", fontsize=12)
@@ -28,3 +32,21 @@ def plot_loss(steps, train_loss, dev_loss, save_path):
 def save_loss(steps, train_loss, dev_loss, save_path):
     loss_graph = np.column_stack((steps, train_loss, dev_loss))
     np.savetxt(os.path.join(save_path, "loss.csv"), loss_graph, delimiter=",")
+
+
+def load_loss(save_path):
+    """Load losses saved by save_loss.
+    Args:
+        save_path: path to the directory of loss.csv
+    Returns:
+        steps: list of steps
+        train_loss: list of train losses
+        dev_loss: list of dev losses (NaN where not computed)
+    """
+    loss_path = os.path.join(save_path, "loss.csv")
+    if not os.path.isfile(loss_path):
+        return [], [], []
+    loss_graph = np.loadtxt(loss_path, delimiter=",", ndmin=2)
+    return (loss_graph[:, 0].astype(np.int64).tolist(),
+            loss_graph[:, 1].tolist(),
+            loss_graph[:, 2].tolist())
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import numpy as np
+import tensorflow as tf
+
+
+class MetricsSink(object):
+    """Append losses to `loss.csv` as training goes, and record throughput
+       per interval. Memory does not grow with the number of steps.
+       The format of `loss.csv` is the same as utils.loss.save_loss.
+    Args:
+        save_path: path to the directory to save `loss.csv` &
+            `throughput.csv`
+        start_step: int, the step to resume from. Rows of `loss.csv` at
+            start_step and later are removed. If 0, the files are created
+        flush_interval: int, the number of rows buffered before written
+    """
+
+    def __init__(self, save_path, start_step=0, flush_interval=100):
+        self.loss_path = os.path.join(save_path, 'loss.csv')
+        self.throughput_path = os.path.join(save_path, 'throughput.csv')
+        self.flush_interval = flush_interval
+
+        if start_step > 0 and os.path.isfile(self.loss_path):
+            # Drop losses after the step to resume from, one line at a time
+            with open(self.loss_path, 'r') as f_in:
+                with open(self.loss_path + '.tmp', 'w') as f_out:
+                    for line in f_in:
+                        if int(float(line.split(',')[0])) < start_step:
+                            f_out.write(line)
+            os.rename(self.loss_path + '.tmp', self.loss_path)
+        else:
+            open(self.loss_path, 'w').close()
+        if start_step == 0 or not os.path.isfile(self.throughput_path):
+            with open(self.throughput_path, 'w') as f:
+                f.write('step,frames_per_sec,utt_per_sec,padding_ratio\n')
+        self.f_loss = open(self.loss_path, 'a')
+        self.num_buffered = 0
+
+        # Counts since the last report
+        self.frame_num = 0
+        self.frame_num_padded = 0
+        self.utt_num = 0
+        self.start_time = time.time()
+
+    def add_loss(self, step, loss_train, loss_dev=np.nan):
+        """Append losses of a step.
+        Args:
+            step: int, the step
+            loss_train: A float value. Training loss
+            loss_dev: A float value. Dev loss (NaN if not computed)
+        """
+        self.f_loss.write('%.18e,%.18e,%.18e\n' %
+                          (step, loss_train, loss_dev))
+        self.num_buffered += 1
+        if self.num_buffered >= self.flush_interval:
+            self.flush()
+
+    def add_batch(self, inputs, seq_len):
+        """Count frames & utterances of a mini batch.
+        Args:
+            inputs: `[batch_size, max_time, input_size]`, padded inputs
+            seq_len: `[batch_size]`
+        """
+        self.frame_num += int(np.sum(seq_len))
+        self.frame_num_padded += len(seq_len) * np.shape(inputs)[1]
+        self.utt_num += len(seq_len)
+
+    def restart(self):
+        """Exclude the time since the last batch from throughput (ex. saving
+           checkpoints & evaluation at the end of each epoch). Mini batches
+           since the last report are dropped.
+        """
+        self.frame_num = 0
+        self.frame_num_padded = 0
+        self.utt_num = 0
+        self.start_time = time.time()
+
+    def flush(self):
+        """Write buffered losses to the file."""
+        self.f_loss.flush()
+        self.num_buffered = 0
+
+    def report(self, summary_writer=None, step=None):
+        """Write throughput since the last report.
+        Args:
+            summary_writer: if not None, write to TensorBoard
+            step: int, global step
+        Returns:
+            stats: dict of `frames_per_sec`, `utt_per_sec` and `padding_ratio`
+                (the fraction of padded frames in mini batches)
+        """
+        self.flush()
+        duration = time.time() - self.start_time
+        if self.utt_num == 0 or duration <= 0:
+            return {}
+
+        stats = {'frames_per_sec': self.frame_num / duration,
+                 'utt_per_sec': self.utt_num / duration,
+                 'padding_ratio': 1 - self.frame_num / float(self.frame_num_padded)}
+
+        if summary_writer is not None:
+            summary_writer.add_summary(tf.Summary(value=[
+                tf.Summary.Value(tag='throughput/' + key,
+                                 simple_value=float(stats[key]))
+                for key in sorted(stats.keys())]), step)
+
+        with open(self.throughput_path, 'a') as f:
+            f.write('%s,%.3f,%.3f,%.6f\n' %
+                    (str(step), stats['frames_per_sec'], stats['utt_per_sec'],
+                     stats['padding_ratio']))
+
+        # Reset
+        self.frame_num = 0
+        self.frame_num_padded = 0
+        self.utt_num = 0
+        self.start_time = time.time()
+
+        return stats
+
+    def format(self, stats):
+        """Make a one-line summary of stats returned by report().
+        Args:
+            stats: dict returned by report()
+        Returns:
+            line: string
+        """
+        if len(stats) == 0:
+            return ''
+        return '%.1f frames/sec, %.1f utt/sec, %.1f%% padding' % (
+            stats['frames_per_sec'], stats['utt_per_sec'],
+            stats['padding_ratio'] * 100)
+
+    def close(self):
+        """Write buffered losses & close the file."""
+        self.f_loss.close()
@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Aggregate op execution time & memory of traces by name scope.
+   Usage:
+       python scope_report.py path_to_model/trace/run_metadata_train_step*.pb
+"""
+
+import os
+import re
+import sys
+import tensorflow as tf
+
+# Name scopes defined in models
+SCOPE_PATTERNS = [
+    r'^(Bi)?(LSTM|GRU)_(encoder_)?hidden\d+$',
+    r'^output(_main|_second)?$',
+    r'^bottleneck$',
+    r'^(conv|pool|fc)\d+$',
+    r'^ctc_loss(_main|_second)?$',
+    r'^attention_layer$',
+    r'^lstm_decoder$',
+    r'^(total_loss|ler|dropout)$',
+]
+
+
+def node_scope(node_name, scope_patterns=SCOPE_PATTERNS):
+    """Find the name scope which a node belongs to.
+    Args:
+        node_name: string, the name of the node
+        scope_patterns: list of regular expressions of name scopes
+    Returns:
+        scope: string, the innermost matched scope (or the first component of
+            the node name if no scope is matched)
+        is_backward: if True, the node computes gradients
+    """
+    components = node_name.split('/')
+    is_backward = components[0] == 'gradients'
+    if is_backward:
+        components = components[1:]
+    for component in reversed(components[:-1]):
+        for pattern in scope_patterns:
+            if re.match(pattern, component):
+                return component, is_backward
+    if len(components) == 1:
+        # Ops outside any scope (ex. CTCBeamSearchDecoder)
+        return '(root)', is_backward
+    return components[0], is_backward
+
+
+def aggregate_by_scope(step_stats, scope_patterns=SCOPE_PATTERNS):
+    """Aggregate op execution time & output memory by name scope.
+    Args:
+        step_stats: StepStats of RunMetadata
+        scope_patterns: list of regular expressions of name scopes
+    Returns:
+        report:
+            key => scope
+            value => dict of `forward_us`, `backward_us`, `bytes` and `op_num`
+    """
+    report = {}
+    for dev_stats in step_stats.dev_stats:
+        # Kernels on GPU are also recorded per stream. Count each op once.
+        if 'stream:' in dev_stats.device or 'memcpy' in dev_stats.device:
+            continue
+        for node_stats in dev_stats.node_stats:
+            if node_stats.node_name == '_SOURCE':
+                continue
+            scope, is_backward = node_scope(node_stats.node_name,
+                                            scope_patterns)
+            if scope not in report:
+                report[scope] = {'forward_us': 0, 'backward_us': 0,
+                                 'bytes': 0, 'op_num': 0}
+            elapsed = node_stats.all_end_rel_micros
+            if is_backward:
+                report[scope]['backward_us'] += elapsed
+            else:
+                report[scope]['forward_us'] += elapsed
+            for output in node_stats.output:
+                report[scope]['bytes'] += output.tensor_description.allocation_description.requested_bytes
+            report[scope]['op_num'] += 1
+    return report
+
+
+def load_run_metadata(path):
+    """Load RunMetadata saved by utils.trace.TraceHook.
+    Args:
+        path: path to the .pb file
+    Returns:
+        run_metadata: RunMetadata
+    """
+    run_metadata = tf.RunMetadata()
+    with open(path, 'rb') as f:
+        run_metadata.ParseFromString(f.read())
+    return run_metadata
+
+
+def make_table(report, trace_num=1):
+    """Format the report as a table sorted by total time.
+    Args:
+        report: dict returned by aggregate_by_scope
+        trace_num: int, the number of traces aggregated in the report. Values
+            are averaged over traces
+    Returns:
+        lines: list of strings
+    """
+    total_us = sum([stats['forward_us'] + stats['backward_us']
+                    for stats in report.values()])
+    scopes = sorted(report.keys(),
+                    key=lambda x: -(report[x]['forward_us'] + report[x]['backward_us']))
+
+    lines = ['%-28s %10s %10s %10s %7s %10s %6s' %
+             ('scope', 'fwd[ms]', 'bwd[ms]', 'total[ms]', 'ratio', 'out[MB]', 'ops')]
+    for scope in scopes:
+        stats = report[scope]
+        scope_us = stats['forward_us'] + stats['backward_us']
+        lines.append('%-28s %10.2f %10.2f %10.2f %6.1f%% %10.2f %6d' %
+                     (scope,
+                      stats['forward_us'] / 1000. / trace_num,
+                      stats['backward_us'] / 1000. / trace_num,
+                      scope_us / 1000. / trace_num,
+                      scope_us / max(total_us, 1) * 100,
+                      stats['bytes'] / 1024. ** 2 / trace_num,
+                      stats['op_num'] // trace_num))
+    lines.append('%-28s %32.2f' % ('Total', total_us / 1000. / trace_num))
+    return lines
+
+
+def main(trace_paths):
+
+    report = {}
+    for trace_path in trace_paths:
+        run_metadata = load_run_metadata(trace_path)
+        for scope, stats in aggregate_by_scope(run_metadata.step_stats).items():
+            if scope not in report:
+                report[scope] = {'forward_us': 0, 'backward_us': 0,
+                                 'bytes': 0, 'op_num': 0}
+            for key in stats.keys():
+                report[scope][key] += stats[key]
+
+    lines = make_table(report, trace_num=len(trace_paths))
+    print('\n'.join(lines))
+
+    # Save next to the traces
+    save_path = os.path.join(os.path.dirname(os.path.abspath(trace_paths[0])),
+                             'scope_report.txt')
+    with open(save_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) < 2:
+        raise ValueError(("Set paths to traces.\n"
+                          "Usage: python scope_report.py path_to_run_metadata.pb ..."))
+
+    main(trace_paths=args[1:])
@@ -0,0 +1,215 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from os.path import join, isfile, isdir, expanduser
+import glob
+import socket
+import yaml
+import tensorflow as tf
+
+
+def session_config_path(hostname=None):
+    """Return the path to the tuned session settings of a host.
+       The directory can be changed by SESSION_CONFIG_DIR.
+    Args:
+        hostname: string, the name of the host. By default, this host
+    Returns:
+        path to the yml file
+    """
+    if hostname is None:
+        hostname = socket.gethostname()
+    config_dir = os.environ.get(
+        'SESSION_CONFIG_DIR', expanduser('~/.tensorflow_end2end'))
+    return join(config_dir, hostname + '.yml')
+
+
+def model_key(network):
+    """Make the key of the tuned settings of a model shape.
+    Args:
+        network: CTC network in models/ctc/load_model.py
+    Returns:
+        string
+    """
+    return '%s_in%d_stack%d_cell%d_layer%d_proj%d_batch%d' % (
+        type(network).__name__.lower(), network.input_size,
+        getattr(network, 'num_stack', 1), network.num_cell,
+        network.num_layer, getattr(network, 'num_proj', None) or 0,
+        network.batch_size)
+
+
+def save_session_config(settings, mode='train', key=None, hostname=None):
+    """Save the tuned session settings of a host. The settings are also used
+       for models which are not tuned.
+    Args:
+        settings: dict of `intra_op_parallelism_threads`,
+            `inter_op_parallelism_threads` and `cpu_list` (list of core ids, or
+            None to use all cores)
+        mode: train or inference
+        key: string, the model shape tuned for (see model_key)
+        hostname: string, the name of the host. By default, this host
+    Returns:
+        path to the yml file
+    """
+    settings_all = read_session_config(hostname)
+    settings_all[mode] = settings
+    if key is not None:
+        settings_all.setdefault('models', {}).setdefault(key, {})[mode] = settings
+    path = session_config_path(hostname)
+    config_dir = os.path.dirname(path)
+    if not isdir(config_dir):
+        os.makedirs(config_dir)
+    with open(path, 'w') as f:
+        yaml.dump(settings_all, f, default_flow_style=False)
+    return path
+
+
+def read_session_config(hostname=None):
+    """Read the tuned session settings of a host.
+    Args:
+        hostname: string, the name of the host. By default, this host
+    Returns:
+        settings_all: dict of mode => dict of tuned settings (empty if the host
+            is not tuned). Settings of each model shape are in `models`
+            (dict of model key => dict of mode => dict of tuned settings)
+    """
+    path = session_config_path(hostname)
+    if not isfile(path):
+        return {}
+    with open(path, 'r') as f:
+        return yaml.load(f) or {}
+
+
+def tuned_settings(mode='train', network=None):
+    """Return the tuned session settings of this host for a model.
+    Args:
+        mode: train or inference. Inference falls back to the settings for
+            training if it is not tuned
+        network: if not None, the settings tuned for the shape of this
+            network are preferred over the settings of the host
+    Returns:
+        settings: dict of tuned settings (empty if the host is not tuned)
+    """
+    settings_all = read_session_config()
+    if network is not None:
+        settings_model = settings_all.get('models', {}).get(
+            model_key(network), {})
+        if mode in settings_model or 'train' in settings_model:
+            settings_all = settings_model
+    return dict(settings_all.get(mode, settings_all.get('train', {})))
+
+
+def cpu_topology():
+    """Read the CPU topology from sysfs.
+    Returns:
+        sockets: dict of socket id => list of core ids
+        siblings: list of lists of core ids sharing a physical core
+    """
+    sockets, siblings = {}, []
+    for cpu_dir in sorted(glob.glob('/sys/devices/system/cpu/cpu[0-9]*')):
+        core_id = int(os.path.basename(cpu_dir)[3:])
+        package_path = join(cpu_dir, 'topology', 'physical_package_id')
+        siblings_path = join(cpu_dir, 'topology', 'thread_siblings_list')
+        if not isfile(package_path):
+            continue
+        with open(package_path, 'r') as f:
+            sockets.setdefault(int(f.read()), []).append(core_id)
+        with open(siblings_path, 'r') as f:
+            sibling = parse_cpu_list(f.read())
+        if sibling not in siblings:
+            siblings.append(sibling)
+    for socket_id in sockets:
+        sockets[socket_id] = sorted(sockets[socket_id])
+    return sockets, sorted(siblings)
+
+
+def parse_cpu_list(cpu_list):
+    """Parse a cpu list like `0-3,8,10-11`.
+    Args:
+        cpu_list: string
+    Returns:
+        list of core ids
+    """
+    cores = []
+    for cpu_range in cpu_list.strip().split(','):
+        if '-' in cpu_range:
+            start, end = cpu_range.split('-')
+            cores += list(range(int(start), int(end) + 1))
+        elif cpu_range != '':
+            cores.append(int(cpu_range))
+    return sorted(cores)
+
+
+def set_affinity(cpu_list):
+    """Pin this process to cores. Threads created later inherit the mask,
+       so call this before creating a session.
+    Args:
+        cpu_list: list of core ids
+    Returns:
+        True if the affinity was changed
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        # Python 2 has no affinity API; use taskset instead
+        return False
+    os.sched_setaffinity(0, cpu_list)
+    return True
+
+
+def apply_tuned_affinity(mode='train', network=None):
+    """Pin this process to the tuned cores of this host unless it is already
+       restricted to a subset of cores (e.g. by taskset). Call this before
+       creating a session.
+    Args:
+        mode: train or inference. Inference falls back to the settings for
+            training if it is not tuned
+        network: if not None, the settings tuned for the shape of this
+            network are preferred
+    Returns:
+        True if the affinity was changed
+    """
+    settings = tuned_settings(mode, network)
+    cpu_list = settings.get('cpu_list')
+    if cpu_list is None:
+        return False
+    if not hasattr(os, 'sched_getaffinity'):
+        tf.logging.warning(
+            'Cannot pin this process to the tuned cores %s. '
+            'Run it with `taskset -c` instead.' %
+            ','.join(map(str, cpu_list)))
+        return False
+    all_cores = sum(cpu_topology()[0].values(), [])
+    if sorted(os.sched_getaffinity(0)) != sorted(all_cores):
+        # Already pinned by taskset or utils/sweep.py
+        return False
+    return set_affinity(cpu_list)
+
+
+def load_session_config(mode='train', network=None, **kwargs):
+    """Make a ConfigProto with the tuned settings of this host. The thread
+       counts can be overridden by TF_INTRA_OP_THREADS & TF_INTER_OP_THREADS.
+       The tuned cores are not applied here; call apply_tuned_affinity.
+    Args:
+        mode: train or inference. Inference falls back to the settings for
+            training if it is not tuned
+        network: if not None, the settings tuned for the shape of this
+            network are preferred
+        kwargs: arguments of tf.ConfigProto. These take priority over the tuned
+            settings (e.g. device_count)
+    Returns:
+        config: tf.ConfigProto
+    """
+    settings = tuned_settings(mode, network)
+
+    # Thread counts given by the sweep runner (utils/sweep.py)
+    for key, env_name in [('intra_op_parallelism_threads', 'TF_INTRA_OP_THREADS'),
+                          ('inter_op_parallelism_threads', 'TF_INTER_OP_THREADS')]:
+        if env_name in os.environ:
+            settings[key] = int(os.environ[env_name])
+
+    for key in ['intra_op_parallelism_threads',
+                'inter_op_parallelism_threads']:
+        if kwargs.get(key) is None and key in settings:
+            kwargs[key] = settings[key]
+        elif kwargs.get(key) is None:
+            kwargs.pop(key, None)
+    return tf.ConfigProto(**kwargs)
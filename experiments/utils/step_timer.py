@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import tensorflow as tf
+
+
+class StepTimer(object):
+    """Record wall time of each phase of training steps.
+       Durations are accumulated per step, and the percentiles over the steps
+       since the last report are written to TensorBoard and a CSV file.
+    Args:
+        phases: list of phase names in the order they are reported
+        save_path: path to the directory to save `step_time.csv`
+        start_step: int, the step to resume from. Rows of `step_time.csv` at
+            start_step and later are removed. If 0, the file is created
+    """
+
+    def __init__(self, phases, save_path=None, start_step=0):
+        self.phases = list(phases)
+        self.csv_path = None
+        if save_path is not None:
+            self.csv_path = os.path.join(save_path, 'step_time.csv')
+            if start_step > 0 and os.path.isfile(self.csv_path):
+                # Drop rows after the step to resume from
+                with open(self.csv_path, 'r') as f_in:
+                    with open(self.csv_path + '.tmp', 'w') as f_out:
+                        f_out.write(f_in.readline())
+                        for line in f_in:
+                            if int(line.split(',')[0]) < start_step:
+                                f_out.write(line)
+                os.rename(self.csv_path + '.tmp', self.csv_path)
+            else:
+                with open(self.csv_path, 'w') as f:
+                    f.write('step,phase,mean,p50,p90,p99,ratio\n')
+
+        # Durations of the current step
+        self.step_durations = dict((phase, 0.) for phase in self.phases)
+        # Durations of the steps since the last report
+        self.durations = dict((phase, []) for phase in self.phases)
+        self.start_time_step = time.time()
+        self.step_times = []
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the wall time of a phase.
+           Usage:
+               with timer.phase('train'):
+                   sess.run(train_op, feed_dict=feed_dict)
+        Args:
+            name: string, the name of the phase
+        """
+        if name not in self.step_durations:
+            # Declare all phases in the constructor. A phase added here is
+            # filled with 0 for the steps since the last report
+            self.phases.append(name)
+            self.step_durations[name] = 0.
+            self.durations[name] = [0.] * len(self.step_times)
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.step_durations[name] += time.time() - start_time
+
+    def end_step(self):
+        """Close the current step."""
+        for phase in self.phases:
+            self.durations[phase].append(self.step_durations[phase])
+            self.step_durations[phase] = 0.
+        now = time.time()
+        self.step_times.append(now - self.start_time_step)
+        self.start_time_step = now
+
+    def restart(self):
+        """Exclude the time since the last step from the step time (ex.
+           saving checkpoints & evaluation at the end of each epoch).
+        """
+        for phase in self.phases:
+            self.step_durations[phase] = 0.
+        self.start_time_step = time.time()
+
+    def report(self, summary_writer=None, step=None):
+        """Write percentiles of each phase since the last report.
+        Args:
+            summary_writer: if not None, write to TensorBoard
+            step: int, global step
+        Returns:
+            stats:
+                key => phase name
+                value => tuple of `(mean, p50, p90, p99, ratio)` in seconds.
+                    ratio is the fraction of the total step time
+        """
+        if len(self.step_times) == 0:
+            return {}
+        total_time = sum(self.step_times)
+
+        stats = {}
+        summary_values = []
+        for phase in self.phases:
+            durations = np.array(self.durations[phase])
+            # Phases that did not run in this window (ex. 'decode') are filled
+            # with 0 by end_step()
+            if len(durations) == 0:
+                continue
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+            ratio = np.sum(durations) / total_time if total_time > 0 else 0.
+            stats[phase] = (np.mean(durations), p50, p90, p99, ratio)
+            for tag, value in zip(['mean', 'p50', 'p90', 'p99', 'ratio'],
+                                  stats[phase]):
+                summary_values.append(tf.Summary.Value(
+                    tag='step_time/%s/%s' % (phase, tag),
+                    simple_value=float(value)))
+
+        if summary_writer is not None:
+            summary_writer.add_summary(tf.Summary(value=summary_values), step)
+
+        if self.csv_path is not None:
+            with open(self.csv_path, 'a') as f:
+                for phase in self.phases:
+                    if phase in stats:
+                        f.write('%s,%s,%s\n' % (
+                            str(step), phase,
+                            ','.join(['%.6f' % value for value in stats[phase]])))
+
+        # Reset
+        for phase in self.phases:
+            self.durations[phase] = []
+        self.step_times = []
+
+        return stats
+
+    def format(self, stats):
+        """Make a one-line summary of stats returned by report().
+        Args:
+            stats: dict returned by report()
+        Returns:
+            line: string
+        """
+        return ' / '.join(['%s %.1f%% (p50 %.3fs)' % (phase, stats[phase][4] * 100,
+                                                      stats[phase][1])
+                           for phase in self.phases if phase in stats])
@@ -0,0 +1,246 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Run training of several configs in parallel. Each process is pinned to a
+   disjoint set of cores and uses as many threads as its cores. Configs which
+   do not fit in the free cores wait until a running process finishes.
+   Usage:
+       python sweep.py path_to_trainer cores_per_job config1.yml config2.yml ...
+       python sweep.py ../csj/trainer/train_ctc.py 8 '../csj/config/ctc/*.yml'
+   A config can set the number of its cores by `num_core` in param.
+   Logs are saved to `log/<index>_<config>.log` in the directory of the
+   trainer, where index is the position of the config in the sweep.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from os.path import join, isfile, isdir, basename, dirname, abspath, splitext
+import sys
+import glob
+import time
+import subprocess
+import yaml
+
+sys.path.append('../')
+sys.path.append('../../')
+from utils.session_config import cpu_topology
+
+
+def available_cores():
+    """Return the cores this process is allowed to run on.
+    Returns:
+        sockets: dict of socket id => list of core ids
+    """
+    sockets, _ = cpu_topology()
+    if hasattr(os, 'sched_getaffinity'):
+        allowed = os.sched_getaffinity(0)
+        sockets = dict((socket_id, [core for core in cores if core in allowed])
+                       for socket_id, cores in sockets.items())
+    return dict((socket_id, cores) for socket_id, cores in sockets.items()
+                if len(cores) > 0)
+
+
+def allocate_cores(free_cores, sockets, num_core):
+    """Choose cores for a job. Cores in a single socket are preferred.
+    Args:
+        free_cores: set of free core ids
+        sockets: dict of socket id => list of core ids
+        num_core: int, the number of cores of the job
+    Returns:
+        list of core ids, or None if there are not enough free cores
+    """
+    if len(free_cores) < num_core:
+        return None
+    for socket_id in sorted(sockets.keys()):
+        cores = [core for core in sockets[socket_id] if core in free_cores]
+        if len(cores) >= num_core:
+            return cores[:num_core]
+    return sorted(free_cores)[:num_core]
+
+
+def find_model_dir(log_path):
+    """Find the directory of results from the log of a trainer.
+    Args:
+        log_path: path to the log
+    Returns:
+        model_dir: path, or None if not found
+    """
+    if not isfile(log_path):
+        return None
+    model_dir = None
+    with open(log_path, 'r') as f:
+        for line in f:
+            if isdir(line.strip()):
+                model_dir = line.strip()
+    return model_dir
+
+
+def read_throughput(model_dir):
+    """Average the throughput recorded by utils.metrics_sink.
+    Args:
+        model_dir: path to the directory of results
+    Returns:
+        frames_per_sec: A float value, or None if not recorded
+        utt_per_sec: A float value, or None if not recorded
+    """
+    path = join(model_dir, 'throughput.csv')
+    if not isfile(path):
+        return None, None
+    frames_per_sec, utt_per_sec = [], []
+    with open(path, 'r') as f:
+        f.readline()
+        for line in f:
+            values = line.strip().split(',')
+            frames_per_sec.append(float(values[1]))
+            utt_per_sec.append(float(values[2]))
+    if len(frames_per_sec) == 0:
+        return None, None
+    return (sum(frames_per_sec) / len(frames_per_sec),
+            sum(utt_per_sec) / len(utt_per_sec))
+
+
+def read_best_dev(model_dir):
+    """Read the best dev score from `dev_scores.csv`, or from
+       `eval_results.csv` when evaluated by restore/evaluator_ctc.py.
+    Args:
+        model_dir: path to the directory of results
+    Returns:
+        A float value, or None if not evaluated
+    """
+    # The score of dev is the 2nd column in both files
+    for file_name in ['dev_scores.csv', 'eval_results.csv']:
+        path = join(model_dir, file_name)
+        if not isfile(path):
+            continue
+        with open(path, 'r') as f:
+            f.readline()
+            scores = [float(line.strip().split(',')[1]) for line in f]
+        if len(scores) > 0:
+            return min(scores)
+    return None
+
+
+def start_job(trainer_path, config_path, cpu_list, index):
+    """Start a trainer pinned to cores.
+    Args:
+        trainer_path: path to the trainer script
+        config_path: path to the config file
+        cpu_list: list of core ids
+        index: int, the position of the config in the sweep. This makes log
+            names unique when configs in different directories share a name
+    Returns:
+        process: subprocess.Popen
+        log_path: path to the log
+    """
+    trainer_dir = dirname(abspath(trainer_path))
+    log_dir = join(trainer_dir, 'log')
+    if not isdir(log_dir):
+        os.makedirs(log_dir)
+    config_name = splitext(basename(config_path))[0]
+    log_path = join(log_dir, '%02d_%s.log' % (index, config_name))
+
+    env = dict(os.environ)
+    env['TF_INTRA_OP_THREADS'] = str(len(cpu_list))
+    env['TF_INTER_OP_THREADS'] = str(min(2, len(cpu_list)))
+    command = ['taskset', '-c', ','.join(map(str, cpu_list)),
+               sys.executable, abspath(trainer_path), abspath(config_path)]
+    process = subprocess.Popen(command, cwd=trainer_dir, env=env,
+                               stdout=open(log_path, 'w'),
+                               stderr=subprocess.STDOUT)
+    return process, log_path
+
+
+def main(trainer_path, cores_per_job, config_paths, interval=10):
+
+    sockets = available_cores()
+    free_cores = set(sum(sockets.values(), []))
+    num_core_all = len(free_cores)
+
+    # The number of cores of each config
+    queue = []
+    for index, config_path in enumerate(config_paths):
+        with open(config_path, 'r') as f:
+            param = yaml.load(f)['param']
+        num_core = int(param.get('num_core', cores_per_job))
+        if num_core > num_core_all:
+            raise ValueError('%s needs %d cores, but only %d cores are available.' %
+                             (config_path, num_core, num_core_all))
+        queue.append((index, config_path, num_core))
+
+    running, results = [], []
+    while len(queue) > 0 or len(running) > 0:
+        # Start queued configs in order while they fit
+        while len(queue) > 0:
+            index, config_path, num_core = queue[0]
+            cpu_list = allocate_cores(free_cores, sockets, num_core)
+            if cpu_list is None:
+                break
+            queue.pop(0)
+            free_cores -= set(cpu_list)
+            process, log_path = start_job(trainer_path, config_path, cpu_list,
+                                          index)
+            running.append((process, config_path, cpu_list, log_path,
+                            time.time()))
+            print('Start %s on cores %s' %
+                  (basename(config_path), ','.join(map(str, cpu_list))))
+            sys.stdout.flush()
+
+        time.sleep(interval)
+
+        for job in list(running):
+            process, config_path, cpu_list, log_path, start_time = job
+            if process.poll() is None:
+                continue
+            running.remove(job)
+            free_cores |= set(cpu_list)
+            duration = time.time() - start_time
+            print('Finish %s (exit %d, %.1f min)' %
+                  (basename(config_path), process.returncode, duration / 60))
+            sys.stdout.flush()
+            results.append((config_path, process.returncode, len(cpu_list),
+                            duration, find_model_dir(log_path)))
+
+    # Summary
+    summary_path = join(dirname(abspath(trainer_path)), 'log', 'sweep.csv')
+    print('%40s %5s %6s %10s %12s %10s %10s' %
+          ('config', 'exit', 'cores', 'time (h)', 'frames/sec', 'utt/sec',
+           'best dev'))
+    with open(summary_path, 'w') as f:
+        f.write('config,exit,cores,hours,frames_per_sec,utt_per_sec,best_dev,model_dir\n')
+        for config_path, returncode, num_core, duration, model_dir in results:
+            frames_per_sec, utt_per_sec, best_dev = None, None, None
+            if model_dir is not None:
+                frames_per_sec, utt_per_sec = read_throughput(model_dir)
+                best_dev = read_best_dev(model_dir)
+            values = ['%.1f' % frames_per_sec if frames_per_sec is not None else '-',
+                      '%.2f' % utt_per_sec if utt_per_sec is not None else '-',
+                      '%.4f' % best_dev if best_dev is not None else '-']
+            print('%40s %5d %6d %10.2f %12s %10s %10s' %
+                  (basename(config_path), returncode, num_core,
+                   duration / 3600, values[0], values[1], values[2]))
+            f.write('%s,%d,%d,%f,%s,%s,%s,%s\n' %
+                    (config_path, returncode, num_core, duration / 3600,
+                     values[0], values[1], values[2], model_dir or '-'))
+    print('Saved to %s' % summary_path)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    if len(args) < 4:
+        raise ValueError(("Set a trainer, the number of cores per job & config files.\n"
+                          "Usage: python sweep.py path_to_trainer cores_per_job config1.yml config2.yml ..."))
+
+    config_paths = []
+    for pattern in args[3:]:
+        paths = sorted(glob.glob(pattern))
+        if len(paths) == 0:
+            raise ValueError('No config file matches %s' % pattern)
+        config_paths += paths
+
+    main(trainer_path=args[1],
+         cores_per_job=int(args[2]),
+         config_paths=config_paths)
@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+from os.path import join, basename
+import shutil
+import tempfile
+import unittest
+import tensorflow as tf
+
+sys.path.append('../')
+from utils.checkpoint import CheckpointManager
+
+
+class TestCheckpointManager(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        tf.reset_default_graph()
+        tf.Variable(tf.zeros([2, 3]), name='weight')
+        self.session = tf.Session()
+        self.session.run(tf.global_variables_initializer())
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.model_dir)
+
+    def saved_steps(self):
+        ckpt = tf.train.get_checkpoint_state(self.model_dir)
+        steps = [int(path.split('-')[-1])
+                 for path in ckpt.all_model_checkpoint_paths]
+        # Files of removed checkpoints are deleted too
+        for step in range(1, 20):
+            is_saved = len(tf.gfile.Glob(
+                join(self.model_dir, 'model.ckpt-%d.*' % step))) > 0
+            self.assertEqual(is_saved, step in steps)
+        return sorted(steps)
+
+    def test_gated_evaluation(self):
+        manager = CheckpointManager(self.model_dir, keep_last=2, keep_best=2)
+        # Evaluate from the 5th epoch only
+        scores = {5: 0.3, 6: 0.1, 7: 0.4, 8: 0.2, 9: 0.5, 10: 0.6}
+        for epoch in range(1, 11):
+            manager.save(self.session, epoch)
+            manager.wait()
+            if epoch >= 5:
+                manager.set_score(epoch, scores[epoch])
+            else:
+                # Not evaluated yet
+                self.assertEqual(self.saved_steps(), list(range(1, epoch + 1)))
+        manager.close()
+
+        # Unscored epochs before the first evaluation are removed
+        self.assertEqual(self.saved_steps(), [6, 8, 9, 10])
+
+    def test_async_evaluation(self):
+        result_path = join(self.model_dir, 'eval_results.csv')
+        with open(result_path, 'w') as f:
+            f.write('checkpoint,dev,eval1,eval2,eval3\n')
+        manager = CheckpointManager(self.model_dir, keep_last=1, keep_best=0,
+                                    result_path=result_path)
+        for epoch in range(1, 5):
+            manager.save(self.session, epoch)
+        manager.wait()
+
+        # Nothing is evaluated yet
+        manager.set_scores_from_results()
+        self.assertEqual(self.saved_steps(), [1, 2, 3, 4])
+
+        with open(result_path, 'a') as f:
+            for epoch in [1, 2]:
+                f.write('model.ckpt-%d,0.%d,0,0,0\n' % (epoch, epoch))
+        manager.set_scores_from_results()
+        self.assertEqual(self.saved_steps(), [3, 4])
+
+        # Checkpoints being evaluated are kept when resuming training
+        manager.close()
+        manager = CheckpointManager(self.model_dir, keep_last=1, keep_best=0,
+                                    result_path=result_path)
+        manager.save(self.session, 5)
+        manager.close()
+        self.assertEqual(self.saved_steps(), [3, 4, 5])
+        self.assertEqual(basename(manager.last_path), 'model.ckpt-5')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import unittest
+
+sys.path.append('../')
+from utils.cost import affine_cost, lstm_cost, estimate_cost, format_cost
+
+
+class LSTM_CTC(object):
+    """Hyperparameters read by estimate_cost (named after the model)."""
+
+    def __init__(self, num_layer=2):
+        self.input_size = 123
+        self.num_cell = 256
+        self.num_layer = num_layer
+        self.num_proj = None
+        self.num_classes = 30
+        self.swap_memory = False
+
+
+class BLSTM_CTC(LSTM_CTC):
+    pass
+
+
+class Multitask_BLSTM_CTC(LSTM_CTC):
+
+    def __init__(self):
+        super(Multitask_BLSTM_CTC, self).__init__()
+        self.num_layer_second = 1
+        self.num_classes_second = 10
+
+
+class TestCost(unittest.TestCase):
+
+    def test_affine_cost(self):
+        # 2 FLOPs per multiply-add & the bias
+        self.assertEqual(affine_cost(3, 4), (2 * 3 * 4 + 4, 3 + 4))
+
+    def test_lstm_cost(self):
+        _, _, output_dim = lstm_cost(10, 20)
+        self.assertEqual(output_dim, 20)
+        _, _, output_dim = lstm_cost(10, 20, num_proj=5)
+        self.assertEqual(output_dim, 5)
+
+    def test_estimate_cost(self):
+        cost = estimate_cost(LSTM_CTC())
+        self.assertEqual(cost['flops_train'], 3 * cost['flops_inference'])
+        self.assertGreater(cost['bytes_train'], cost['bytes_inference'])
+        self.assertEqual(cost['bytes_train_host'], 0)
+
+        # More layers cost more
+        cost_deep = estimate_cost(LSTM_CTC(num_layer=4))
+        self.assertGreater(cost_deep['flops_inference'],
+                           cost['flops_inference'])
+
+        # Bidirectional layers cost more
+        cost_bi = estimate_cost(BLSTM_CTC())
+        self.assertGreater(cost_bi['flops_inference'],
+                           cost['flops_inference'])
+
+        # Per frame before skipping
+        cost_skip = estimate_cost(LSTM_CTC(), num_skip=3)
+        for key in cost:
+            self.assertAlmostEqual(cost_skip[key], cost[key] / 3)
+
+        # Activations of RNN layers move to host memory on GPU only
+        cost_swap = estimate_cost(LSTM_CTC(), swap_memory=True)
+        self.assertEqual(cost_swap, cost)
+        cost_swap = estimate_cost(LSTM_CTC(), swap_memory=True, is_gpu=True)
+        self.assertGreater(cost_swap['bytes_train_host'], 0)
+        self.assertAlmostEqual(
+            cost_swap['bytes_train'] + cost_swap['bytes_train_host'],
+            cost['bytes_train'])
+        self.assertIn('swapped out', format_cost(cost_swap))
+        self.assertNotIn('swapped out', format_cost(cost))
+
+    def test_multitask(self):
+        cost = estimate_cost(BLSTM_CTC())
+        cost_multitask = estimate_cost(Multitask_BLSTM_CTC())
+
+        # Shared BLSTM layers & the output layer of the second task
+        flops_second, _ = affine_cost(2 * 256, 10)
+        self.assertAlmostEqual(cost_multitask['flops_inference'],
+                               cost['flops_inference'] + flops_second)
+        self.assertGreater(cost_multitask['bytes_train'], cost['bytes_train'])
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            estimate_cost(object())
+
+
+if __name__ == '__main__':
+    unittest.main()
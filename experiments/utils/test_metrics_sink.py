@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+from os.path import join
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+
+sys.path.append('../')
+from utils.metrics_sink import MetricsSink
+
+
+class TestMetricsSink(unittest.TestCase):
+
+    def setUp(self):
+        self.save_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.save_path)
+
+    def read_loss(self):
+        return np.loadtxt(join(self.save_path, 'loss.csv'), delimiter=',',
+                          ndmin=2)
+
+    def test_resume(self):
+        sink = MetricsSink(self.save_path, flush_interval=3)
+        for step in range(10):
+            sink.add_loss(step, float(step), float(step) * 2)
+        sink.close()
+        self.assertEqual(self.read_loss().shape, (10, 3))
+
+        # Losses at the step to resume from & later are removed
+        sink = MetricsSink(self.save_path, start_step=5)
+        loss = self.read_loss()
+        self.assertEqual(loss[:, 0].tolist(), [0, 1, 2, 3, 4])
+        sink.add_loss(5, 0.5)
+        sink.close()
+        loss = self.read_loss()
+        self.assertEqual(loss[:, 0].tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertTrue(np.isnan(loss[-1, 2]))
+
+        # Starting from 0 creates the files again
+        MetricsSink(self.save_path).close()
+        with open(join(self.save_path, 'loss.csv'), 'r') as f:
+            self.assertEqual(f.read(), '')
+
+    def test_report(self):
+        sink = MetricsSink(self.save_path)
+        # Nothing to report
+        self.assertEqual(sink.report(step=1), {})
+
+        inputs = np.zeros((2, 10, 3))
+        sink.add_batch(inputs, np.array([10, 5]))
+        time.sleep(0.01)
+        stats = sink.report(step=1)
+        self.assertAlmostEqual(stats['padding_ratio'], 0.25)
+        self.assertGreater(stats['utt_per_sec'], 0)
+
+        # Batches before restart are not counted
+        sink.add_batch(inputs, np.array([10, 10]))
+        sink.restart()
+        self.assertEqual(sink.report(step=2), {})
+        sink.close()
+
+        with open(join(self.save_path, 'throughput.csv'), 'r') as f:
+            lines = f.read().strip().split('\n')
+        self.assertEqual(lines[0],
+                         'step,frames_per_sec,utt_per_sec,padding_ratio')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('1,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+class TraceHook(object):
+    """Run operations with full tracing every N steps and save op-level
+       timelines in the Chrome trace format (open with chrome://tracing).
+    Args:
+        save_path: path to the directory to save timelines
+        interval: int, trace every `interval` steps. If 0, never trace
+    """
+
+    def __init__(self, save_path, interval=0):
+        self.interval = interval
+        self.save_path = save_path
+        if interval > 0 and not os.path.isdir(save_path):
+            os.makedirs(save_path)
+
+    def is_step(self, step):
+        """Return True if the step should be traced.
+        Args:
+            step: int, the current step (0-indexed)
+        """
+        return self.interval > 0 and (step + 1) % self.interval == 0
+
+    def run(self, session, fetches, feed_dict, step, tag='train',
+            summary_writer=None):
+        """Run fetches with full tracing and save the timeline.
+        Args:
+            session: session to run operations
+            fetches: operations to run
+            feed_dict: feed dictionary
+            step: int, global step
+            tag: string, name of the traced operations (ex. train, decode)
+            summary_writer: if not None, add the run metadata to TensorBoard
+        Returns:
+            results: the outputs of session.run
+            run_metadata: RunMetadata of the traced run
+        """
+        run_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+        run_metadata = tf.RunMetadata()
+        results = session.run(fetches, feed_dict=feed_dict,
+                              options=run_options, run_metadata=run_metadata)
+
+        trace = timeline.Timeline(step_stats=run_metadata.step_stats)
+        with open(os.path.join(self.save_path,
+                               'timeline_%s_step%d.json' % (tag, step)), 'w') as f:
+            f.write(trace.generate_chrome_trace_format(show_memory=True))
+
+        # Keep raw step stats for utils/scope_report.py
+        with open(os.path.join(self.save_path,
+                               'run_metadata_%s_step%d.pb' % (tag, step)), 'wb') as f:
+            f.write(run_metadata.SerializeToString())
+
+        if summary_writer is not None:
+            summary_writer.add_run_metadata(run_metadata,
+                                            '%s_step%d' % (tag, step),
+                                            global_step=step)
+
+        return results, run_metadata
@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import tensorflow as tf
+
+STATE_FILE_NAME = 'train_state.pickle'
+
+
+def save_train_state(model_dir, checkpoint_path, step, error_best,
+                     data_state):
+    """Save the state of training next to the checkpoint to resume from.
+    Args:
+        model_dir: path to the directory of the model
+        checkpoint_path: path to the checkpoint saved at the step
+        step: int, the number of finished steps
+        error_best: A float value. The best dev error so far
+        data_state: dict returned by DataSet.get_state()
+    """
+    state = {'checkpoint_path': checkpoint_path,
+             'step': step,
+             'error_best': error_best,
+             'data_state': data_state}
+
+    # Replace the old state only after the new one is written
+    state_path = os.path.join(model_dir, STATE_FILE_NAME)
+    with open(state_path + '.tmp', 'wb') as f:
+        pickle.dump(state, f)
+    os.rename(state_path + '.tmp', state_path)
+
+
+def load_train_state(model_dir):
+    """Load the state of training saved by save_train_state.
+    Args:
+        model_dir: path to the directory of the model
+    Returns:
+        state: dict of `checkpoint_path`, `step`, `error_best` and
+            `data_state`, or None if there is no state or checkpoint to
+            resume from
+    """
+    state_path = os.path.join(model_dir, STATE_FILE_NAME)
+    if not os.path.isfile(state_path):
+        return None
+    with open(state_path, 'rb') as f:
+        state = pickle.load(f)
+    if not tf.train.checkpoint_exists(state['checkpoint_path']):
+        return None
+    return state
+
+
+def make_resume_callback(model_dir, step, error_best, data_state):
+    """Make a function to save the state of training once the checkpoint is
+       written (see utils.checkpoint.CheckpointManager.save). Losses are
+       written by utils.metrics_sink.MetricsSink as training goes.
+    Args:
+        model_dir: path to the directory of the model
+        step: int, the number of finished steps
+        error_best: A float value. The best dev error so far
+        data_state: dict returned by DataSet.get_state()
+    Returns:
+        callback: function taking the path to the checkpoint
+    """
+    def callback(checkpoint_path):
+        save_train_state(model_dir, checkpoint_path, step, error_best,
+                         data_state)
+    return callback
@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tune the thread counts & core affinity of sessions on this host.
+   Each setting is measured in a new process because thread pools of
+   TensorFlow are shared by all sessions in a process.
+   The model & the batch size are read from the config file of a trainer.
+   Usage:
+       python tune_session.py path_to_config [max_time] [--inference]
+   The best settings are saved for this host & the model shape, and loaded by
+   load_session_config & apply_tuned_affinity.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import subprocess
+import tensorflow as tf
+import yaml
+
+sys.path.append('../')
+sys.path.append('../../')
+from models.ctc.load_model import load
+from utils.benchmark import generate_batch, make_feed_dict, measure_step_time
+from utils.session_config import cpu_topology, set_affinity
+from utils.session_config import save_session_config, model_key
+
+# The number of labels (except for blank class) of each corpus. These must be
+# the same as the trainers
+OUTPUT_SIZES = {
+    'csj': {'phone': 38, 'character': 147, 'kanji': 3386},
+    'timit': {'phone61': 61, 'phone48': 48, 'phone39': 39, 'character': 30},
+}
+
+
+def load_network(config_path):
+    """Make a network with the shape of a config.
+    Args:
+        config_path: path to the config file (.yml) of a trainer
+    Returns:
+        network: CTC network (not defined yet)
+    """
+    with open(config_path, 'r') as f:
+        config = yaml.load(f)
+    corpus = config['corpus']
+    feature = config['feature']
+    param = config['param']
+
+    CTCModel = load(model_type=config['model_name'])
+    network = CTCModel(
+        batch_size=param['batch_size'],
+        input_size=feature['input_size'] * feature['num_stack'],
+        num_cell=param['num_cell'],
+        num_layer=param['num_layer'],
+        output_size=OUTPUT_SIZES[corpus['name']][corpus['label_type']],
+        clip_grad=5.0,
+        clip_activation=50,
+        num_proj=param['num_proj'],
+        bottleneck_dim=param.get('bottleneck_dim'))
+    network.num_stack = feature['num_stack']
+    return network
+
+
+def measure_setting(config_path, max_time, intra_thread, inter_thread,
+                    cpu_list=None, is_inference=False, num_step=10):
+    """Measure the step time with a session setting.
+    Args:
+        config_path: path to the config file (.yml) of a trainer
+        max_time: int, the number of frames of each utterance
+        intra_thread: int, the number of intra-op threads
+        inter_thread: int, the number of inter-op threads
+        cpu_list: list of core ids. If None, all cores are used
+        is_inference: if True, measure decoding instead of training
+        num_step: int, the number of measured steps
+    Returns:
+        mean: A float value. Mean seconds per step
+        std: A float value. Standard deviation of seconds per step
+    """
+    if cpu_list is not None:
+        set_affinity(cpu_list)
+
+    tf.reset_default_graph()
+    with tf.Graph().as_default():
+        network = load_network(config_path)
+        batch_size = network.batch_size
+        network.define()
+        if is_inference:
+            fetches = network.decoder(decode_type='greedy')
+        else:
+            loss_op = network.loss()
+            train_op = network.train(optimizer='adam',
+                                     learning_rate_init=1e-3,
+                                     is_scheduled=False)
+            fetches = [train_op, loss_op]
+        init_op = tf.global_variables_initializer()
+
+        inputs, labels, seq_len = generate_batch(batch_size, max_time,
+                                                 network.input_size,
+                                                 network.num_classes - 1)
+        config = tf.ConfigProto(intra_op_parallelism_threads=intra_thread,
+                                inter_op_parallelism_threads=inter_thread)
+        with tf.Session(config=config) as sess:
+            sess.run(init_op)
+            feed_dict = make_feed_dict(network, inputs, labels, seq_len)
+            if is_inference:
+                feed_dict[network.keep_prob_input] = 1.0
+                feed_dict[network.keep_prob_hidden] = 1.0
+            return measure_step_time(sess, fetches, feed_dict,
+                                     num_step=num_step, num_warmup=2)
+
+
+def candidate_settings():
+    """Make the grid of session settings for this host.
+    Returns:
+        list of `(intra_thread, inter_thread, affinity_name, cpu_list)`
+    """
+    sockets, siblings = cpu_topology()
+    all_cores = sorted(sum(sockets.values(), []))
+
+    # The name of the core set => core ids (None means no pinning)
+    affinity_dict = {'all': None}
+    if len(sockets) > 1:
+        affinity_dict['socket0'] = sockets[min(sockets.keys())]
+    if len(siblings) < len(all_cores):
+        # One hardware thread per physical core
+        affinity_dict['physical'] = sorted(
+            [sibling[0] for sibling in siblings])
+
+    settings = []
+    for affinity_name in sorted(affinity_dict.keys()):
+        cpu_list = affinity_dict[affinity_name]
+        num_core = len(all_cores) if cpu_list is None else len(cpu_list)
+        intra_list = [2 ** i for i in range(10) if 2 ** i < num_core]
+        intra_list.append(num_core)
+        for intra_thread in intra_list:
+            for inter_thread in [1, 2, 4]:
+                if inter_thread > num_core:
+                    continue
+                settings.append(
+                    (intra_thread, inter_thread, affinity_name, cpu_list))
+    return settings
+
+
+def run_trial(config_path, max_time, intra_thread, inter_thread, cpu_list,
+              is_inference):
+    """Measure a setting in a new process.
+    Returns:
+        mean: A float value. Mean seconds per step, or None if failed
+        std: A float value. Standard deviation of seconds per step
+    """
+    cpu_arg = 'all' if cpu_list is None else ','.join(map(str, cpu_list))
+    command = [sys.executable, os.path.abspath(__file__), '--trial',
+               os.path.abspath(config_path), str(max_time), str(intra_thread),
+               str(inter_thread), cpu_arg]
+    if is_inference:
+        command.append('--inference')
+    try:
+        output = subprocess.check_output(command, stderr=open(os.devnull, 'w'))
+    except subprocess.CalledProcessError:
+        return None, None
+    mean, std = output.decode('utf-8').strip().split('\n')[-1].split()
+    return float(mean), float(std)
+
+
+def main(config_path, max_time, is_inference):
+
+    mode = 'inference' if is_inference else 'train'
+    network = load_network(config_path)
+    batch_size = network.batch_size
+    print('Model: %s' % model_key(network))
+    print('%6s %6s %10s %14s %10s' %
+          ('intra', 'inter', 'affinity', 'sec/step', 'utt/sec'))
+
+    best = None
+    for intra_thread, inter_thread, affinity_name, cpu_list in candidate_settings():
+        mean, std = run_trial(config_path, max_time, intra_thread,
+                              inter_thread, cpu_list, is_inference)
+        if mean is None:
+            print('%6d %6d %10s %14s' %
+                  (intra_thread, inter_thread, affinity_name, 'failed'))
+            continue
+        print('%6d %6d %10s %8.3f±%.3f %10.1f' %
+              (intra_thread, inter_thread, affinity_name, mean, std,
+               batch_size / mean))
+        sys.stdout.flush()
+        if best is None or mean < best[0]:
+            best = (mean, intra_thread, inter_thread, affinity_name, cpu_list)
+
+    if best is None:
+        raise ValueError('All settings failed.')
+
+    mean, intra_thread, inter_thread, affinity_name, cpu_list = best
+    print('Best (%s): intra %d, inter %d, affinity %s (%.3f sec/step)' %
+          (mode, intra_thread, inter_thread, affinity_name, mean))
+    path = save_session_config({'intra_op_parallelism_threads': intra_thread,
+                                'inter_op_parallelism_threads': inter_thread,
+                                'cpu_list': cpu_list},
+                               mode=mode, key=model_key(network))
+    print('Saved to %s' % path)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv
+    is_inference = '--inference' in args
+    args = [arg for arg in args if arg != '--inference']
+
+    if len(args) > 1 and args[1] == '--trial':
+        # Called by run_trial
+        config_path, max_time, intra_thread, inter_thread, cpu_arg = args[2:7]
+        cpu_list = None if cpu_arg == 'all' else list(map(int, cpu_arg.split(',')))
+        mean, std = measure_setting(config_path, int(max_time),
+                                    int(intra_thread), int(inter_thread),
+                                    cpu_list=cpu_list,
+                                    is_inference=is_inference)
+        print('%f %f' % (mean, std))
+        sys.exit(0)
+
+    if len(args) not in [2, 3]:
+        raise ValueError(("Set a config file.\n"
+                          "Usage: python tune_session.py path_to_config [max_time] [--inference]"))
+
+    main(config_path=args[1],
+         max_time=int(args[2]) if len(args) == 3 else 500,
+         is_inference=is_inference)
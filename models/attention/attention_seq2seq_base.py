@@ -9,6 +9,7 @@ from __future__ import print_function
 
 from collections import namedtuple, OrderedDict
 import tensorflow as tf
+from models.graph_util import jit_scope, accumulate_gradients
 from .decoders.decoder_util import transpose_batch_time, flatten_dict
 from .decoders.beam_search_decoder import BeamSearchDecoder
 
@@ -106,6 +107,13 @@ class AttentionBase(object):
         self.summaries_train = []
         self.summaries_dev = []
 
+        # If True, the loss layer is compiled by XLA JIT (set by trainers)
+        self.use_xla = False
+
+        # If True, activations of the encoder kept for backprop are swapped
+        # out to host memory in the forward pass (set by trainers)
+        self.swap_memory = False
+
         self.name = name
 
     def __call__(self, inputs, labels, labels_seq_len):
@@ -115,6 +123,13 @@ class AttentionBase(object):
             with tf.variable_scope(self.name):
                 return self._build(inputs, labels, labels_seq_len)
 
+    def _jit_scope(self):
+        """Scope to compile operations by XLA JIT if use_xla is True.
+        Returns:
+            A context manager
+        """
+        return jit_scope(self.use_xla)
+
     def _generate_placeholer(self):
         """Generate placeholders."""
         # `[batch_size, max_time, input_size]`
@@ -332,7 +347,7 @@ class AttentionBase(object):
             A tensor of shape [max_time, batch_size] that contains the loss per
                 example, per time step.
         """
-        with tf.name_scope("cross_entropy_sequence_loss"):
+        with tf.name_scope("cross_entropy_sequence_loss"), self._jit_scope():
             losses = tf.nn.sparse_softmax_cross_entropy_with_logits(
                 logits=logits, labels=labels)
 
@@ -373,7 +388,8 @@ class AttentionBase(object):
         return self.losses, self.loss
 
     def train(self, optimizer, learning_rate_init=None,
-              clip_gradients_by_norm=None, is_scheduled=False):
+              clip_gradients_by_norm=None, is_scheduled=False,
+              num_accumulate=1):
         """Operation for training.
         Args:
             optimizer: adam or adadelta or rmsprop or sgd or momentum
@@ -381,6 +397,10 @@ class AttentionBase(object):
             clip_gradients_by_norm: if True, clip gradients by norm of the
                 value of self.clip_grad
             is_scheduled: if True, schedule learning rate at each epoch
+            num_accumulate: int, the number of micro-batches to accumulate
+                gradients over. If more than 1, run self.accumulate_op for
+                each micro-batch and train_op after every num_accumulate
+                micro-batches
         Returns:
             train_op: operation for training
         """
@@ -391,6 +411,8 @@ class AttentionBase(object):
                 (", ".join(OPTIMIZER_CLS_NAMES), optimizer))
         if learning_rate_init < 0.0:
             raise ValueError("Invalid learning_rate %s.", learning_rate_init)
+        if num_accumulate < 1:
+            raise ValueError("num_accumulate must be more than 0.")
 
         # Select parameter update method
         if is_scheduled:
@@ -412,27 +434,39 @@ class AttentionBase(object):
         # Create a variable to track the global step
         global_step = tf.Variable(0, name='global_step', trainable=False)
 
-        # Gradient clipping
-        if self.clip_grad is not None:
+        if self.clip_grad is not None or num_accumulate > 1:
             # Compute gradients
             trainable_vars = tf.trainable_variables()
             grads = tf.gradients(self.loss, trainable_vars)
             # TODO: Optionally add gradient noise
 
-            if clip_gradients_by_norm:
-                # Clip by norm
-                self.clipped_grads = [tf.clip_by_norm(
-                    g,
-                    clip_norm=self.clip_grad) for g in grads if g is not None]
-            else:
-                # Clip by absolute values
-                self.clipped_grads = [tf.clip_by_value(
-                    g,
-                    clip_value_min=-self.clip_grad,
-                    clip_value_max=self.clip_grad) for g in grads if g is not None]
+            # Variables which do not affect the loss have no gradients
+            # TODO: なんでNoneが発生した？
+            trainable_vars = [var for var, g in zip(trainable_vars, grads)
+                              if g is not None]
+            grads = [g for g in grads if g is not None]
+
+            # Accumulate gradients over micro-batches
+            if num_accumulate > 1:
+                grads, self.accumulate_op, reset_op = accumulate_gradients(
+                    grads, trainable_vars, num_accumulate)
+
+            # Gradient clipping
+            if self.clip_grad is not None:
+                if clip_gradients_by_norm:
+                    # Clip by norm
+                    grads = [tf.clip_by_norm(
+                        g,
+                        clip_norm=self.clip_grad) for g in grads]
+                else:
+                    # Clip by absolute values
+                    grads = [tf.clip_by_value(
+                        g,
+                        clip_value_min=-self.clip_grad,
+                        clip_value_max=self.clip_grad) for g in grads]
+            self.clipped_grads = grads
 
             # TODO: Add histograms for variables, gradients (norms)
-            # TODO: なんでNoneが発生した？
 
             # Create gradient updates
             train_op = self.optimizer.apply_gradients(
@@ -440,9 +474,16 @@ class AttentionBase(object):
                 global_step=global_step,
                 name='train')
 
-        # Use the optimizer to apply the gradients that minimize the loss
-        # and also increment the global step counter as a single training step
-        train_op = self.optimizer.minimize(self.loss, global_step=global_step)
+            if num_accumulate > 1:
+                # Reset accumulators after updating parameters
+                with tf.control_dependencies([train_op]):
+                    train_op = tf.group(reset_op)
+        else:
+            # Use the optimizer to apply the gradients that minimize the loss
+            # and also increment the global step counter as a single training
+            # step
+            train_op = self.optimizer.minimize(
+                self.loss, global_step=global_step)
 
         return train_op
 
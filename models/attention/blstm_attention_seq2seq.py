@@ -110,6 +110,7 @@ class BLSTMAttetion(AttentionBase):
             parameter_init=self.parameter_init,
             clip_activation=self.clip_activation_encoder,
             num_proj=None)
+        encoder.swap_memory = self.swap_memory
 
         encoder_outputs = encoder(inputs=inputs,
                                   inputs_seq_len=inputs_seq_len)
@@ -91,6 +91,7 @@ class BGRUEncoder(EncoderBase):
                     cell_bw=gru_bw,
                     inputs=outputs,
                     sequence_length=inputs_seq_len,
+                    swap_memory=self.swap_memory,
                     dtype=tf.float32,
                     scope='BiGRU_' + str(i_layer + 1))
 
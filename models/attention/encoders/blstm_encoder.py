@@ -104,6 +104,7 @@ class BLSTMEncoder(EncoderBase):
                     cell_bw=lstm_bw,
                     inputs=outputs,
                     sequence_length=inputs_seq_len,
+                    swap_memory=self.swap_memory,
                     dtype=tf.float32,
                     scope='BiLSTM_' + str(i_layer + 1))
 
@@ -47,6 +47,10 @@ class EncoderBase(object):
         self.num_proj = num_proj
         self.name = name
 
+        # If True, activations kept for backprop are swapped out to host
+        # memory in the forward pass
+        self.swap_memory = False
+
     def __call__(self, *args, **kwargs):
         # TODO: variable_scope
         with tf.name_scope('Encoder'):
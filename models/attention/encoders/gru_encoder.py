@@ -84,6 +84,7 @@ class GRUEncoder(EncoderBase):
         outputs, final_state = tf.nn.dynamic_rnn(cell=stacked_gru,
                                                  inputs=inputs,
                                                  sequence_length=inputs_seq_len,
+                                                 swap_memory=self.swap_memory,
                                                  dtype=tf.float32)
 
         return EncoderOutput(outputs=outputs,
@@ -89,6 +89,7 @@ class LSTMEncoder(EncoderBase):
         outputs, final_state = tf.nn.dynamic_rnn(cell=stacked_lstm,
                                                  inputs=inputs,
                                                  sequence_length=inputs_seq_len,
+                                                 swap_memory=self.swap_memory,
                                                  dtype=tf.float32)
 
         return EncoderOutput(outputs=outputs,
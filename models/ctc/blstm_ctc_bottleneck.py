@@ -58,13 +58,16 @@ class BLSTM_CTC_BOTTLENECK(ctcBase):
         self.bottleneck_dim = bottleneck_dim
         self.num_proj = None if num_proj == 0 else num_proj
 
-    def define(self):
-        """Construct model graph."""
-        # Generate placeholders
-        self._generate_placeholer()
-
+    def _build(self, inputs, seq_len):
+        """Construct model graph.
+        Args:
+            inputs: A tensor of size `[batch_size, max_time, input_size]`
+            seq_len: A tensor of size `[batch_size]`
+        Returns:
+            logits: A tensor of size `[max_time, batch_size, num_classes]`
+        """
         # Dropout for Input
-        outputs = tf.nn.dropout(self.inputs,
+        outputs = tf.nn.dropout(inputs,
                                 self.keep_prob_input,
                                 name='dropout_input')
 
@@ -113,43 +116,45 @@ class BLSTM_CTC_BOTTLENECK(ctcBase):
                     cell_fw=lstm_fw,
                     cell_bw=lstm_bw,
                     inputs=outputs,
-                    sequence_length=self.seq_len,
+                    sequence_length=seq_len,
+                    swap_memory=self.swap_memory,
                     dtype=tf.float32,
                     scope='BiLSTM_' + str(i_layer + 1))
 
                 outputs = tf.concat(axis=2, values=[outputs_fw, outputs_bw])
 
-        # Reshape to apply the same weights over the timesteps
+        # The dimensions of outputs of the last layer
         if self.num_proj is None:
             output_node = self.num_cell * 2
         else:
             output_node = self.num_proj * 2
-        outputs = tf.reshape(outputs, shape=[-1, output_node])
 
         # `[batch_size, max_time, input_size_splice]`
-        batch_size = tf.shape(self.inputs)[0]
+        batch_size = tf.shape(inputs)[0]
 
         with tf.name_scope('bottleneck'):
-            # Affine
-            W_bottleneck = tf.Variable(tf.truncated_normal(
-                shape=[output_node, self.bottleneck_dim],
-                stddev=0.1, name='W_bottleneck'))
-            b_bottleneck = tf.Variable(tf.zeros(
-                shape=[self.bottleneck_dim], name='b_bottleneck'))
-            logits_2d = tf.matmul(outputs, W_bottleneck) + b_bottleneck
+            W_bottleneck, b_bottleneck = self._affine_variables(
+                'bottleneck', output_node, self.bottleneck_dim)
 
         with tf.name_scope('output'):
-            # Affine
-            W_output = tf.Variable(tf.truncated_normal(
-                shape=[self.bottleneck_dim, self.num_classes],
-                stddev=0.1, name='W_output'))
-            b_output = tf.Variable(tf.zeros(
-                shape=[self.num_classes], name='b_output'))
-            logits_2d = tf.matmul(logits_2d, W_output) + b_output
-
-            # Reshape back to the original shape
-            logits_3d = tf.reshape(
-                logits_2d, shape=[batch_size, -1, self.num_classes])
-
-            # Convert to `[max_time, batch_size, num_classes]`
-            self.logits = tf.transpose(logits_3d, (1, 0, 2))
+            W_output, b_output = self._affine_variables(
+                'output', self.bottleneck_dim, self.num_classes)
+
+            with self._jit_scope():
+                # Reshape to apply the same weights over the timesteps
+                outputs = tf.reshape(outputs, shape=[-1, output_node])
+
+                # Affine (bottleneck)
+                logits_2d = tf.matmul(outputs, W_bottleneck) + b_bottleneck
+
+                # Affine
+                logits_2d = tf.matmul(logits_2d, W_output) + b_output
+
+                # Reshape back to the original shape
+                logits_3d = tf.reshape(
+                    logits_2d, shape=[batch_size, -1, self.num_classes])
+
+                # Convert to `[max_time, batch_size, num_classes]`
+                logits = tf.transpose(logits_3d, (1, 0, 2))
+
+        return logits
@@ -7,12 +7,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import math
 import tensorflow as tf
 from .ctc_base import ctcBase
 
-# from ..feed_forward.layers.activation_func import maxout, prelu
-# from ..feed_forward.utils_cnn import pool
-
 
 class CNN_CTC(ctcBase):
     """CNN-CTC model.
@@ -67,165 +65,133 @@ class CNN_CTC(ctcBase):
         self.num_proj = None
         self.splice = 0
 
-    def define(self):
-        """Construct model graph."""
-        # Generate placeholders
-        self._generate_pl()
-
+    def _conv_variables(self, name, conv_shape):
+        """Create filters & biases of a conv layer. The same variables are
+           returned when called again in other towers.
+        Args:
+            name: string, the name of the layer
+            conv_shape: list of `[FH, FW, InputChannel, FilterNum]`
+        Returns:
+            W: A variable of size conv_shape
+            b: A variable of size `[FilterNum]`
+        """
+        if name not in self._shared_variables:
+            W = tf.Variable(tf.truncated_normal(
+                shape=conv_shape, stddev=self.parameter_init,
+                name='W_' + name))
+            b = tf.Variable(tf.zeros(
+                shape=[conv_shape[3]], name='b_' + name))
+            self._shared_variables[name] = (W, b)
+        return self._shared_variables[name]
+
+    def _build(self, inputs, seq_len):
+        """Construct model graph.
+        Args:
+            inputs: A tensor of size `[batch_size, max_time, input_size]`
+            seq_len: A tensor of size `[batch_size]`
+        Returns:
+            logits: A tensor of size `[max_time, batch_size, num_classes]`
+        """
         # Dropout for Input
-        self.inputs = tf.nn.dropout(self.inputs_pl,
-                                    self.keep_prob_input_pl,
-                                    name='dropout_input')
+        inputs = tf.nn.dropout(inputs,
+                               self.keep_prob_input,
+                               name='dropout_input')
 
         # `[batch_size, max_time, input_size_splice]`
-        inputs_shape = tf.shape(self.inputs)
+        inputs_shape = tf.shape(inputs)
         batch_size, max_time = inputs_shape[0], inputs_shape[1]
 
-        ######################################################
-        # 1st conv
-        # filter: (freq,time)=(3,5)
-        # W: [FH, FW, InputChannel, FilterNum (OutputChannel)]
-        # b: [FilterNum (OutputChannel)]
-        ######################################################
-        with tf.name_scope('conv1'):
-            # Reshape to [batch, 40fbank + 1energy, timesteps, 3(current +
-            # delta + deltadelta)]
-            input_drop_rs = tf.reshape(
-                self.inputs,
-                # shape=[batch_size, self.input_size,
-                # max_time, 1])
-                shape=[batch_size, int(self.input_size / 3), max_time, 3])
-
-            # Affine
-            conv1_shape = [3, 5, 3, 128]  # (FH, FW, InputChannel, FilterNum)
-            W_conv1 = tf.Variable(tf.truncated_normal(
-                shape=conv1_shape, stddev=self.parameter_init))
-            b_conv1 = tf.Variable(tf.zeros(
-                shape=[conv1_shape[3]]))
-            outputs = tf.nn.bias_add(tf.nn.conv2d(input_drop_rs, W_conv1,
-                                                  strides=[1, 1, 1, 1],
-                                                  padding='SAME'),
-                                     b_conv1)
-
-            # Weight decay
-            # self._weight_decay(W_conv1)
-
-            # Batch normalization
-            # outputs = self._batch_norm(outputs)
-
-            # Activation
-            outputs = tf.nn.relu(outputs)
-
-        #########################
-        # 1st pool (3*1)
-        #########################
-        with tf.name_scope('pool1'):
-            outputs = pool(outputs, shape=[3, 1], pool_type='max')
-
-            # Dropout
-            outputs = tf.nn.dropout(outputs, self.keep_prob_hidden_pl)
-
-        ############################
-        # 2~4th conv
-        # filter: (freq,time)=(3,5)
-        ############################
-        for i_layer in range(2, 5, 1):
-            with tf.name_scope('conv' + str(i_layer)):
-                # Affine
-                if i_layer != 4:
-                    # (FH, FW, InputChannel, FilterNum)
-                    conv2_shape = [3, 5, 128, 128]
-                else:
-                    # (FH, FW, InputChannel, FilterNum)
-                    conv2_shape = [3, 5, 128, 256]
-                W_conv2 = tf.Variable(tf.truncated_normal(
-                    shape=conv2_shape, stddev=self.parameter_init))
-                b_conv2 = tf.Variable(tf.zeros(
-                    shape=[conv2_shape[3]]))
-                outputs = tf.nn.bias_add(tf.nn.conv2d(outputs, W_conv2,
-                                                      strides=[1, 1, 1, 1],
-                                                      padding='SAME'),
-                                         b_conv2)
-
-                # Weight decay
-                # self._weight_decay(W_conv2)
-
-                # Batch normalization
-                # output_conv2 = self._batch_norm(outputs)
-
-                # Activation
-                outputs = tf.nn.relu(outputs)
+        # Each of num_stack frames is laid out as [static|delta|delta-delta]
+        if self.input_size % (3 * self.num_stack) != 0:
+            raise ValueError('input_size must be a multiple of 3 * num_stack.')
+        num_channel = 3 * self.num_stack
+
+        # The number of frequency bins before & after pooling
+        freq = int(self.input_size / num_channel)
+        freq_pooled = int(math.ceil(freq / 3))
+
+        # (FH, FW, InputChannel, FilterNum) of each conv layer
+        conv_shapes = [[3, 5, num_channel, 128]]
+        conv_shapes += [[3, 5, 128, 128]] * 2 + [[3, 5, 128, 256]]
+        conv_shapes += [[3, 5, 256, 256]] * 6
+        conv_variables = []
+        for i_layer, conv_shape in enumerate(conv_shapes):
+            with tf.name_scope('conv' + str(i_layer + 1)):
+                conv_variables.append(self._conv_variables(
+                    'conv' + str(i_layer + 1), conv_shape))
+
+        fc_shapes = [[freq_pooled * 256, 1024], [1024, 1024],
+                     [1024, self.num_classes]]
+        fc_variables = []
+        for i_layer, fc_shape in enumerate(fc_shapes):
+            with tf.name_scope('fc' + str(i_layer + 11)):
+                fc_variables.append(self._affine_variables(
+                    'fc' + str(i_layer + 11), fc_shape[0], fc_shape[1]))
+
+        with self._jit_scope():
+            # Split into `[batch_size, max_time, num_stack, 3, freq]`, where
+            # the 3 features are static, delta & delta-delta features
+            outputs = tf.reshape(
+                inputs, shape=[batch_size, max_time, self.num_stack, 3, freq])
+
+            # Fold stacked frames into channels & reshape to
+            # `[batch_size, freq, max_time, num_stack * 3]`
+            outputs = tf.reshape(
+                outputs, shape=[batch_size, max_time, num_channel, freq])
+            outputs = tf.transpose(outputs, (0, 3, 1, 2))
+
+            ######################################################
+            # 1~10th conv
+            # filter: (freq,time)=(3,5)
+            # 1st pool (3*1) after the 1st conv
+            ######################################################
+            for i_layer, (W_conv, b_conv) in enumerate(conv_variables):
+                with tf.name_scope('conv' + str(i_layer + 1)):
+                    outputs = tf.nn.bias_add(
+                        tf.nn.conv2d(outputs, W_conv,
+                                     strides=[1, 1, 1, 1],
+                                     padding='SAME'),
+                        b_conv)
+
+                    # Activation
+                    outputs = tf.nn.relu(outputs)
+
+                if i_layer == 0:
+                    with tf.name_scope('pool1'):
+                        outputs = tf.nn.max_pool(outputs,
+                                                 ksize=[1, 3, 1, 1],
+                                                 strides=[1, 3, 1, 1],
+                                                 padding='SAME')
 
                 # Dropout
-                outputs = tf.nn.dropout(outputs, self.keep_prob_hidden_pl)
-
-        ###########################
-        # 5~10th conv
-        # filter: (freq,time)=(3,5)
-        ###########################
-        for i_layer in range(5, 11, 1):
-            with tf.name_scope('conv' + str(i_layer)):
-                # Affine
-                # (FH, FW, InputChannel, FilterNum)
-                conv5_shape = [3, 5, 256, 256]
-                W_conv5 = tf.Variable(tf.truncated_normal(
-                    shape=conv5_shape, stddev=self.parameter_init))
-                b_conv5 = tf.Variable(tf.zeros(
-                    shape=[conv5_shape[3]]))
-                outputs = tf.nn.bias_add(tf.nn.conv2d(outputs, W_conv5,
-                                                      strides=[1, 1, 1, 1],
-                                                      padding='SAME'),
-                                         b_conv5)
-
-                # Weight decay
-                # self._weight_decay(W_conv5)
-
-                # Batch normalization
-                # outputs_conv5 = self._batch_norm(outputs)
-
-                # Activation
-                outputs = tf.nn.relu(outputs)
+                outputs = tf.nn.dropout(outputs, self.keep_prob_hidden)
 
-                # Dropout
-                outputs = tf.nn.dropout(outputs, self.keep_prob_hidden_pl)
-
-        # Reshape for fully-connected layer
-        outputs = tf.reshape(outputs, shape=[-1, 14 * 256])
-
-        ##############
-        # 11~13th fc
-        ##############
-        for i_layer in range(11, 14, 1):
-            with tf.name_scope('fc' + str(i_layer)):
-                if i_layer == 11:
-                    fc_shape = [14 * 256, 1024]
-                elif i_layer == 12:
-                    fc_shape = [1024, 1024]
-                elif i_layer == 13:
-                    fc_shape = [1024, self.num_classes]
-                W_fc11 = tf.Variable(tf.truncated_normal(
-                    shape=fc_shape, stddev=self.parameter_init))
-                b_fc11 = tf.Variable(tf.zeros(
-                    shape=[fc_shape[1]]))
-                outputs = tf.matmul(outputs, W_fc11) + b_fc11
-
-                # Weight decay
-                # self._weight_decay(W_fc11)
-
-                # Batch normalization
-                # output = self._batch_norm(outputs)
-
-                # Activation
-                outputs = tf.nn.relu(outputs)
+            # Reshape to `[batch_size * max_time, freq_pooled * 256]` for
+            # fully-connected layers
+            outputs = tf.transpose(outputs, (0, 2, 1, 3))
+            outputs = tf.reshape(outputs, shape=[-1, freq_pooled * 256])
 
-                # Dropout
-                if i_layer != 13:
-                    outputs = tf.nn.dropout(outputs, self.keep_prob_hidden_pl)
+            ##############
+            # 11~13th fc
+            ##############
+            for i_layer, (W_fc, b_fc) in enumerate(fc_variables):
+                with tf.name_scope('fc' + str(i_layer + 11)):
+                    outputs = tf.matmul(outputs, W_fc) + b_fc
+
+                    if i_layer != len(fc_variables) - 1:
+                        # Activation
+                        outputs = tf.nn.relu(outputs)
+
+                        # Dropout
+                        outputs = tf.nn.dropout(outputs,
+                                                self.keep_prob_hidden)
+
+            # Reshape back to the original shape (batch_size, max_time,
+            # num_classes)
+            outputs_3d = tf.reshape(
+                outputs, shape=[batch_size, max_time, self.num_classes])
 
-        # Reshape back to the original shape (batch_size, max_time,
-        # num_classes)
-        outputs_3d = tf.reshape(
-            outputs, shape=[batch_size, max_time, self.num_classes])
+            # Convert to `[max_time, batch_size, num_classes]`
+            logits = tf.transpose(outputs_3d, (1, 0, 2))
 
-        # Convert to `[max_time, batch_size, num_classes]`
-        self.logits = tf.transpose(outputs_3d, (1, 0, 2))
+        return logits
@@ -8,6 +8,7 @@ from __future__ import division
 from __future__ import print_function
 
 import tensorflow as tf
+from models.graph_util import jit_scope, accumulate_gradients
 
 
 OPTIMIZER_CLS_NAMES = {
@@ -77,6 +78,27 @@ class ctcBase(object):
         # Summaries for TensorBoard
         self.summaries_train = []
         self.summaries_dev = []
+        # Statistics of parameters (shared by train & dev)
+        self.summaries_statistics = []
+        # none: no summaries are written (set by trainers)
+        # scalars: loss & LER
+        # full: loss & LER, and statistics of parameters
+        self.summary_level = 'scalars'
+
+        # The number of towers for data-parallel training (see define_towers)
+        self.num_tower = 1
+
+        # If True, the output layer & the CNN front-end are compiled by XLA JIT
+        # (set by trainers)
+        self.use_xla = False
+
+        # If True, activations of RNN layers kept for backprop are swapped
+        # out to host memory in the forward pass (set by trainers)
+        self.swap_memory = False
+
+        # The number of frames stacked in each input vector. The CNN
+        # front-end splits input vectors into frames (set by trainers)
+        self.num_stack = 1
 
         self.name = name
 
@@ -124,7 +146,119 @@ class ctcBase(object):
         return inputs
 
     def define(self):
-        NotImplementedError
+        """Construct model graph."""
+        # Generate placeholders
+        self._generate_placeholer()
+
+        self._shared_variables = {}
+        self.logits = self._build(self.inputs, self.seq_len)
+
+    def define_towers(self, num_tower, devices=None):
+        """Construct model graph replicated over devices for data-parallel
+           training. Each mini batch is split into num_tower parts, and all
+           towers share parameters. Logits of towers are concatenated, so
+           decoder() and ler() work as with define().
+        Args:
+            num_tower: int, the number of towers (batch_size must be at least
+                num_tower)
+            devices: list of device names of towers. By default, CPU devices
+                `/cpu:0`, `/cpu:1`... Set device_count={'CPU': num_tower} in
+                tf.ConfigProto to create them
+        """
+        if devices is None:
+            devices = ['/cpu:%d' % i for i in range(num_tower)]
+        if len(devices) != num_tower:
+            raise ValueError('Set a device for each tower.')
+        self.num_tower = num_tower
+        self.tower_devices = devices
+
+        # Generate placeholders
+        self._generate_placeholer()
+
+        self._shared_variables = {}
+        batch_size = tf.shape(self.inputs)[0]
+        tower_size = (batch_size + num_tower - 1) // num_tower
+        logits_list = []
+        self.tower_ctc_losses = []
+        with tf.variable_scope(tf.get_variable_scope()):
+            for i_tower in range(num_tower):
+                with tf.device(devices[i_tower]), tf.name_scope('tower' + str(i_tower)):
+                    start = tf.minimum(i_tower * tower_size, batch_size)
+                    end = tf.minimum(start + tower_size, batch_size)
+                    inputs = self.inputs[start:end]
+                    seq_len = self.seq_len[start:end]
+                    labels = self._slice_labels(start, end)
+
+                    logits = self._build(inputs, seq_len)
+                    logits_list.append(logits)
+
+                    # Sum of ctc loss in the tower (normalized in loss())
+                    with tf.name_scope("ctc_loss"):
+                        self.tower_ctc_losses.append(tf.reduce_sum(
+                            tf.nn.ctc_loss(labels, logits,
+                                           tf.cast(seq_len, tf.int32))))
+
+                    # Share variables among towers
+                    tf.get_variable_scope().reuse_variables()
+
+        # `[max_time, batch_size, num_classes]`
+        self.logits = tf.concat(axis=1, values=logits_list)
+
+    def _slice_labels(self, start, end):
+        """Slice sparse labels of the utterances in [start, end).
+        Args:
+            start: A scalar int32 tensor
+            end: A scalar int32 tensor
+        Returns:
+            labels: SparseTensor
+        """
+        start = tf.cast(start, tf.int64)
+        end = tf.cast(end, tf.int64)
+        is_in = tf.logical_and(self.label_indices[:, 0] >= start,
+                               self.label_indices[:, 0] < end)
+        indices = tf.boolean_mask(self.label_indices, is_in)
+        indices -= tf.stack([start, tf.constant(0, dtype=tf.int64)])
+        values = tf.boolean_mask(self.label_values, is_in)
+        shape = tf.stack([end - start, self.label_shape[1]])
+        return tf.SparseTensor(indices, values, shape)
+
+    def _build(self, inputs, seq_len):
+        """Construct model graph.
+        Args:
+            inputs: A tensor of size `[batch_size, max_time, input_size]`
+            seq_len: A tensor of size `[batch_size]`
+        Returns:
+            logits: A tensor of size `[max_time, batch_size, num_classes]`
+        """
+        raise NotImplementedError
+
+    def _jit_scope(self):
+        """Scope to compile operations by XLA JIT if use_xla is True. Create
+           variables outside of the scope.
+        Returns:
+            A context manager
+        """
+        return jit_scope(self.use_xla)
+
+    def _affine_variables(self, name, input_dim, output_dim):
+        """Create weights & biases of an affine layer. The same variables are
+           returned when called again in other towers.
+        Args:
+            name: string, the name of the layer
+            input_dim: int, the dimensions of inputs
+            output_dim: int, the dimensions of outputs
+        Returns:
+            W: A variable of size `[input_dim, output_dim]`
+            b: A variable of size `[output_dim]`
+        """
+        if name not in self._shared_variables:
+            W = tf.Variable(tf.truncated_normal(
+                shape=[input_dim, output_dim],
+                stddev=0.1, name='W_' + name))
+            b = tf.Variable(tf.zeros(
+                shape=[output_dim], name='b_' + name))
+            self._shared_variables[name] = (W, b)
+        return self._shared_variables[name]
 
     def loss(self):
         """Operation for computing ctc loss.
@@ -136,13 +270,22 @@ class ctcBase(object):
         for var in tf.trainable_variables():
             if 'bias' not in var.name.lower():
                 weight_sum += tf.nn.l2_loss(var)
-        tf.add_to_collection('losses', weight_sum * self.weight_decay)
+        self.weight_decay_loss = weight_sum * self.weight_decay
+        tf.add_to_collection('losses', self.weight_decay_loss)
 
         with tf.name_scope("ctc_loss"):
-            ctc_loss = tf.nn.ctc_loss(self.labels,
-                                      self.logits,
-                                      tf.cast(self.seq_len, tf.int32))
-            ctc_loss_mean = tf.reduce_mean(ctc_loss, name='ctc_loss_mean')
+            if self.num_tower == 1:
+                ctc_loss = tf.nn.ctc_loss(self.labels,
+                                          self.logits,
+                                          tf.cast(self.seq_len, tf.int32))
+                ctc_loss_mean = tf.reduce_mean(ctc_loss, name='ctc_loss_mean')
+            else:
+                # Normalize by the whole mini batch
+                batch_size = tf.cast(tf.shape(self.inputs)[0], tf.float32)
+                self.tower_ctc_losses = [loss / batch_size
+                                         for loss in self.tower_ctc_losses]
+                ctc_loss_mean = tf.add_n(self.tower_ctc_losses,
+                                         name='ctc_loss_mean')
             tf.add_to_collection('losses', ctc_loss_mean)
 
         # Total loss
@@ -158,7 +301,8 @@ class ctcBase(object):
         return self.loss
 
     def train(self, optimizer, learning_rate_init=None,
-              clip_gradients_by_norm=None, is_scheduled=False):
+              clip_gradients_by_norm=None, is_scheduled=False,
+              num_accumulate=1, num_sync_replica=None):
         """Operation for training.
         Args:
             optimizer: string, name of the optimizer in OPTIMIZER_CLS_NAMES
@@ -166,6 +310,13 @@ class ctcBase(object):
             clip_gradients_by_norm: if True, clip gradients by norm of the
                 value of self.clip_grad
             is_scheduled: if True, schedule learning rate at each epoch
+            num_accumulate: int, the number of micro-batches to accumulate
+                gradients over. If more than 1, run self.accumulate_op for
+                each micro-batch and train_op after every num_accumulate
+                micro-batches
+            num_sync_replica: int, the number of workers in distributed
+                training. If set, gradients of all workers are aggregated
+                before each update (self.optimizer is SyncReplicasOptimizer)
         Returns:
             train_op: operation for training
         """
@@ -176,6 +327,8 @@ class ctcBase(object):
                 (", ".join(OPTIMIZER_CLS_NAMES), optimizer))
         if learning_rate_init < 0.0:
             raise ValueError("Invalid learning_rate %s.", learning_rate_init)
+        if num_accumulate < 1:
+            raise ValueError("num_accumulate must be more than 0.")
 
         # Select parameter update method
         if is_scheduled:
@@ -191,31 +344,45 @@ class ctcBase(object):
             self.optimizer = OPTIMIZER_CLS_NAMES[optimizer](
                 learning_rate=learning_rate)
 
+        if num_sync_replica is not None:
+            self.optimizer = tf.train.SyncReplicasOptimizer(
+                self.optimizer,
+                replicas_to_aggregate=num_sync_replica,
+                total_num_replicas=num_sync_replica)
+
         # Create a variable to track the global step
         global_step = tf.Variable(0, name='global_step', trainable=False)
+        self.global_step = global_step
 
-        # Gradient clipping
-        if self.clip_grad is not None:
+        if self.clip_grad is not None or num_accumulate > 1 or self.num_tower > 1:
             # Compute gradients
             trainable_vars = tf.trainable_variables()
-            grads = tf.gradients(self.loss, trainable_vars)
+            if self.num_tower == 1:
+                grads = tf.gradients(self.loss, trainable_vars)
+            else:
+                grads = self._tower_gradients(trainable_vars)
 
             # TODO: Optionally add gradient noise
 
-            if clip_gradients_by_norm:
-                # Clip by norm
-                self.clipped_grads = [tf.clip_by_norm(
-                    g,
-                    clip_norm=self.clip_grad) for g in grads]
-            else:
-                # Clip by absolute values
-                self.clipped_grads = [tf.clip_by_value(
-                    g,
-                    clip_value_min=-self.clip_grad,
-                    clip_value_max=self.clip_grad) for g in grads]
-
-            # TODO: Add histograms for variables, gradients (norms)
-            self._tensorboard_statistics(trainable_vars)
+            # Accumulate gradients over micro-batches
+            if num_accumulate > 1:
+                grads, self.accumulate_op, reset_op = accumulate_gradients(
+                    grads, trainable_vars, num_accumulate)
+
+            # Gradient clipping
+            if self.clip_grad is not None:
+                if clip_gradients_by_norm:
+                    # Clip by norm
+                    grads = [tf.clip_by_norm(
+                        g,
+                        clip_norm=self.clip_grad) for g in grads]
+                else:
+                    # Clip by absolute values
+                    grads = [tf.clip_by_value(
+                        g,
+                        clip_value_min=-self.clip_grad,
+                        clip_value_max=self.clip_grad) for g in grads]
+            self.clipped_grads = grads
 
             # Create gradient updates
             train_op = self.optimizer.apply_gradients(
@@ -223,12 +390,46 @@ class ctcBase(object):
                 global_step=global_step,
                 name='train')
 
-        # Use the optimizer to apply the gradients that minimize the loss
-        # and also increment the global step counter as a single training step
-        train_op = self.optimizer.minimize(self.loss, global_step=global_step)
+            if num_accumulate > 1:
+                # Reset accumulators after updating parameters
+                with tf.control_dependencies([train_op]):
+                    train_op = tf.group(reset_op)
+        else:
+            # Use the optimizer to apply the gradients that minimize the loss
+            # and also increment the global step counter as a single training
+            # step
+            train_op = self.optimizer.minimize(
+                self.loss, global_step=global_step)
+
+        # TODO: Add histograms for gradients (norms)
+        if self.summary_level == 'full':
+            self._tensorboard_statistics(tf.trainable_variables())
 
         return train_op
 
+    def _tower_gradients(self, trainable_vars):
+        """Compute gradients in each tower and average them.
+        Args:
+            trainable_vars: list of variables
+        Returns:
+            grads: list of gradients of self.loss
+        """
+        # Gradients of weight decay
+        grads = tf.gradients(self.weight_decay_loss, trainable_vars)
+        grads = [g if g is not None else tf.zeros_like(var)
+                 for g, var in zip(grads, trainable_vars)]
+
+        # Tower losses are normalized by the whole mini batch, so the sum of
+        # tower gradients is the average gradient over the mini batch
+        for device, tower_loss in zip(self.tower_devices,
+                                      self.tower_ctc_losses):
+            with tf.device(device):
+                tower_grads = tf.gradients(tower_loss, trainable_vars,
+                                           colocate_gradients_with_ops=True)
+            grads = [g if tower_g is None else g + tower_g
+                     for g, tower_g in zip(grads, tower_grads)]
+        return grads
+
     def _add_scaled_noise_to_gradients(grads_and_vars, gradient_noise_scale):
         """Adds scaled noise from a 0-mean normal distribution to gradients."""
         raise NotImplementedError
@@ -272,10 +473,13 @@ class ctcBase(object):
 
         return posteriors_op
 
-    def ler(self, decode_op):
+    def ler(self, decode_op, is_summary=True):
         """Operation for computing LER (Label Error Rate).
         Args:
             decode_op: operation for decoding
+            is_summary: if True, add summaries of LER to summaries_train &
+                summaries_dev. Set False for the second LER operation (ex.
+                beam search for evaluation besides greedy for monitoring)
         Return:
             ler_op: operation for computing LER
         """
@@ -285,72 +489,57 @@ class ctcBase(object):
         # TODO: ここでの編集距離はラベルだから，文字に変換しないと正しいCERは得られない
 
         # Add a scalar summary for the snapshot of LER
-        with tf.name_scope("ler"):
-            self.summaries_train.append(tf.summary.scalar(
-                'ler_train', ler_op))
-            self.summaries_dev.append(tf.summary.scalar(
-                'ler_dev', ler_op))
+        if is_summary:
+            with tf.name_scope("ler"):
+                self.summaries_train.append(tf.summary.scalar(
+                    'ler_train', ler_op))
+                self.summaries_dev.append(tf.summary.scalar(
+                    'ler_dev', ler_op))
 
         return ler_op
 
+    def step_fetches(self, train_op, decode_op=None, ler_op=None,
+                     summary_op=None, is_logits=False):
+        """Fetches of one training step. Monitoring operations are computed
+           from the forward pass of the step (before parameters are updated,
+           with dropout), so monitoring does not cost extra forward passes.
+        Args:
+            train_op: operation for training (or self.accumulate_op)
+            decode_op: if not None, fetch decoded labels
+            ler_op: if not None, fetch LER
+            summary_op: if not None, fetch summaries
+            is_logits: if True, fetch logits
+        Returns:
+            fetches: dict of `train`, `loss` and optionally `decode`, `ler`,
+                `summary` and `logits`. Run with session.run to get the
+                results in the same keys
+        """
+        fetches = {'train': train_op, 'loss': self.loss}
+        if decode_op is not None:
+            fetches['decode'] = decode_op
+        if ler_op is not None:
+            fetches['ler'] = ler_op
+        if summary_op is not None:
+            fetches['summary'] = summary_op
+        if is_logits:
+            fetches['logits'] = self.logits
+        return fetches
+
     def _tensorboard_statistics(self, trainable_vars):
         """Compute statistics for TensorBoard plot.
+           Parameters do not depend on inputs, so one set of summaries is
+           shared by train & dev. Run self.summaries_statistics without feed.
         Args:
-            trainable_vars:
+            trainable_vars: list of variables
         """
-        # Histogram
-        with tf.name_scope("train"):
-            for var in trainable_vars:
-                self.summaries_train.append(
-                    tf.summary.histogram(var.name, var))
-        with tf.name_scope("dev"):
-            for var in trainable_vars:
-                self.summaries_dev.append(
-                    tf.summary.histogram(var.name, var))
-
-        # Mean
-        with tf.name_scope("mean_train"):
-            for var in trainable_vars:
-                self.summaries_train.append(
-                    tf.summary.scalar(var.name,
-                                      tf.reduce_mean(var)))
-        with tf.name_scope("mean_dev"):
-            for var in trainable_vars:
-                self.summaries_dev.append(
-                    tf.summary.scalar(var.name,
-                                      tf.reduce_mean(var)))
-
-        # Standard deviation
-        with tf.name_scope("stddev_train"):
-            for var in trainable_vars:
-                self.summaries_train.append(
-                    tf.summary.scalar(var.name, tf.sqrt(
-                        tf.reduce_mean(tf.square(var - tf.reduce_mean(var))))))
-        with tf.name_scope("stddev_dev"):
-            for var in trainable_vars:
-                self.summaries_dev.append(
-                    tf.summary.scalar(var.name, tf.sqrt(
-                        tf.reduce_mean(tf.square(var - tf.reduce_mean(var))))))
-
-        # Max
-        with tf.name_scope("max_train"):
-            for var in trainable_vars:
-                self.summaries_train.append(
-                    tf.summary.scalar(var.name,
-                                      tf.reduce_max(var)))
-        with tf.name_scope("max_dev"):
-            for var in trainable_vars:
-                self.summaries_dev.append(
-                    tf.summary.scalar(var.name, tf.reduce_max(var)))
-
-        # Min
-        with tf.name_scope("min_train"):
-            for var in trainable_vars:
-                self.summaries_train.append(
-                    tf.summary.scalar(var.name,
-                                      tf.reduce_min(var)))
-        with tf.name_scope("min_dev"):
+        with tf.name_scope("statistics"):
             for var in trainable_vars:
-                self.summaries_dev.append(
-                    tf.summary.scalar(var.name,
-                                      tf.reduce_min(var)))
+                name = var.op.name
+                mean = tf.reduce_mean(var)
+                stddev = tf.sqrt(tf.reduce_mean(tf.square(var - mean)))
+                self.summaries_statistics.extend([
+                    tf.summary.histogram(name, var),
+                    tf.summary.scalar('mean/' + name, mean),
+                    tf.summary.scalar('stddev/' + name, stddev),
+                    tf.summary.scalar('max/' + name, tf.reduce_max(var)),
+                    tf.summary.scalar('min/' + name, tf.reduce_min(var))])
@@ -51,13 +51,16 @@ class GRU_CTC(ctcBase):
                          dropout_ratio_input, dropout_ratio_hidden,
                          weight_decay, name)
 
-    def define(self):
-        """Construct model graph."""
-        # Generate placeholders
-        self._generate_placeholer()
-
+    def _build(self, inputs, seq_len):
+        """Construct model graph.
+        Args:
+            inputs: A tensor of size `[batch_size, max_time, input_size]`
+            seq_len: A tensor of size `[batch_size]`
+        Returns:
+            logits: A tensor of size `[max_time, batch_size, num_classes]`
+        """
         # Dropout for Input
-        inputs_drop = tf.nn.dropout(self.inputs,
+        inputs_drop = tf.nn.dropout(inputs,
                                     self.keep_prob_input,
                                     name='dropout_input')
 
@@ -86,27 +89,29 @@ class GRU_CTC(ctcBase):
         # Ignore 2nd return (the last state)
         outputs, _ = tf.nn.dynamic_rnn(cell=stacked_gru,
                                        inputs=inputs_drop,
-                                       sequence_length=self.seq_len,
+                                       sequence_length=seq_len,
+                                       swap_memory=self.swap_memory,
                                        dtype=tf.float32)
 
         # `[batch_size, max_time, input_size_splice]`
-        batch_size = tf.shape(self.inputs)[0]
-
-        # Reshape to apply the same weights over the timesteps
-        outputs = tf.reshape(outputs, shape=[-1, self.num_cell])
+        batch_size = tf.shape(inputs)[0]
 
         with tf.name_scope('output'):
-            # Affine
-            W_output = tf.Variable(tf.truncated_normal(
-                shape=[self.num_cell, self.num_classes],
-                stddev=0.1, name='W_output'))
-            b_output = tf.Variable(tf.zeros(
-                shape=[self.num_classes], name='b_output'))
-            logits_2d = tf.matmul(outputs, W_output) + b_output
-
-            # Reshape back to the original shape
-            logits_3d = tf.reshape(
-                logits_2d, shape=[batch_size, -1, self.num_classes])
-
-            # Convert to `[max_time, batch_size, num_classes]`
-            self.logits = tf.transpose(logits_3d, (1, 0, 2))
+            W_output, b_output = self._affine_variables(
+                'output', self.num_cell, self.num_classes)
+
+            with self._jit_scope():
+                # Reshape to apply the same weights over the timesteps
+                outputs = tf.reshape(outputs, shape=[-1, self.num_cell])
+
+                # Affine
+                logits_2d = tf.matmul(outputs, W_output) + b_output
+
+                # Reshape back to the original shape
+                logits_3d = tf.reshape(
+                    logits_2d, shape=[batch_size, -1, self.num_classes])
+
+                # Convert to `[max_time, batch_size, num_classes]`
+                logits = tf.transpose(logits_3d, (1, 0, 2))
+
+        return logits
@@ -147,6 +147,7 @@ class Multitask_BLSTM_CTC(ctcBase):
                     cell_bw=lstm_bw,
                     inputs=outputs,
                     sequence_length=self.seq_len,
+                    swap_memory=self.swap_memory,
                     dtype=tf.float32,
                     scope='BiLSTM_' + str(i_layer + 1))
 
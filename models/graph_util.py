@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Utilities for building graphs shared by CTC & attention models."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import tensorflow as tf
+from tensorflow.contrib.compiler import jit
+
+
+@contextlib.contextmanager
+def _null_scope():
+    yield
+
+
+def jit_scope(use_xla):
+    """Scope to compile operations by XLA JIT if use_xla is True. Create
+       variables outside of the scope.
+    Args:
+        use_xla: bool, if True, compile operations by XLA JIT
+    Returns:
+        A context manager
+    """
+    if use_xla:
+        return jit.experimental_jit_scope()
+    return _null_scope()
+
+
+def accumulate_gradients(grads, trainable_vars, num_accumulate):
+    """Accumulate gradients over micro-batches.
+    Args:
+        grads: list of gradients of trainable_vars
+        trainable_vars: list of variables
+        num_accumulate: int, the number of micro-batches
+    Returns:
+        grads: list of the mean of accumulated gradients
+        accumulate_op: operation for adding gradients to accumulators
+        reset_op: operation for resetting accumulators
+    """
+    with tf.name_scope('accumulate'):
+        accumulators = [tf.Variable(
+            tf.zeros(var.get_shape(), dtype=var.dtype.base_dtype),
+            trainable=False,
+            name=var.op.name.replace('/', '_') + '_accum')
+            for var in trainable_vars]
+        # Sparse gradients (IndexedSlices) are densified before accumulation
+        accumulate_op = tf.group(
+            *[accum.assign_add(tf.convert_to_tensor(g))
+              for accum, g in zip(accumulators, grads)])
+        reset_op = tf.group(
+            *[accum.assign(tf.zeros_like(accum)) for accum in accumulators])
+        grads = [accum / num_accumulate for accum in accumulators]
+    return grads, accumulate_op, reset_op
@@ -8,6 +8,7 @@ from __future__ import print_function
 import sys
 import time
 import unittest
+import numpy as np
 import tensorflow as tf
 from tensorflow.python import debug as tf_debug
 
@@ -39,6 +40,270 @@ class TestCTC(tf.test.TestCase):
         # self.check_training(model_type='cnn_ctc', label_type='phone')
         # self.check_training(model_type='cnn_ctc', label_type='phone')
 
+    @measure_time
+    def test_accumulate(self):
+        print("Gradient accumulation check.")
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 4
+            inputs, labels, seq_len = generate_data(label_type='phone',
+                                                    model='ctc',
+                                                    batch_size=batch_size)
+            indices, values, dense_shape = list2sparsetensor(labels)
+
+            # Define model
+            model = load(model_type='blstm_ctc')
+            network = model(batch_size=batch_size,
+                            input_size=inputs[0].shape[1],
+                            num_cell=64,
+                            num_layer=1,
+                            output_size=61,
+                            parameter_init=0.1,
+                            clip_grad=5.0,
+                            clip_activation=50,
+                            dropout_ratio_input=1.0,
+                            dropout_ratio_hidden=1.0,
+                            weight_decay=1e-6)
+            network.define()
+
+            # Add to the graph each operation
+            loss_op = network.loss()
+            learning_rate = 1e-3
+            num_accumulate = 3
+            train_op = network.train(optimizer='sgd',
+                                     learning_rate_init=learning_rate,
+                                     is_scheduled=False,
+                                     num_accumulate=num_accumulate)
+            trainable_vars = tf.trainable_variables()
+            grads_op = tf.gradients(loss_op, trainable_vars)
+
+            # Add the variable initializer operation
+            init_op = tf.global_variables_initializer()
+
+            with tf.Session() as sess:
+                # Initialize parameters
+                sess.run(init_op)
+
+                feed_dict = {
+                    network.inputs: inputs,
+                    network.label_indices: indices,
+                    network.label_values: values,
+                    network.label_shape: dense_shape,
+                    network.seq_len: seq_len,
+                    network.keep_prob_input: 1.0,
+                    network.keep_prob_hidden: 1.0,
+                    network.learning_rate: learning_rate
+                }
+
+                # The same mini-batch is accumulated, so the update must be
+                # the same as that of a single mini-batch
+                vars_pre = sess.run(trainable_vars)
+                grads = sess.run(grads_op, feed_dict=feed_dict)
+                for _ in range(num_accumulate):
+                    sess.run(network.accumulate_op, feed_dict=feed_dict)
+                sess.run(train_op, feed_dict=feed_dict)
+                vars_post = sess.run(trainable_vars)
+
+                for var_pre, var_post, grad in zip(vars_pre, vars_post, grads):
+                    var_expected = var_pre - learning_rate * np.clip(
+                        grad, -network.clip_grad, network.clip_grad)
+                    self.assertAllClose(var_post, var_expected,
+                                        rtol=1e-4, atol=1e-6)
+
+    @measure_time
+    def test_towers(self):
+        print("Multi-tower check.")
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 4
+            inputs, labels, seq_len = generate_data(label_type='phone',
+                                                    model='ctc',
+                                                    batch_size=batch_size)
+            indices, values, dense_shape = list2sparsetensor(labels)
+
+            # Define model
+            model = load(model_type='blstm_ctc')
+            network = model(batch_size=batch_size,
+                            input_size=inputs[0].shape[1],
+                            num_cell=64,
+                            num_layer=2,
+                            output_size=61,
+                            parameter_init=0.1,
+                            clip_grad=5.0,
+                            clip_activation=50,
+                            dropout_ratio_input=1.0,
+                            dropout_ratio_hidden=1.0,
+                            weight_decay=1e-6)
+            network.define_towers(num_tower=2)
+
+            # Add to the graph each operation
+            loss_op = network.loss()
+            train_op = network.train(optimizer='adam',
+                                     learning_rate_init=1e-3,
+                                     is_scheduled=False)
+
+            # The loss over the concatenated logits of towers
+            loss_whole_op = tf.reduce_mean(tf.nn.ctc_loss(
+                network.labels, network.logits,
+                tf.cast(network.seq_len, tf.int32))) + network.weight_decay_loss
+
+            # Add the variable initializer operation
+            init_op = tf.global_variables_initializer()
+
+            config = tf.ConfigProto(device_count={'CPU': 2})
+            with tf.Session(config=config) as sess:
+                # Initialize parameters
+                sess.run(init_op)
+
+                feed_dict = {
+                    network.inputs: inputs,
+                    network.label_indices: indices,
+                    network.label_values: values,
+                    network.label_shape: dense_shape,
+                    network.seq_len: seq_len,
+                    network.keep_prob_input: 1.0,
+                    network.keep_prob_hidden: 1.0
+                }
+
+                # Parameters are shared among towers
+                # (weights, biases & 3 peephole weights per LSTM cell)
+                self.assertEqual(len(tf.trainable_variables()),
+                                 2 * 2 * 5 + 2)
+
+                loss, loss_whole = sess.run([loss_op, loss_whole_op],
+                                            feed_dict=feed_dict)
+                self.assertAllClose(loss, loss_whole, rtol=1e-4)
+                sess.run(train_op, feed_dict=feed_dict)
+
+    @measure_time
+    def test_step_fetches(self):
+        print("Fused training step check.")
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            # Load batch data
+            batch_size = 4
+            inputs, labels, seq_len = generate_data(label_type='phone',
+                                                    model='ctc',
+                                                    batch_size=batch_size)
+            indices, values, dense_shape = list2sparsetensor(labels)
+
+            # Define model
+            model = load(model_type='blstm_ctc')
+            network = model(batch_size=batch_size,
+                            input_size=inputs[0].shape[1],
+                            num_cell=64,
+                            num_layer=1,
+                            output_size=61,
+                            parameter_init=0.1,
+                            clip_grad=5.0,
+                            clip_activation=50,
+                            dropout_ratio_input=1.0,
+                            dropout_ratio_hidden=1.0,
+                            weight_decay=1e-6)
+            network.define()
+
+            # Add to the graph each operation
+            loss_op = network.loss()
+            train_op = network.train(optimizer='sgd',
+                                     learning_rate_init=1e-3,
+                                     is_scheduled=False)
+            decode_op = network.decoder(decode_type='greedy')
+            ler_op = network.ler(decode_op)
+            summary_train = tf.summary.merge(network.summaries_train)
+
+            # Add the variable initializer operation
+            init_op = tf.global_variables_initializer()
+
+            with tf.Session() as sess:
+                # Initialize parameters
+                sess.run(init_op)
+
+                feed_dict = {
+                    network.inputs: inputs,
+                    network.label_indices: indices,
+                    network.label_values: values,
+                    network.label_shape: dense_shape,
+                    network.seq_len: seq_len,
+                    network.keep_prob_input: 1.0,
+                    network.keep_prob_hidden: 1.0,
+                    network.learning_rate: 1e-3
+                }
+
+                # Monitoring results are computed before the update
+                loss, ler = sess.run([loss_op, ler_op], feed_dict=feed_dict)
+                results = sess.run(
+                    network.step_fetches(train_op, decode_op=decode_op,
+                                         ler_op=ler_op,
+                                         summary_op=summary_train,
+                                         is_logits=True),
+                    feed_dict=feed_dict)
+                self.assertAllClose(results['loss'], loss, rtol=1e-5)
+                self.assertAllClose(results['ler'], ler)
+                self.assertEqual(results['logits'].shape[1], batch_size)
+                self.assertTrue('summary' in results)
+                self.assertTrue('decode' in results)
+
+    @measure_time
+    def test_xla(self):
+        print("XLA JIT check.")
+        for model_type in ['blstm_ctc', 'cnn_ctc']:
+            losses = []
+            for use_xla in [False, True]:
+                losses.append(self.compute_loss(model_type, use_xla))
+            # Compilation must not change the results
+            self.assertAllClose(losses[0], losses[1], rtol=1e-4)
+
+    def compute_loss(self, model_type, use_xla):
+        tf.reset_default_graph()
+        with tf.Graph().as_default():
+            tf.set_random_seed(0)
+
+            # Load batch data
+            batch_size = 4
+            inputs, labels, seq_len = generate_data(label_type='phone',
+                                                    model='ctc',
+                                                    batch_size=batch_size)
+            indices, values, dense_shape = list2sparsetensor(labels)
+
+            # Define model
+            model = load(model_type=model_type)
+            network = model(batch_size=batch_size,
+                            input_size=inputs[0].shape[1],
+                            num_cell=64,
+                            num_layer=1,
+                            output_size=61,
+                            parameter_init=0.1,
+                            clip_grad=5.0,
+                            clip_activation=50,
+                            dropout_ratio_input=1.0,
+                            dropout_ratio_hidden=1.0,
+                            weight_decay=1e-6)
+            network.use_xla = use_xla
+            network.define()
+
+            # Add to the graph each operation
+            loss_op = network.loss()
+
+            # Add the variable initializer operation
+            init_op = tf.global_variables_initializer()
+
+            with tf.Session() as sess:
+                # Initialize parameters
+                sess.run(init_op)
+
+                feed_dict = {
+                    network.inputs: inputs,
+                    network.label_indices: indices,
+                    network.label_values: values,
+                    network.label_shape: dense_shape,
+                    network.seq_len: seq_len,
+                    network.keep_prob_input: 1.0,
+                    network.keep_prob_hidden: 1.0
+                }
+                return sess.run(loss_op, feed_dict=feed_dict)
+
     def check_training(self, model_type, label_type):
         print('----- ' + model_type + ', ' + label_type + ' -----')
         tf.reset_default_graph()